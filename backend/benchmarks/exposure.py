@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Exposure store benchmark
+Records exposures for N users (default 1M), then reports memory per user,
+the cost of ranking a candidate list, the measured false-positive rate
+against the configured one, and throughput with the user cap set below N
+(LRU eviction).
+
+Usage: python benchmarks/exposure.py [--users 1000000] [--items 10] [--capacity 256]
+"""
+
+import argparse
+import os
+import random
+import resource
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from src.utils.exposure import ExposureStore  # noqa: E402
+
+CANDIDATES = 100  # Candidates ranked per request, about what /trending considers
+
+
+def rss_mb():
+    # ru_maxrss is KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def fill(store, users, items):
+    start = time.perf_counter()
+    for user in range(users):
+        store.record(f"user{user}", [f"artist {user * 7 + item}" for item in range(items)])
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1_000_000)
+    parser.add_argument("--items", type=int, default=10, help="items recorded per user")
+    parser.add_argument("--capacity", type=int, default=256, help="items per filter generation")
+    parser.add_argument("--error-rate", type=float, default=0.01)
+    parser.add_argument("--requests", type=int, default=20000, help="rank calls to time")
+    args = parser.parse_args()
+
+    store = ExposureStore(max_users=args.users, capacity=args.capacity, error_rate=args.error_rate)
+    print(f"filter: {store.size} bits, {store.hashes} hashes, "
+          f"{store.bytes_per_user()} bytes of bits per user (both generations)")
+
+    baseline = rss_mb()
+    seconds = fill(store, args.users, args.items)
+    grown = rss_mb() - baseline
+    print(f"recorded {args.users * args.items:,} exposures for {args.users:,} users in {seconds:.1f}s "
+          f"({args.users * args.items / seconds:,.0f}/s)")
+    print(f"resident memory +{grown:,.0f} MB, ~{grown * 1024 * 1024 / args.users:,.0f} bytes per user")
+
+    # A few candidates were shown to the user, the rest never were
+    latencies, shown_checked, unseen_checked = [], 0, 0
+    seen_before = store.stats()["seen"]
+    for _ in range(args.requests):
+        user = random.randrange(args.users)
+        shown = [{"name": f"artist {user * 7 + item}"} for item in range(min(args.items, CANDIDATES // 2))]
+        fresh = [{"name": f"unseen {user} {item}"} for item in range(CANDIDATES - len(shown))]
+        candidates = fresh + shown
+        random.shuffle(candidates)
+        start = time.perf_counter()
+        store.rank(f"user{user}", candidates, lambda result: result["name"])
+        latencies.append(time.perf_counter() - start)
+        shown_checked += len(shown)
+        unseen_checked += len(fresh)
+    # No false negatives, so anything reported seen beyond the shown items is a false positive
+    false_positives = store.stats()["seen"] - seen_before - shown_checked
+    latencies.sort()
+    per_candidate_us = sum(latencies) / len(latencies) / CANDIDATES * 1e6
+    print(f"rank {CANDIDATES} candidates: p50 {latencies[len(latencies) // 2] * 1000:.3f} ms, "
+          f"p99 {latencies[int(len(latencies) * 0.99)] * 1000:.3f} ms, {per_candidate_us:.2f} us per candidate")
+    print(f"false positives: {false_positives / unseen_checked:.4%} "
+          f"(configured {args.error_rate:.2%} at {args.capacity} items per generation)")
+
+    capped = ExposureStore(max_users=args.users // 10, capacity=args.capacity, error_rate=args.error_rate)
+    seconds = fill(capped, args.users, args.items)
+    stats = capped.stats()
+    print(f"\ncap {capped.max_users:,} users: {args.users * args.items / seconds:,.0f} exposures/s, "
+          f"{stats['users']:,} kept, {stats['evictions']:,} evicted")
+
+
+if __name__ == "__main__":
+    main()
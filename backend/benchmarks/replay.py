@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+Traffic replay benchmark
+Re-runs requests recorded by the traffic capture (TRAFFIC_CAPTURE_PATH)
+against this build, serving Qloo and Gemini from the recording with their
+recorded latencies, and reports latency percentiles, upstream call counts and
+cache hit rates. Given the report of another build it flags regressions.
+
+Usage:
+    python benchmarks/replay.py capture/*.jsonl --report before.json
+    python benchmarks/replay.py capture/*.jsonl --report after.json --baseline before.json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from urllib.parse import parse_qsl, urlsplit
+
+import requests
+from requests.adapters import BaseAdapter
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from src.utils.capture import CAPTURE_VERSION, prompt_key, query_key  # noqa: E402
+
+# Replay must not capture or snapshot anything itself
+for name in ("TRAFFIC_CAPTURE_PATH", "QLOO_CACHE_SNAPSHOT"):
+    os.environ.pop(name, None)
+os.environ.setdefault("QLOO_API_KEY", "replay")
+os.environ.setdefault("GEMINI_API_KEY", "replay")
+
+
+class Recording:
+    """Requests and upstream responses merged from one or more capture files"""
+
+    def __init__(self, paths):
+        self.requests = []
+        self.qloo = {}
+        self.gemini = {}
+        self.gemini_by_request = {}
+        for path in paths:
+            self._load(path)
+        self.requests.sort(key=lambda record: record["at"])
+
+    def _load(self, path):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                record = json.loads(line)
+                kind = record["type"]
+                if kind == "header" and record["version"] != CAPTURE_VERSION:
+                    raise SystemExit(f"{path}: unsupported capture version {record['version']}")
+                elif kind == "request":
+                    self.requests.append(record)
+                elif kind == "qloo":
+                    self.qloo[record["key"]] = record
+                elif kind == "gemini":
+                    self.gemini[record["key"]] = record
+                    self.gemini_by_request.setdefault(record["request"], []).append(record)
+
+
+class ReplayQlooAdapter(BaseAdapter):
+    """Transport adapter answering Qloo calls from the recording"""
+
+    def __init__(self, recording, latency_scale=1.0):
+        super().__init__()
+        self.recording = recording
+        self.latency_scale = latency_scale
+        self.calls = 0
+        self.unmatched = 0
+
+    def send(self, request, **kwargs):
+        self.calls += 1
+        url = urlsplit(request.url)
+        record = self.recording.qloo.get(query_key(url.path, dict(parse_qsl(url.query))))
+        response = requests.Response()
+        response.url = request.url
+        response.request = request
+        if record is None:
+            self.unmatched += 1
+            response.status_code = 404
+            response._content = b'{"error": "not in recording"}'
+            return response
+        time.sleep(record["ms"] / 1000 * self.latency_scale)
+        response.status_code = 200
+        response._content = json.dumps(record["data"]).encode()
+        return response
+
+    def close(self):
+        pass
+
+
+class ReplayGenAI:
+    """Stand-in for google.generativeai serving recorded responses"""
+
+    def __init__(self, recording, latency_scale=1.0):
+        self.recording = recording
+        self.latency_scale = latency_scale
+        self.calls = 0
+        self.unmatched = 0
+        self.request_id = None
+        self._pending = []
+        replay = self
+
+        class GenerativeModel:
+            def __init__(self, *args, **kwargs):
+                pass
+
+            def generate_content(self, prompt, **kwargs):
+                return replay.generate(prompt)
+
+        self.GenerativeModel = GenerativeModel
+
+    def start_request(self, request_id):
+        self.request_id = request_id
+        self._pending = list(self.recording.gemini_by_request.get(request_id, []))
+
+    def generate(self, prompt):
+        self.calls += 1
+        record = self.recording.gemini.get(prompt_key(prompt))
+        if record is None and self._pending:
+            # Prompt differs from the recording: use this request's next response
+            record = self._pending[0]
+        if record in self._pending:
+            self._pending.remove(record)
+        if record is None:
+            self.unmatched += 1
+            return type("Response", (), {"text": ""})()
+        time.sleep(record["ms"] / 1000 * self.latency_scale)
+        return type("Response", (), {"text": record["text"]})()
+
+
+def percentiles(samples):
+    ordered = sorted(samples)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(len(ordered) * q))]  # noqa: E731
+    return {
+        "count": len(ordered),
+        "mean": round(statistics.mean(ordered), 1),
+        "p50": round(pick(0.50), 1),
+        "p95": round(pick(0.95), 1),
+        "p99": round(pick(0.99), 1)
+    }
+
+
+def replay(recording, latency_scale=1.0, limit=None):
+    from src.main import create_app
+    from src.routes import harmony
+    from src.utils.clients import get_qloo_api, use_clients
+
+    app = create_app()
+    api = get_qloo_api()
+    api.shared_cache = None  # Only the recording answers, not entries other hosts cached
+    qloo = ReplayQlooAdapter(recording, latency_scale)
+    for shard in api.shards:
+        shard.session.mount("https://", qloo)
+        shard.session.mount("http://", qloo)
+    genai = ReplayGenAI(recording, latency_scale)
+    use_clients(genai=genai)
+    client = app.test_client()
+
+    latencies = {}
+    status_mismatches = 0
+    records = recording.requests[:limit] if limit else recording.requests
+    for record in records:
+        genai.start_request(record["id"])
+        path = record["path"] + (f"?{record['query']}" if record["query"] else "")
+        started = time.perf_counter()
+        response = client.open(path, method=record["method"], headers=record["headers"], json=record["body"])
+        elapsed = (time.perf_counter() - started) * 1000
+        latencies.setdefault(record["path"], []).append(elapsed)
+        if response.status_code != record["status"]:
+            status_mismatches += 1
+
+    lookups = api.cache_hits + api.cache_misses
+    return {
+        "requests": len(records),
+        "status_mismatches": status_mismatches,
+        "latency_ms": percentiles([value for values in latencies.values() for value in values]),
+        "endpoints": {path: percentiles(values) for path, values in sorted(latencies.items())},
+        "upstream": {
+            "qloo_calls": qloo.calls,
+            "qloo_unmatched": qloo.unmatched,
+            "gemini_calls": genai.calls,
+            "gemini_unmatched": genai.unmatched,
+            "recorded_qloo_calls": sum(record["qloo_calls"] for record in records),
+            "recorded_gemini_calls": sum(record["gemini_calls"] for record in records)
+        },
+        "cache": {
+            "qloo_hit_rate": round(api.cache_hits / lookups, 3) if lookups else 0.0,
+            "qloo_search_hit_rate": api.cache_status()["search"]["hit_rate"],
+            "mood_hit_rate": harmony.mood_cache.stats()["hit_rate"]
+        }
+    }
+
+
+def compare(report, baseline, tolerance):
+    """List regressions of report against baseline"""
+    regressions = []
+
+    def check_latency(name, current, previous):
+        for metric in ("p50", "p95"):
+            if previous[metric] and current[metric] > previous[metric] * (1 + tolerance):
+                regressions.append(f"{name} {metric} {previous[metric]}ms -> {current[metric]}ms")
+
+    check_latency("overall", report["latency_ms"], baseline["latency_ms"])
+    for path, stats in report["endpoints"].items():
+        if path in baseline["endpoints"]:
+            check_latency(path, stats, baseline["endpoints"][path])
+    for metric in ("qloo_calls", "gemini_calls"):
+        previous, current = baseline["upstream"][metric], report["upstream"][metric]
+        if current > previous * (1 + tolerance):
+            regressions.append(f"{metric} {previous} -> {current}")
+    for metric, previous in baseline["cache"].items():
+        if report["cache"].get(metric, 0) < previous - 0.05:
+            regressions.append(f"{metric} {previous} -> {report['cache'].get(metric)}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("captures", nargs="+", help="Capture files written by TRAFFIC_CAPTURE_PATH")
+    parser.add_argument("--report", help="Write the JSON report here")
+    parser.add_argument("--baseline", help="Report of the previous build to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative increase (default 0.2)")
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="Multiplier for recorded upstream latency")
+    parser.add_argument("--limit", type=int, help="Replay only the first N requests")
+    args = parser.parse_args()
+
+    report = replay(Recording(args.captures), args.latency_scale, args.limit)
+    print(json.dumps(report, indent=2))
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        if regressions:
+            print("\nRegressions:\n  " + "\n  ".join(regressions))
+            sys.exit(1)
+        print("\nNo regressions against baseline")
+
+
+if __name__ == "__main__":
+    main()
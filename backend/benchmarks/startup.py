@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Worker startup benchmark
+Measures, in fresh interpreter processes, how long importing the app takes,
+how long the first request takes, and the one-off cost of initializing the
+Qloo and Gemini clients on first use.
+
+Usage: python benchmarks/startup.py [--runs 5]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = r"""
+import json, time
+t0 = time.perf_counter()
+from src.main import app
+t1 = time.perf_counter()
+client = app.test_client()
+client.get("/api/health")
+t2 = time.perf_counter()
+from src.utils.clients import get_genai, get_qloo_api
+get_qloo_api()
+t3 = time.perf_counter()
+get_genai()
+t4 = time.perf_counter()
+print(json.dumps({
+    "import_ms": (t1 - t0) * 1000,
+    "first_request_ms": (t2 - t1) * 1000,
+    "qloo_init_ms": (t3 - t2) * 1000,
+    "gemini_init_ms": (t4 - t3) * 1000
+}))
+"""
+
+
+def run_once():
+    output = subprocess.check_output([sys.executable, "-c", PROBE], cwd=BACKEND_DIR, env=os.environ.copy())
+    return json.loads(output.decode().strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    runs = [run_once() for _ in range(args.runs)]
+    print(f"{'metric':<20}{'median ms':>12}{'min ms':>10}{'max ms':>10}")
+    for metric in runs[0]:
+        values = [run[metric] for run in runs]
+        print(f"{metric:<20}{statistics.median(values):>12.1f}{min(values):>10.1f}{max(values):>10.1f}")
+    print(f"\nboot to first response: {statistics.median(r['import_ms'] + r['first_request_ms'] for r in runs):.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
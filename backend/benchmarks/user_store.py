@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+User store benchmark
+Loads N users (default 1M) into a scratch SQLite database through the app's
+configuration, then times indexed lookups, keyset vs offset pagination, bulk
+writes, and mixed reads/writes from several concurrent processes.
+
+Usage: python benchmarks/user_store.py [--users 1000000] [--workers 4]
+"""
+
+import argparse
+import multiprocessing
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+BATCH_SIZE = 10000
+
+
+def timed(fn, repeat=50):
+    """Median latency of fn() in milliseconds"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def make_app(db_path):
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    from src.main import create_app
+    return create_app()
+
+
+def load_users(app, total):
+    from sqlalchemy import insert
+    from src.models.user import User
+    from src.utils.clients import get_db
+
+    with app.app_context():
+        db = get_db()
+        start = time.perf_counter()
+        for offset in range(0, total, BATCH_SIZE):
+            rows = [{"username": f"user{i}", "email": f"user{i}@example.com"}
+                    for i in range(offset, min(offset + BATCH_SIZE, total))]
+            db.session.execute(insert(User), rows)
+            db.session.commit()
+        return time.perf_counter() - start
+
+
+def worker(db_path, total, operations, results):
+    """Mixed workload: 90% keyset page reads, 10% single-row updates"""
+    import random
+    app = make_app(db_path)
+    client = app.test_client()
+    latencies, errors = [], 0
+    for i in range(operations):
+        start = time.perf_counter()
+        if i % 10 == 0:
+            user_id = random.randint(1, total)
+            response = client.put(f"/api/users/{user_id}", json={"email": f"w{os.getpid()}-{i}@example.com"})
+        else:
+            response = client.get(f"/api/users?after_id={random.randint(0, total)}&limit=50")
+        if response.status_code >= 500:
+            errors += 1
+        latencies.append((time.perf_counter() - start) * 1000)
+    results.put((latencies, errors))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1_000_000)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--operations", type=int, default=500, help="operations per concurrent worker")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        app = make_app(db_path)
+        client = app.test_client()
+
+        load_seconds = load_users(app, args.users)
+        print(f"loaded {args.users:,} users in {load_seconds:.1f}s ({args.users / load_seconds:,.0f} rows/s)")
+
+        middle = args.users // 2
+        tail = args.users - 100
+        print(f"lookup by username         {timed(lambda: client.get(f'/api/users?username=user{middle}')):8.2f} ms")
+        print(f"lookup by email            {timed(lambda: client.get(f'/api/users?email=user{middle}@example.com')):8.2f} ms")
+        print(f"keyset page (start)        {timed(lambda: client.get('/api/users?limit=100')):8.2f} ms")
+        print(f"keyset page (end)          {timed(lambda: client.get(f'/api/users?after_id={tail}&limit=100')):8.2f} ms")
+
+        from sqlalchemy import text
+        from src.utils.clients import get_db
+        with app.app_context():
+            db = get_db()
+            offset_ms = timed(lambda: db.session.execute(
+                text("SELECT * FROM user ORDER BY id LIMIT 100 OFFSET :offset"), {"offset": tail}
+            ).all(), repeat=10)
+        print(f"offset page (end, for ref) {offset_ms:8.2f} ms")
+
+        rows = [{"username": f"bulk{i}", "email": f"bulk{i}@example.com"} for i in range(1000)]
+        start = time.perf_counter()
+        response = client.post("/api/users/bulk", json=rows)
+        print(f"bulk create 1000           {(time.perf_counter() - start) * 1000:8.2f} ms ({response.status_code})")
+        ids = response.get_json()["ids"]
+        start = time.perf_counter()
+        response = client.put("/api/users/bulk", json=[{"id": i, "email": f"updated{i}@example.com"} for i in ids])
+        print(f"bulk update 1000           {(time.perf_counter() - start) * 1000:8.2f} ms ({response.status_code})")
+
+        results = multiprocessing.Queue()
+        processes = [multiprocessing.Process(target=worker, args=(db_path, args.users, args.operations, results))
+                     for _ in range(args.workers)]
+        start = time.perf_counter()
+        for process in processes:
+            process.start()
+        collected = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+        elapsed = time.perf_counter() - start
+
+        latencies = sorted(latency for worker_latencies, _ in collected for latency in worker_latencies)
+        errors = sum(worker_errors for _, worker_errors in collected)
+        print(f"\n{args.workers} concurrent workers: {len(latencies) / elapsed:,.0f} ops/s, "
+              f"p50 {latencies[len(latencies) // 2]:.2f} ms, p99 {latencies[int(len(latencies) * 0.99)]:.2f} ms, "
+              f"{errors} errors")
+
+
+if __name__ == "__main__":
+    main()
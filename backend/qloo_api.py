@@ -6,12 +6,22 @@ Optimized wrapper for building hackathon projects with the Qloo API
 
 import requests
 import json
+import logging
 import time
+import bisect
 import hashlib
-from typing import Dict, List, Optional, Any
+import heapq
+import random
+import threading
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Any
 from dataclasses import dataclass
 from functools import lru_cache
 
+logger = logging.getLogger(__name__)
+
 @dataclass
 class QlooEntity:
     """Represents a Qloo entity with all available information"""
@@ -50,10 +60,376 @@ class QlooEntity:
     def __str__(self):
         return f"{self.name} ({self.get_category()})"
 
+@dataclass
+class RetryPolicy:
+    """Retry settings for transient (idempotent GET) failures"""
+    max_retries: int = 2
+    backoff_base: float = 0.2  # seconds
+    backoff_max: float = 2.0
+    retry_statuses: tuple = (429, 500, 502, 503, 504)
+    
+    def backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff for the given retry attempt (0-based)"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+class CircuitBreaker:
+    """
+    Error-rate circuit breaker for one endpoint
+    Opens when the failure rate over a sliding window crosses a threshold,
+    then lets a single probe through after the cooldown (half-open)
+    """
+    
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+    
+    def __init__(self, failure_threshold: float = 0.5, min_requests: int = 5,
+                 window_size: int = 20, cooldown: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.min_requests = min_requests
+        self.cooldown = cooldown
+        self.state = self.CLOSED
+        self.opened_at = 0.0
+        self._outcomes = deque(maxlen=window_size)
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+    
+    def allow_request(self) -> bool:
+        """Return whether a request may be sent upstream right now"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.cooldown:
+                self.state = self.HALF_OPEN
+                self._probe_in_flight = False
+            if self.state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            return False
+    
+    def cancel_probe(self):
+        """Give back a half-open probe permit whose request was never sent"""
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self._probe_in_flight = False
+    
+    def record_success(self):
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self.state = self.CLOSED
+                self._outcomes.clear()
+            self._outcomes.append(True)
+    
+    def record_failure(self):
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self._open()
+                return
+            self._outcomes.append(False)
+            failures = self._outcomes.count(False)
+            if len(self._outcomes) >= self.min_requests and failures / len(self._outcomes) >= self.failure_threshold:
+                self._open()
+    
+    def _open(self):
+        self.state = self.OPEN
+        self.opened_at = time.monotonic()
+        self._probe_in_flight = False
+        self._outcomes.clear()
+    
+    def status(self) -> Dict:
+        with self._lock:
+            return {
+                "state": self.state,
+                "recent_failures": self._outcomes.count(False),
+                "recent_requests": len(self._outcomes)
+            }
+
+# Priority classes for the shared request budget: WFQ weight, and whether
+# queued requests of the class may be dropped when interactive demand spikes
+PRIORITY_CLASSES = {
+    "interactive": {"weight": 8, "preemptible": False},
+    "background": {"weight": 2, "preemptible": True},
+    "bulk": {"weight": 1, "preemptible": True}
+}
+
+_request_priority: ContextVar[str] = ContextVar("qloo_request_priority", default="interactive")
+
+def set_request_priority(name: str):
+    """Set the priority class of Qloo calls in the current context; returns a reset token"""
+    if name not in PRIORITY_CLASSES:
+        raise ValueError(f"Unknown priority class '{name}'")
+    return _request_priority.set(name)
+
+def reset_request_priority(token):
+    _request_priority.reset(token)
+
+@contextmanager
+def request_priority(name: str):
+    """Run Qloo calls made inside the block under the given priority class"""
+    token = set_request_priority(name)
+    try:
+        yield
+    finally:
+        reset_request_priority(token)
+
+# Shared-cache keys already looked up in the current fan-out, so a search that
+# misses locally after warm_from_shared() does not ask the shared cache again
+_shared_checked: ContextVar[Optional[set]] = ContextVar("qloo_shared_checked", default=None)
+
+@contextmanager
+def shared_lookups():
+    """Look each key up in the shared cache at most once for Qloo calls made inside the block
+
+    Nested blocks share the outermost one's keys; threads started with a copy of
+    the context (e.g. run_concurrently) share them too
+    """
+    if _shared_checked.get() is not None:
+        yield
+        return
+    token = _shared_checked.set(set())
+    try:
+        yield
+    finally:
+        _shared_checked.reset(token)
+
+class _Ticket:
+    __slots__ = ("tag", "seq", "priority", "enqueued_at", "preempted")
+    
+    def __init__(self, tag: float, seq: int, priority: str):
+        self.tag = tag
+        self.seq = seq
+        self.priority = priority
+        self.enqueued_at = time.monotonic()
+        self.preempted = False
+    
+    def __lt__(self, other: "_Ticket") -> bool:
+        return (self.tag, self.seq) < (other.tag, other.seq)
+
+class RequestScheduler:
+    """
+    Weighted fair queuing of upstream request slots across priority classes
+    One request may start every `interval` seconds; waiting requests are
+    served in order of their virtual finish tags, so each class gets a share
+    of slots proportional to its weight. When `preempt_threshold` interactive
+    requests are waiting, queued preemptible (background/bulk) requests are
+    dropped instead of being served
+    """
+    
+    def __init__(self, interval: float = 0.1, classes: Optional[Dict[str, Dict]] = None,
+                 preempt_threshold: int = 4, wait_samples: int = 200):
+        self.interval = interval
+        self.classes = classes or PRIORITY_CLASSES
+        self.preempt_threshold = preempt_threshold
+        self._queue: List[_Ticket] = []
+        self._cond = threading.Condition()
+        self._seq = 0
+        self._virtual_time = 0.0
+        self._last_tag = {name: 0.0 for name in self.classes}
+        self._next_slot = 0.0
+        self._stats = {
+            name: {"dispatched": 0, "preempted": 0, "timed_out": 0, "wait_total": 0.0,
+                   "wait_max": 0.0, "waits": deque(maxlen=wait_samples)}
+            for name in self.classes
+        }
+    
+    def acquire(self, priority: str = "interactive", timeout: Optional[float] = None) -> bool:
+        """Block until a request slot is granted; False if preempted or timed out"""
+        if priority not in self.classes:
+            priority = "interactive"
+        with self._cond:
+            # Virtual finish tag: start no earlier than the current virtual time
+            tag = max(self._virtual_time, self._last_tag[priority]) + 1.0 / self.classes[priority]["weight"]
+            self._last_tag[priority] = tag
+            self._seq += 1
+            ticket = _Ticket(tag, self._seq, priority)
+            heapq.heappush(self._queue, ticket)
+            if priority == "interactive":
+                self._maybe_preempt()
+            self._cond.notify_all()
+            
+            give_up_at = None if timeout is None else ticket.enqueued_at + timeout
+            while True:
+                now = time.monotonic()
+                if ticket.preempted:
+                    self._stats[priority]["preempted"] += 1
+                    return False
+                if give_up_at is not None and now >= give_up_at:
+                    self._remove(ticket)
+                    self._stats[priority]["timed_out"] += 1
+                    return False
+                if self._queue[0] is ticket and now >= self._next_slot:
+                    heapq.heappop(self._queue)
+                    self._virtual_time = ticket.tag
+                    self._next_slot = now + self.interval
+                    self._record_wait(priority, now - ticket.enqueued_at)
+                    self._cond.notify_all()
+                    return True
+                
+                wait = self._next_slot - now if self._queue[0] is ticket else None
+                if give_up_at is not None:
+                    wait = min(wait, give_up_at - now) if wait is not None else give_up_at - now
+                self._cond.wait(wait)
+    
+    def _maybe_preempt(self):
+        waiting = sum(1 for ticket in self._queue if ticket.priority == "interactive")
+        if waiting < self.preempt_threshold:
+            return
+        kept = []
+        for ticket in self._queue:
+            if self.classes[ticket.priority]["preemptible"]:
+                ticket.preempted = True
+            else:
+                kept.append(ticket)
+        if len(kept) != len(self._queue):
+            heapq.heapify(kept)
+            self._queue = kept
+    
+    def _remove(self, ticket: _Ticket):
+        self._queue.remove(ticket)
+        heapq.heapify(self._queue)
+        self._cond.notify_all()
+    
+    def _record_wait(self, priority: str, wait: float):
+        stats = self._stats[priority]
+        stats["dispatched"] += 1
+        stats["wait_total"] += wait
+        stats["wait_max"] = max(stats["wait_max"], wait)
+        stats["waits"].append(wait)
+    
+    def status(self) -> Dict[str, Dict]:
+        """Queue depth and wait metrics per priority class"""
+        with self._cond:
+            report = {}
+            for name, stats in self._stats.items():
+                waits = sorted(stats["waits"])
+                report[name] = {
+                    "queued": sum(1 for ticket in self._queue if ticket.priority == name),
+                    "dispatched": stats["dispatched"],
+                    "preempted": stats["preempted"],
+                    "timed_out": stats["timed_out"],
+                    "avg_wait_ms": round(stats["wait_total"] / stats["dispatched"] * 1000, 1) if stats["dispatched"] else 0.0,
+                    "p95_wait_ms": round(waits[min(len(waits) - 1, int(len(waits) * 0.95))] * 1000, 1) if waits else 0.0,
+                    "max_wait_ms": round(stats["wait_max"] * 1000, 1)
+                }
+            return report
+
+class QlooShard:
+    """
+    One credential/endpoint pair with its own session, rate budget and health
+    Throttling (429) or repeated failures eject the shard for a cooldown that
+    doubles on every consecutive ejection; it is re-admitted once that expires
+    """
+    
+    def __init__(self, name: str, api_key: str, base_url: str, scheduler: RequestScheduler,
+                 failure_limit: int = 3, eject_cooldown: float = 30.0, max_eject_cooldown: float = 300.0):
+        self.name = name
+        self.api_key = api_key
+        self.base_url = base_url
+        self.session = requests.Session()
+        self.session.headers.update({
+            "X-API-Key": api_key,
+            "Content-Type": "application/json",
+            "Accept": "application/json"
+        })
+        self.scheduler = scheduler
+        self.failure_limit = failure_limit
+        self.eject_cooldown = eject_cooldown
+        self.max_eject_cooldown = max_eject_cooldown
+        self.ejected_until = 0.0
+        self.ejections = 0
+        self._consecutive_failures = 0
+        self._consecutive_ejections = 0
+        self._lock = threading.Lock()
+    
+    def healthy(self) -> bool:
+        return time.monotonic() >= self.ejected_until
+    
+    def record_success(self):
+        with self._lock:
+            self._consecutive_failures = 0
+            self._consecutive_ejections = 0
+    
+    def record_failure(self, throttled: bool = False, retry_after: Optional[float] = None):
+        with self._lock:
+            self._consecutive_failures += 1
+            if throttled or self._consecutive_failures >= self.failure_limit:
+                cooldown = min(self.max_eject_cooldown, self.eject_cooldown * (2 ** self._consecutive_ejections))
+                if retry_after:
+                    cooldown = max(cooldown, retry_after)
+                self.ejected_until = time.monotonic() + cooldown
+                self.ejections += 1
+                self._consecutive_ejections += 1
+                self._consecutive_failures = 0
+    
+    def status(self) -> Dict:
+        return {
+            "base_url": self.base_url,
+            "healthy": self.healthy(),
+            "ejected_for": round(max(0.0, self.ejected_until - time.monotonic()), 1),
+            "ejections": self.ejections,
+            "scheduler": self.scheduler.status()
+        }
+
+class HashRing:
+    """Consistent hash ring with virtual nodes"""
+    
+    def __init__(self, nodes: List[Any], vnodes: int = 64, name: Callable[[Any], str] = str):
+        self.nodes = list(nodes)
+        self._ring = sorted(
+            (self._hash(f"{name(node)}#{index}"), position)
+            for position, node in enumerate(self.nodes)
+            for index in range(vnodes)
+        )
+        self._hashes = [point for point, _ in self._ring]
+    
+    @staticmethod
+    def _hash(value: str) -> int:
+        return int.from_bytes(hashlib.md5(value.encode()).digest()[:8], "big")
+    
+    def walk(self, key: str):
+        """Yield the distinct nodes for a key in ring order, the owner first"""
+        if not self._ring:
+            return
+        start = bisect.bisect(self._hashes, self._hash(key))
+        seen = set()
+        for offset in range(len(self._ring)):
+            position = self._ring[(start + offset) % len(self._ring)][1]
+            if position not in seen:
+                seen.add(position)
+                yield self.nodes[position]
+                if len(seen) == len(self.nodes):
+                    return
+
+# Placeholder tokens left in queries by empty or unset form fields
+QUERY_STOP_TOKENS = {"none", "null", "undefined", "n/a"}
+QUERY_TOKEN_ALIASES = {"&": "and", "+": "and"}
+
+def canonicalize_query(query: str, sort_tokens: bool = False) -> str:
+    """
+    Canonical form of a search query, used as its cache key so equivalent
+    spellings share an entry
+    Case folded, whitespace collapsed and aliases normalized; a query made
+    only of placeholder tokens is empty. Repeated words are kept, since they
+    are often part of a name ("Duran Duran", "Talk Talk"); with sort_tokens
+    the token order is ignored as well
+    """
+    tokens = [QUERY_TOKEN_ALIASES.get(token, token) for token in query.casefold().split()]
+    if all(token in QUERY_STOP_TOKENS for token in tokens):
+        return ""
+    if sort_tokens:
+        tokens.sort()
+    return " ".join(tokens)
+
 class QlooAPI:
     """Production-ready Qloo API wrapper for hackathon development"""
     
-    def __init__(self, api_key: str, base_url: str = "https://hackathon.api.qloo.com"):
+    def __init__(self, api_key: str, base_url: str = "https://hackathon.api.qloo.com",
+                 timeout: float = 10, retry_policy: Optional[RetryPolicy] = None,
+                 breaker_threshold: float = 0.5, breaker_min_requests: int = 5,
+                 breaker_cooldown: float = 30.0, cache_ttl: Optional[float] = 3600.0,
+                 min_request_interval: float = 0.1, preempt_threshold: int = 4,
+                 credentials: Optional[List[tuple]] = None, shard_cooldown: float = 30.0,
+                 sort_query_tokens: bool = False):
         self.api_key = api_key
         self.base_url = base_url
         self.headers = {
@@ -61,67 +437,394 @@ class QlooAPI:
             "Content-Type": "application/json",
             "Accept": "application/json"
         }
-        self.session = requests.Session()
-        self.session.headers.update(self.headers)
         
-        # Rate limiting
-        self.last_request_time = 0
-        self.min_request_interval = 0.1  # 100ms between requests
+        # One shard per (api_key, base_url) pair, each with its own session and
+        # rate budget; requests are routed by consistent hashing on the cache key
+        self.min_request_interval = min_request_interval  # 100ms between requests per shard
+        self.shards = [
+            QlooShard(
+                f"shard{index}", key, base,
+                scheduler=RequestScheduler(interval=min_request_interval, preempt_threshold=preempt_threshold),
+                eject_cooldown=shard_cooldown
+            )
+            for index, (key, base) in enumerate(credentials or [(api_key, base_url)])
+        ]
+        self._ring = HashRing(self.shards, name=lambda shard: shard.name)
+        self.session = self.shards[0].session
+        
+        # Cache for search results: key -> (data, stored_at); entries expire after cache_ttl
+        self._search_cache: Dict[str, tuple] = {}
+        # Largest page searched per (key query, offset): (limit, cache key), so a
+        # smaller page is served from it with a single lookup
+        self._page_index: Dict[tuple, tuple] = {}
+        self.cache_ttl = cache_ttl
+        self.cache_writes = 0  # Bumped on every store, so snapshots can skip unchanged caches
+        self.cache_hits = 0
+        self.cache_misses = 0
+        
+        # Optional cache shared between hosts (e.g. src.utils.distributed_cache), checked
+        # after a local miss: get_many(keys) -> {key: (data, stored_at)} and set(key, data, stored_at)
+        self.shared_cache: Optional[Any] = None
+        self.shared_hits = 0
         
-        # Cache for search results
-        self._search_cache = {}
-    
-    def _rate_limit(self):
-        """Simple rate limiting to avoid overwhelming the API"""
-        current_time = time.time()
-        time_since_last = current_time - self.last_request_time
-        if time_since_last < self.min_request_interval:
-            time.sleep(self.min_request_interval - time_since_last)
-        self.last_request_time = time.time()
-    
-    def _make_request(self, endpoint: str, params: Dict = None, use_cache: bool = True) -> Optional[Dict]:
-        """Make a request with error handling and caching"""
-        self._rate_limit()
+        # Search queries are canonicalized for the cache lookup; counts show
+        # how many hits came from rewritten queries and from larger cached pages
+        self.sort_query_tokens = sort_query_tokens
+        self.search_stats = {"lookups": 0, "hits": 0, "page_hits": 0, "rewritten": 0, "rewritten_hits": 0}
+        
+        # Resilience: retries for transient failures and a breaker per endpoint
+        self.timeout = timeout
+        self.retry_policy = retry_policy or RetryPolicy()
+        self._breaker_settings = {
+            "failure_threshold": breaker_threshold,
+            "min_requests": breaker_min_requests,
+            "cooldown": breaker_cooldown
+        }
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._breakers_lock = threading.Lock()
         
-        # Create cache key
-        cache_key = None
+        # Optional span factory (e.g. request tracing), called with a span name
+        self.tracer: Optional[Callable[[str], Any]] = None
+        
+        # Optional provider of the caller's deadline: an object with remaining()
+        # and mark_partial(reason), or None when the call is not time-bounded
+        self.deadline_provider: Optional[Callable[[], Any]] = None
+        self.min_request_budget = 0.25  # Don't start a request with less time left
+        
+        # Optional observer of successful responses (e.g. traffic capture), called
+        # with (endpoint, params, data, from_cache, elapsed_seconds)
+        self.observer: Optional[Callable[[str, Dict, Dict, bool, float], None]] = None
+    
+    def _span(self, name: str):
+        """Open a tracing span if a tracer is attached"""
+        return self.tracer(name) if self.tracer else nullcontext()
+    
+    def _rate_limit(self, shard: QlooShard, deadline=None) -> bool:
+        """Wait for a request slot on a shard in the caller's priority class; False if none was granted"""
+        priority = _request_priority.get()
+        timeout = None
+        if deadline is not None:
+            timeout = max(0.0, deadline.remaining() - self.min_request_budget)
+        with self._span("qloo_rate_limit"):
+            granted = shard.scheduler.acquire(priority, timeout=timeout)
+        if not granted and deadline is not None:
+            deadline.mark_partial(f"qloo {priority} request not scheduled")
+        return granted
+    
+    def _route(self, key: str, exclude: Optional[QlooShard] = None) -> Optional[QlooShard]:
+        """Owner shard of a key on the ring, skipping ejected shards (and `exclude` if possible)"""
+        if len(self.shards) == 1:
+            return self.shards[0]  # A lone shard is never ejected; its breakers cover it
+        fallback = None
+        for shard in self._ring.walk(key):
+            if not shard.healthy():
+                continue
+            if shard is exclude:
+                fallback = shard
+                continue
+            return shard
+        return fallback
+    
+    def _get_breaker(self, shard: QlooShard, endpoint: str) -> CircuitBreaker:
+        name = endpoint if len(self.shards) == 1 else f"{shard.name}{endpoint}"
+        with self._breakers_lock:
+            if name not in self._breakers:
+                self._breakers[name] = CircuitBreaker(**self._breaker_settings)
+            return self._breakers[name]
+    
+    def breaker_status(self) -> Dict[str, Dict]:
+        """Circuit breaker state for every endpoint (per shard when sharded) seen so far"""
+        with self._breakers_lock:
+            breakers = dict(self._breakers)
+        return {endpoint: breaker.status() for endpoint, breaker in breakers.items()}
+    
+    def shard_status(self) -> Dict[str, Dict]:
+        """Health, ejections and queue metrics for every shard"""
+        return {shard.name: shard.status() for shard in self.shards}
+    
+    def _cache_fresh(self, stored_at: float, now: Optional[float] = None) -> bool:
+        return self.cache_ttl is None or (now or time.time()) - stored_at < self.cache_ttl
+    
+    @staticmethod
+    def _cache_key(endpoint: str, params: Dict) -> str:
+        return hashlib.md5(f"{endpoint}_{json.dumps(params, sort_keys=True)}".encode()).hexdigest()
+    
+    def _search_key(self, query: str, limit: int, offset: int) -> str:
+        key_query = canonicalize_query(query, sort_tokens=self.sort_query_tokens)
+        return self._cache_key("/search", {"query": key_query, "limit": limit, "offset": offset})
+    
+    def _page_slot(self, query: str, offset: int) -> tuple:
+        return canonicalize_query(query, sort_tokens=self.sort_query_tokens), offset
+    
+    def _index_page(self, query: str, limit: int, offset: int, cache_key: str):
+        """Remember a cached search page unless a larger one of the query is still cached"""
+        slot = self._page_slot(query, offset)
+        current = self._page_index.get(slot)
+        if current is None or current[0] <= limit or self._cache_get(current[1]) is None:
+            self._page_index[slot] = (limit, cache_key)
+    
+    def _cached_page(self, query: str, limit: int, offset: int) -> Optional[Dict]:
+        """The first `limit` results of a larger cached page of the same query, if any"""
+        slot = self._page_slot(query, offset)
+        current = self._page_index.get(slot)
+        if current is None or current[0] <= limit:
+            return None
+        data = self._cache_get(current[1])
+        if data is None:
+            self._page_index.pop(slot, None)
+            return None
+        if "results" not in data:
+            return None
+        return {**data, "results": data["results"][:limit]}
+    
+    def search_cached(self, query: str, limit: int = 20, offset: int = 0) -> bool:
+        """Whether search() with these arguments would be answered from the cache"""
+        return (self._cache_get(self._search_key(query, limit, offset)) is not None
+                or self._cached_page(query, limit, offset) is not None)
+    
+    def cache_status(self) -> Dict:
+        lookups = self.cache_hits + self.cache_misses
+        searches = self.search_stats["lookups"]
+        return {
+            "entries": len(self._search_cache),
+            "hits": self.cache_hits,
+            "misses": self.cache_misses,
+            "hit_rate": round(self.cache_hits / lookups, 3) if lookups else 0.0,
+            "shared_hits": self.shared_hits,
+            "shared": self.shared_cache.status() if self.shared_cache is not None else {"enabled": False},
+            "search": {
+                **self.search_stats,
+                "hit_rate": round((self.search_stats["hits"] + self.search_stats["page_hits"]) / searches, 3) if searches else 0.0
+            }
+        }
+    
+    def _cache_get(self, key: str) -> Optional[Dict]:
+        entry = self._search_cache.get(key)
+        if entry is None:
+            return None
+        data, stored_at = entry
+        if not self._cache_fresh(stored_at):
+            self._search_cache.pop(key, None)
+            return None
+        return data
+    
+    def _cache_set(self, key: str, data: Dict, stored_at: Optional[float] = None):
+        self._search_cache[key] = (data, stored_at or time.time())
+        self.cache_writes += 1
+    
+    def _fill_from_shared(self, keys: List[str]) -> int:
+        """Copy fresh entries for keys missing locally from the shared cache in one batched lookup"""
+        if self.shared_cache is None:
+            return 0
+        checked = _shared_checked.get()
+        missing = [
+            key for key in dict.fromkeys(keys)
+            if self._cache_get(key) is None and (checked is None or key not in checked)
+        ]
+        if not missing:
+            return 0
+        if checked is not None:
+            checked.update(missing)
+        with self._span("qloo_shared_cache"):
+            found = self.shared_cache.get_many(missing)
+        loaded = 0
+        for key, (data, stored_at) in found.items():
+            if self._cache_fresh(stored_at):
+                self._cache_set(key, data, stored_at)
+                loaded += 1
+        self.shared_hits += loaded
+        return loaded
+    
+    def warm_from_shared(self, queries: List[str], limit: int, offset: int = 0) -> int:
+        """Batch the shared-cache lookups of searches a fan-out is about to make
+
+        Inside shared_lookups() the searches then skip their own lookup of these keys
+        """
+        if self.shared_cache is None:
+            return 0
+        return self._fill_from_shared([
+            self._search_key(query, limit, offset) for query in queries if canonicalize_query(query)
+        ])
+    
+    def export_cache(self):
+        """Yield (key, stored_at, data) for every unexpired cache entry"""
+        now = time.time()
+        for key, (data, stored_at) in list(self._search_cache.items()):
+            if self._cache_fresh(stored_at, now):
+                yield key, stored_at, data
+    
+    def import_cache(self, entries) -> int:
+        """Load (key, stored_at, data) entries, skipping expired ones and never
+        replacing a fresher entry; returns how many were loaded"""
+        now = time.time()
+        loaded = 0
+        for key, stored_at, data in entries:
+            if not self._cache_fresh(stored_at, now):
+                continue
+            current = self._search_cache.get(key)
+            if current is not None and current[1] >= stored_at:
+                continue
+            self._search_cache[key] = (data, stored_at)
+            loaded += 1
+        return loaded
+    
+    def _make_request(self, endpoint: str, params: Dict = None, use_cache: bool = True,
+                      cache_key: Optional[str] = None) -> Optional[Dict]:
+        """Make a request with error handling, caching, retries and circuit breaking"""
+        # Create cache key (callers may pass one computed from canonical params)
         if use_cache and params:
-            cache_key = hashlib.md5(f"{endpoint}_{json.dumps(params, sort_keys=True)}".encode()).hexdigest()
-            if cache_key in self._search_cache:
-                return self._search_cache[cache_key]
+            cache_key = cache_key or self._cache_key(endpoint, params)
+            cached = self._cache_get(cache_key)
+            if cached is None and self._fill_from_shared([cache_key]):
+                cached = self._cache_get(cache_key)
+            if cached is not None:
+                self.cache_hits += 1
+                if self.observer:
+                    self.observer(endpoint, params, cached, True, 0.0)
+                return cached
+            self.cache_misses += 1
         
-        try:
-            url = f"{self.base_url}{endpoint}"
-            response = self.session.get(url, params=params, timeout=10)
-            
-            if response.status_code == 200:
-                data = response.json()
-                if use_cache and cache_key:
-                    self._search_cache[cache_key] = data
-                return data
-            elif response.status_code == 403:
-                print(f"⚠️ Access forbidden for {endpoint} with params {params}")
-                return None
-            else:
-                print(f"❌ Request failed: {response.status_code} - {response.text[:100]}")
-                return None
-                
-        except Exception as e:
-            print(f"❌ Request error: {e}")
+        # Skip the call entirely when the caller's budget is spent
+        deadline = self.deadline_provider() if self.deadline_provider else None
+        if deadline is not None and deadline.remaining() < self.min_request_budget:
+            deadline.mark_partial(f"qloo{endpoint} skipped: deadline")
+            return None
+        
+        # Route by the cache key so the same query keeps hitting the same shard
+        route_key = cache_key or f"{endpoint}_{json.dumps(params or {}, sort_keys=True)}"
+        shard = self._route(route_key)
+        if shard is None:
+            if deadline is not None:
+                deadline.mark_partial(f"qloo{endpoint} skipped: all shards ejected")
+            return None
+        
+        # Fail fast while the endpoint is known to be down, without waiting for a slot
+        breaker = self._get_breaker(shard, endpoint)
+        if not breaker.allow_request():
             return None
+        
+        # Preempted or out of time while queued for a slot; not an upstream failure
+        if not self._rate_limit(shard, deadline):
+            breaker.cancel_probe()
+            return None
+        
+        policy = self.retry_policy
+        for attempt in range(policy.max_retries + 1):
+            if attempt:
+                # Retry on another healthy shard when there is one
+                next_shard = self._route(route_key, exclude=shard)
+                if next_shard is None:
+                    break
+                if next_shard is not shard:
+                    breaker.record_failure()
+                    shard = next_shard
+                    breaker = self._get_breaker(shard, endpoint)
+                    if not breaker.allow_request():
+                        return None
+                    if not self._rate_limit(shard, deadline):
+                        # Nothing was sent to this shard; the last failure is already recorded
+                        breaker.cancel_probe()
+                        return None
+                elif not self._rate_limit(shard, deadline):
+                    break
+            timeout = self.timeout
+            if deadline is not None:
+                timeout = min(timeout, max(deadline.remaining(), self.min_request_budget))
+            retry_after = None
+            started = time.monotonic()
+            try:
+                response = shard.session.get(f"{shard.base_url}{endpoint}", params=params, timeout=timeout)
+                
+                if response.status_code == 200:
+                    data = response.json()
+                    breaker.record_success()
+                    shard.record_success()
+                    if use_cache and cache_key:
+                        stored_at = time.time()
+                        self._cache_set(cache_key, data, stored_at)
+                        if self.shared_cache is not None:
+                            self.shared_cache.set(cache_key, data, stored_at)
+                    if self.observer:
+                        self.observer(endpoint, params, data, False, time.monotonic() - started)
+                    return data
+                elif response.status_code == 403:
+                    breaker.record_success()
+                    shard.record_success()
+                    logger.warning("Qloo access forbidden for %s with params %s", endpoint, params)
+                    return None
+                elif response.status_code not in policy.retry_statuses:
+                    breaker.record_success()
+                    shard.record_success()
+                    logger.warning("Qloo request to %s failed: %s - %s", endpoint, response.status_code,
+                                   response.content[:100].decode(errors="replace"))
+                    return None
+                
+                logger.warning("Qloo request to %s failed: %s - %s", endpoint, response.status_code,
+                               response.content[:100].decode(errors="replace"))
+                retry_after = response.headers.get("Retry-After")
+                shard.record_failure(
+                    throttled=response.status_code == 429,
+                    retry_after=float(retry_after) if retry_after and retry_after.isdigit() else None
+                )
+            except (requests.Timeout, requests.ConnectionError) as e:
+                logger.warning("Qloo request to %s failed: %s", endpoint, e)
+                shard.record_failure()
+            except Exception as e:
+                breaker.record_failure()
+                logger.error("Qloo request to %s failed: %s", endpoint, e, exc_info=True)
+                return None
+            
+            if attempt < policy.max_retries:
+                delay = policy.backoff(attempt)
+                # Honour Retry-After unless another shard can take the retry
+                if retry_after and retry_after.isdigit() and self._route(route_key, exclude=shard) in (shard, None):
+                    delay = max(delay, min(float(retry_after), policy.backoff_max))
+                if deadline is not None and deadline.remaining() < delay + self.min_request_budget:
+                    deadline.mark_partial(f"qloo{endpoint} retries cut short: deadline")
+                    break
+                time.sleep(delay)
+        
+        breaker.record_failure()
+        return None
     
     def search(self, query: str, limit: int = 20, offset: int = 0) -> List[QlooEntity]:
         """
         Search for entities across all categories
         This is the main working endpoint for the hackathon API
         """
+        canonical = canonicalize_query(query)
+        if not canonical:
+            return []
+        # The query goes upstream as typed, only trimmed; its canonical form is the cache key
+        query = " ".join(query.split())
         params = {
             "query": query,
             "limit": limit,
             "offset": offset
         }
+        cache_key = self._search_key(query, limit, offset)
         
-        data = self._make_request("/search", params)
+        stats = self.search_stats
+        stats["lookups"] += 1
+        rewritten = canonical != query
+        stats["rewritten"] += int(rewritten)
+        with self._span("qloo_search"):
+            data = None
+            if self._cache_get(cache_key) is not None:
+                stats["hits"] += 1
+                stats["rewritten_hits"] += int(rewritten)
+            else:
+                # A smaller page of a query is the head of any larger cached page
+                data = self._cached_page(query, limit, offset)
+                if data is not None:
+                    stats["page_hits"] += 1
+                    self.cache_hits += 1
+                    if self.observer:
+                        self.observer("/search", params, data, True, 0.0)
+            if data is None:
+                data = self._make_request("/search", params, cache_key=cache_key)
+                if data is not None:
+                    self._index_page(query, limit, offset, cache_key)
         if not data or "results" not in data:
             return []
         
@@ -150,12 +853,13 @@ class QlooAPI:
         
         queries = category_queries.get(category.lower(), [category])
         all_entities = []
-        
-        for query in queries[:2]:  # Limit to 2 queries to avoid rate limits
-            entities = self.search(query, limit=limit//2)
-            all_entities.extend(entities)
-            if len(all_entities) >= limit:
-                break
+        with shared_lookups():
+            self.warm_from_shared(queries[:2], limit//2)
+            for query in queries[:2]:  # Limit to 2 queries to avoid rate limits
+                entities = self.search(query, limit=limit//2)
+                all_entities.extend(entities)
+                if len(all_entities) >= limit:
+                    break
         
         # Remove duplicates based on name
         seen_names = set()
@@ -179,16 +883,17 @@ class QlooAPI:
             f"{entity_name} related",
             entity_name.split()[0] if " " in entity_name else entity_name  # First word
         ]
-        
         all_entities = []
-        for pattern in search_patterns:
-            entities = self.search(pattern, limit=limit//2)
-            # Filter out exact matches
-            filtered = [e for e in entities if e.name.lower() != entity_name.lower()]
-            all_entities.extend(filtered)
-            
-            if len(all_entities) >= limit:
-                break
+        with shared_lookups():
+            self.warm_from_shared(search_patterns, limit//2)
+            for pattern in search_patterns:
+                entities = self.search(pattern, limit=limit//2)
+                # Filter out exact matches
+                filtered = [e for e in entities if e.name.lower() != entity_name.lower()]
+                all_entities.extend(filtered)
+                
+                if len(all_entities) >= limit:
+                    break
         
         # Remove duplicates and return
         seen_names = set()
@@ -208,11 +913,12 @@ class QlooAPI:
             queries = [f"trending {category}", f"popular {category}", f"hot {category}"]
         else:
             queries = ["trending", "popular", "hot", "viral"]
-        
-        for query in queries:
-            entities = self.search(query, limit=limit)
-            if entities:
-                return entities
+        with shared_lookups():
+            self.warm_from_shared(queries, limit)
+            for query in queries:
+                entities = self.search(query, limit=limit)
+                if entities:
+                    return entities
         
         return []
     
@@ -222,9 +928,11 @@ class QlooAPI:
         Useful for building comprehensive discovery experiences
         """
         results = {}
-        for query in queries:
-            entities = self.search(query, limit=limit_per_query)
-            results[query] = entities
+        with shared_lookups():
+            self.warm_from_shared(queries, limit_per_query)
+            for query in queries:
+                entities = self.search(query, limit=limit_per_query)
+                results[query] = entities
         return results
     
     def build_taste_profile(self, user_interests: List[str]) -> Dict[str, List[QlooEntity]]:
@@ -233,58 +941,83 @@ class QlooAPI:
         Returns categorized recommendations
         """
         profile = {}
-        
-        for interest in user_interests:
-            # Search for the interest
-            entities = self.search(interest, limit=10)
-            
-            if entities:
-                # Group by category
-                categorized = {}
-                for entity in entities:
-                    category = entity.get_category()
-                    if category not in categorized:
-                        categorized[category] = []
-                    categorized[category].append(entity)
-                
-                profile[interest] = categorized
+        with shared_lookups():
+            self.warm_from_shared(user_interests, 10)
+            for interest in user_interests:
+                categorized = self.interest_profile(interest)
+                if categorized:
+                    profile[interest] = categorized
         
         return profile
     
+    def interest_profile(self, interest: str) -> Dict[str, List[QlooEntity]]:
+        """Entities for one interest grouped by category (empty when nothing was found)"""
+        # Search for the interest
+        entities = self.search(interest, limit=10)
+        
+        # Group by category
+        categorized = {}
+        for entity in entities:
+            category = entity.get_category()
+            if category not in categorized:
+                categorized[category] = []
+            categorized[category].append(entity)
+        
+        return categorized
+    
     def cross_domain_discovery(self, seed_entity: str, target_domains: List[str], limit: int = 5) -> Dict[str, List[QlooEntity]]:
         """
         Discover items across different domains based on a seed entity
         E.g., from "Taylor Swift" find movies, books, fashion related to pop culture
         """
         results = {}
+        with shared_lookups():
+            self.warm_domains(seed_entity, target_domains, limit)
+            for domain in target_domains:
+                results[domain] = self.domain_discovery(seed_entity, domain, limit=limit)
         
-        for domain in target_domains:
-            # Create cross-domain search queries
-            queries = [
-                f"{seed_entity} {domain}",
-                f"{domain} like {seed_entity}",
-                f"{domain} inspired by {seed_entity}"
-            ]
-            
-            domain_entities = []
+        return results
+    
+    @staticmethod
+    def domain_queries(seed_entity: str, domain: str) -> List[str]:
+        """Cross-domain search queries for one domain"""
+        return [
+            f"{seed_entity} {domain}",
+            f"{domain} like {seed_entity}",
+            f"{domain} inspired by {seed_entity}"
+        ]
+    
+    def warm_domains(self, seed_entity: str, domains: List[str], limit: int = 5) -> int:
+        """One batched shared-cache lookup for every domain_discovery() of a seed
+
+        Call inside shared_lookups() so the domain_discovery() calls do not repeat it
+        """
+        queries = [query for domain in domains for query in self.domain_queries(seed_entity, domain)]
+        return self.warm_from_shared(queries, limit//3 + 1)
+    
+    def domain_discovery(self, seed_entity: str, domain: str, limit: int = 5) -> List[QlooEntity]:
+        """Items in one domain related to a seed entity"""
+        queries = self.domain_queries(seed_entity, domain)
+        domain_entities = []
+        with shared_lookups():
+            # A no-op after warm_domains() in the same shared_lookups() block
+            self.warm_from_shared(queries, limit//len(queries) + 1)
             for query in queries:
                 entities = self.search(query, limit=limit//len(queries) + 1)
                 domain_entities.extend(entities)
                 
                 if len(domain_entities) >= limit:
                     break
-            
-            # Remove duplicates
-            seen_names = set()
-            unique_entities = []
-            for entity in domain_entities:
-                if entity.name not in seen_names:
-                    seen_names.add(entity.name)
-                    unique_entities.append(entity)
-            
-            results[domain] = unique_entities[:limit]
         
-        return results
+        # Remove duplicates
+        seen_names = set()
+        unique_entities = []
+        for entity in domain_entities:
+            if entity.name not in seen_names:
+                seen_names.add(entity.name)
+                unique_entities.append(entity)
+        
+        return unique_entities[:limit]
 
 
 
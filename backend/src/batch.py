@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+Offline batch job for precomputed recommendations and taste profiles
+Fans seeds or users out over a process pool that shares one Qloo rate
+budget, scores results with the same helpers as the API, and writes them to
+a SQLite file. Finished rows double as the checkpoint: an interrupted run
+resumes where it stopped, and failed items are retried on the next run.
+Rows older than --max-age are recomputed, and --refresh recomputes every row
+from before the run started; each run is recorded in the file's meta table,
+so an interrupted refresh resumes too. Serve the output with PRECOMPUTED_DB.
+
+Usage (from backend/):
+    python -m src.batch recommendations seeds.txt --db precomputed.db
+    python -m src.batch profiles users.jsonl --db precomputed.db --workers 8 --rate 20
+
+seeds.txt holds one seed entity per line; users.jsonl one
+{"user_id": ..., "interests": [...]} object per line
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+import uuid
+
+from requests.adapters import HTTPAdapter
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from src.utils.log import configure_logging  # noqa: E402
+from src.utils.precomputed import dumps, open_output, seed_key  # noqa: E402
+
+COMMIT_EVERY = 50  # Results per transaction, i.e. the most work a crash can lose
+DEFAULT_MAX_AGE = 12 * 3600  # Rows a nightly run recomputes; a resumed run keeps tonight's
+
+_budget = None
+_options = None
+
+
+class SharedRateBudget:
+    """Request start times spaced `interval` apart across all worker processes"""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate
+        self._next_slot = multiprocessing.Value("d", 0.0, lock=False)
+        self._lock = multiprocessing.Lock()
+
+    def wait(self):
+        with self._lock:
+            now = time.time()
+            slot = max(now, self._next_slot.value)
+            self._next_slot.value = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class BudgetedAdapter(HTTPAdapter):
+    """Transport adapter that takes a slot from the shared budget before every request"""
+
+    def send(self, request, **kwargs):
+        _budget.wait()
+        return super().send(request, **kwargs)
+
+
+def _init_worker(budget: SharedRateBudget, options: dict):
+    global _budget, _options
+    _budget = budget
+    _options = options
+    # The shared budget replaces the per-process request spacing
+    os.environ["QLOO_MIN_REQUEST_INTERVAL"] = "0"
+    from src.utils.clients import get_qloo_api
+
+    api = get_qloo_api()
+    for shard in api.shards:
+        shard.session.mount("https://", BudgetedAdapter())
+        shard.session.mount("http://", BudgetedAdapter())
+
+
+def _recommend(seed: str):
+    """Worker: (key, seed, recommendations or None, error)"""
+    from src.routes.harmony import score_recommendations
+    from src.utils.clients import get_qloo_api
+
+    limit = _options["limit"]
+    try:
+        entities = get_qloo_api().find_similar(seed, limit=limit * 2)
+        if not entities:
+            return seed_key(seed), seed, None, "no results"
+        # Every candidate is stored, so the API can replace ones a user has already seen
+        return seed_key(seed), seed, score_recommendations(seed, entities, len(entities)), None
+    except Exception as e:
+        return seed_key(seed), seed, None, str(e)
+
+
+def _profile(user: dict):
+    """Worker: (user_id, user, formatted profile or None, error)"""
+    from src.routes.harmony import format_taste_profile
+    from src.utils.clients import get_qloo_api
+
+    user_id = str(user["user_id"])
+    interests = user.get("interests") or []
+    try:
+        taste_profile = get_qloo_api().build_taste_profile(interests)
+        if not taste_profile:
+            return user_id, user, None, "no results"
+        return user_id, user, format_taste_profile(interests, taste_profile), None
+    except Exception as e:
+        return user_id, user, None, str(e)
+
+
+def read_seeds(path: str):
+    seen = set()
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            seed = line.strip()
+            if seed and seed_key(seed) not in seen:
+                seen.add(seed_key(seed))
+                yield seed_key(seed), seed
+
+
+def read_users(path: str):
+    with open(path, encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                user = json.loads(line)
+                yield str(user["user_id"]), user
+            except (ValueError, KeyError, TypeError):
+                print(f"⚠️ Skipping line {number}: expected {{\"user_id\": ..., \"interests\": [...]}}")
+
+
+def pending(connection, kind: str, items, cutoff: float = 0.0):
+    """Items whose results are not in the output yet, or were computed before cutoff"""
+    table, column = ("recommendations", "seed_key") if kind == "recommendations" else ("profiles", "user_id")
+    done = {row[0] for row in connection.execute(f"SELECT {column} FROM {table} WHERE computed_at >= ?", (cutoff,))}
+    return [item for key, item in items if key not in done]
+
+
+def start_run(connection, kind: str, refresh: bool) -> dict:
+    """Record a run in meta, or continue the last one of the same kind if it was interrupted"""
+    row = connection.execute("SELECT value FROM meta WHERE key = ?", (f"{kind}_run",)).fetchone()
+    previous = json.loads(row[0]) if row is not None else None
+    if previous is not None and previous.get("finished_at") is None and previous.get("refresh") == refresh:
+        print(f"Resuming run {previous['id']} started {time.ctime(previous['started_at'])}")
+        return previous
+    current = {"id": uuid.uuid4().hex[:12], "started_at": time.time(), "refresh": refresh, "finished_at": None}
+    save_run(connection, kind, current)
+    return current
+
+
+def save_run(connection, kind: str, current: dict):
+    connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (f"{kind}_run", json.dumps(current)))
+    connection.commit()
+
+
+def store(connection, kind: str, key: str, item, result, limit: int):
+    now = time.time()
+    if kind == "recommendations":
+        connection.execute(
+            "INSERT OR REPLACE INTO recommendations (seed_key, seed, result_limit, payload, computed_at) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (key, item, limit, dumps(result), now)
+        )
+    else:
+        connection.execute(
+            "INSERT OR REPLACE INTO profiles (user_id, payload, computed_at) VALUES (?, ?, ?)",
+            (key, dumps(result), now)
+        )
+    connection.execute("DELETE FROM failures WHERE kind = ? AND key = ?", (kind, key))
+
+
+def run(kind: str, input_path: str, db_path: str, workers: int, rate: float, limit: int, refresh: bool,
+        max_age: float = DEFAULT_MAX_AGE):
+    connection = open_output(db_path)
+    items = list(read_seeds(input_path) if kind == "recommendations" else read_users(input_path))
+    current = start_run(connection, kind, refresh)
+    # Rows written by this run (or its interrupted attempts) are done; older ones are stale
+    if refresh:
+        cutoff = current["started_at"]
+    else:
+        cutoff = current["started_at"] - max_age if max_age > 0 else 0.0
+    todo = pending(connection, kind, items, cutoff)
+    print(f"{kind} run {current['id']}: {len(items)} in input, {len(items) - len(todo)} up to date, {len(todo)} to go")
+    if not todo:
+        current["finished_at"] = time.time()
+        save_run(connection, kind, current)
+        return 0
+
+    work = _recommend if kind == "recommendations" else _profile
+    budget = SharedRateBudget(rate)
+    done = failed = 0
+    started = time.time()
+    with multiprocessing.Pool(workers, initializer=_init_worker, initargs=(budget, {"limit": limit})) as pool:
+        for key, item, result, error in pool.imap_unordered(work, todo, chunksize=4):
+            if error is None:
+                store(connection, kind, key, item, result, limit)
+                done += 1
+            else:
+                connection.execute(
+                    "INSERT OR REPLACE INTO failures (kind, key, error, failed_at) VALUES (?, ?, ?, ?)",
+                    (kind, key, error, time.time())
+                )
+                failed += 1
+            if (done + failed) % COMMIT_EVERY == 0:
+                connection.commit()
+                elapsed = time.time() - started
+                remaining = (len(todo) - done - failed) * elapsed / (done + failed)
+                print(f"  {done + failed}/{len(todo)} ({failed} failed), ~{remaining:.0f}s left")
+    connection.commit()
+    current["finished_at"] = time.time()
+    save_run(connection, kind, current)
+    connection.close()
+    print(f"✅ {done} stored, {failed} failed in {time.time() - started:.1f}s")
+    return failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("kind", choices=["recommendations", "profiles"])
+    parser.add_argument("input", help="Seeds (one per line) or users (JSON lines)")
+    parser.add_argument("--db", default="precomputed.db", help="SQLite output, also the checkpoint")
+    parser.add_argument("--workers", type=int, default=4, help="Worker processes (default 4)")
+    parser.add_argument("--rate", type=float, default=10.0, help="Qloo requests per second across all workers")
+    parser.add_argument("--limit", type=int, default=8, help="Recommendations stored per seed (default 8)")
+    parser.add_argument("--refresh", action="store_true",
+                        help="Recompute every item not computed by this run (resumable)")
+    parser.add_argument("--max-age", type=float, default=DEFAULT_MAX_AGE,
+                        help=f"Recompute rows older than this many seconds (default {DEFAULT_MAX_AGE}, 0 = never)")
+    args = parser.parse_args()
+
+    configure_logging()
+    failed = run(args.kind, args.input, args.db, args.workers, args.rate, args.limit, args.refresh, args.max_age)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Cache node for the distributed Qloo response cache
+A small in-memory key/value server (LRU with a TTL) that API hosts share
+through QLOO_CACHE_NODES; run one or more next to the API for local testing
+or on dedicated hosts in production
+
+Usage (from backend/):
+    python -m src.cache_node --port 7070
+    QLOO_CACHE_NODES=http://127.0.0.1:7070,http://127.0.0.1:7071 gunicorn ...
+
+Endpoints: POST /mget {"keys": [...]} -> {"entries": {key: [stored_at, data]}},
+POST /mset {"entries": [[key, stored_at, data], ...]}, GET /stats
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from src.utils.log import configure_logging  # noqa: E402
+
+logger = logging.getLogger(__name__)
+
+MAX_BODY = 8 * 1024 * 1024  # Bytes accepted per request
+
+
+class NodeStore:
+    """LRU of key -> (stored_at, data), bounded by entry count; entries expire after ttl"""
+
+    def __init__(self, max_entries: int = 100000, ttl: Optional[float] = 3600.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.sets = 0
+        self.evictions = 0
+
+    def get_many(self, keys: List[str]) -> Dict[str, list]:
+        now = time.time()
+        found = {}
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is not None and self.ttl is not None and now - entry[0] >= self.ttl:
+                    del self._entries[key]
+                    entry = None
+                if entry is None:
+                    self.misses += 1
+                    continue
+                self._entries.move_to_end(key)
+                self.hits += 1
+                found[key] = list(entry)
+        return found
+
+    def set_many(self, entries: List[list]):
+        with self._lock:
+            for key, stored_at, data in entries:
+                current = self._entries.get(key)
+                # Never replace a fresher entry written by another host
+                if current is not None and current[0] >= stored_at:
+                    continue
+                self._entries[key] = (stored_at, data)
+                self._entries.move_to_end(key)
+                self.sets += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "sets": self.sets,
+                "evictions": self.evictions
+            }
+
+
+class CacheNodeHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive, so clients reuse connections
+    store: NodeStore = None
+
+    def _reply(self, status: int, payload: Dict):
+        body = json.dumps(payload, separators=(",", ":")).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self) -> Optional[Dict]:
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_BODY:
+            self.close_connection = True
+            return None
+        try:
+            payload = json.loads(self.rfile.read(length))
+        except ValueError:
+            return None
+        return payload if isinstance(payload, dict) else None
+
+    def do_GET(self):
+        if self.path in ("/stats", "/health"):
+            self._reply(200, self.store.stats())
+        else:
+            self._reply(404, {"error": "not found"})
+
+    def do_POST(self):
+        payload = self._read_json()
+        if payload is None:
+            self._reply(400, {"error": "expected a JSON object"})
+            return
+        try:
+            if self.path == "/mget":
+                self._reply(200, {"entries": self.store.get_many([str(key) for key in payload.get("keys", [])])})
+            elif self.path == "/mset":
+                self.store.set_many([(str(key), float(stored_at), data) for key, stored_at, data in payload.get("entries", [])])
+                self._reply(200, {"stored": True})
+            else:
+                self._reply(404, {"error": "not found"})
+        except (TypeError, ValueError):
+            self._reply(400, {"error": "malformed request"})
+
+    def log_message(self, format, *args):
+        logger.debug("%s " + format, self.address_string(), *args)
+
+
+def make_server(host: str, port: int, store: NodeStore) -> ThreadingHTTPServer:
+    handler = type("BoundCacheNodeHandler", (CacheNodeHandler,), {"store": store})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=7070)
+    parser.add_argument("--max-entries", type=int, default=100000, help="Entries kept before LRU eviction")
+    parser.add_argument("--ttl", type=float, default=3600.0, help="Seconds an entry is served; 0 = forever")
+    args = parser.parse_args()
+
+    configure_logging()
+    server = make_server(args.host, args.port, NodeStore(args.max_entries, args.ttl or None))
+    logger.info("Cache node listening on %s:%s", args.host, args.port)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -2,44 +2,73 @@ import os
 import sys
 # DON'T CHANGE THIS !!!
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
-from flask import Flask, send_from_directory
+from flask import Flask, current_app
 from flask_cors import CORS
 from dotenv import load_dotenv
-# from src.models.user import db  # Comment this out
 from src.routes.user import user_bp
 from src.routes.harmony import harmony_bp
+from src.routes.admin import admin_bp
+from src.utils.admission import init_proxy_fix
+from src.utils.cache_snapshot import init_cache_snapshots
+from src.utils.capture import init_traffic_capture
+from src.utils.deadline import init_deadlines
+from src.utils.log import init_logging
+from src.utils.profiling import init_profiling
+from src.utils.responses import init_response_encoding
+from src.utils.static_assets import init_static_assets, serve_asset
+from src.utils.tracing import init_tracing
+
+def create_app():
+    """Application factory; Qloo and Gemini clients are initialized on first use"""
+    # Load environment variables
+    load_dotenv()
+    app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
+    app.config['SECRET_KEY'] = 'asdf#FGSgvasgf$5$WGT'
+    # Structured logs written off the request path, tagged with X-Request-Id
+    init_logging(app)
+
+    # Client addresses from X-Forwarded-For behind a reverse proxy (PROXY_TRUSTED_HOPS)
+    init_proxy_fix(app)
+
+    # Enable CORS for all routes
+    CORS(app)
+    # Registered first so compression runs after every other after_request hook
+    init_response_encoding(app)
+    init_tracing(app)
+    init_deadlines(app)
+    init_profiling(app)
+    # Sampled, anonymized traffic for benchmarks/replay.py (TRAFFIC_CAPTURE_PATH)
+    init_traffic_capture(app)
+    app.register_blueprint(user_bp, url_prefix='/api')
+    app.register_blueprint(harmony_bp, url_prefix='/api')
+    app.register_blueprint(admin_bp, url_prefix='/api')
+
+    # The SQLite user store (WAL mode, pooled connections; DATABASE_URL overrides)
+    # is configured on first use by src.utils.clients.get_db
+
+    # Warm the Qloo cache from the last snapshot in the background (QLOO_CACHE_SNAPSHOT)
+    init_cache_snapshots(app)
+
+    # Frontend build: manifest is built once, requests never hit the filesystem for lookups
+    init_static_assets(app)
+    app.add_url_rule('/', 'serve', serve, defaults={'path': ''})
+    app.add_url_rule('/<path:path>', 'serve', serve)
+    return app
 
-# Load environment variables
-load_dotenv()
-app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
-app.config['SECRET_KEY'] = 'asdf#FGSgvasgf$5$WGT'
-
-# Enable CORS for all routes
-CORS(app)
-app.register_blueprint(user_bp, url_prefix='/api')
-app.register_blueprint(harmony_bp, url_prefix='/api')
-
-# uncomment if you need to use database
-# app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
-# app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-# db.init_app(app)
-# with app.app_context():
-#     db.create_all()
-
-@app.route('/', defaults={'path': ''})
-@app.route('/<path:path>')
 def serve(path):
-    static_folder_path = app.static_folder
-    if static_folder_path is None:
+    manifest = current_app.extensions.get('static_manifest')
+    if manifest is None:
             return "Static folder not configured", 404
-    if path != "" and os.path.exists(os.path.join(static_folder_path, path)):
-        return send_from_directory(static_folder_path, path)
-    else:
-        index_path = os.path.join(static_folder_path, 'index.html')
-        if os.path.exists(index_path):
-            return send_from_directory(static_folder_path, 'index.html')
-        else:
+    asset = manifest.get(path) if path != "" else None
+    if asset is None:
+        # SPA fallback
+        asset = manifest.get('index.html')
+        if asset is None:
             return "index.html not found", 404
+    return serve_asset(asset)
+
+# Module-level app for `gunicorn src.main:app` and `python src/main.py`
+app = create_app()
 
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5001, debug=True)
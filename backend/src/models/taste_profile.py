@@ -0,0 +1,65 @@
+from datetime import datetime
+from src.models.user import db
+
+class TasteProfile(db.Model):
+    """A user's stored taste profile with running category aggregates"""
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), unique=True, nullable=False, index=True)
+    category_counts = db.Column(db.JSON, nullable=False, default=dict)
+    total_entities = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+    interests = db.relationship(
+        'ProfileInterest', backref='profile', cascade='all, delete-orphan',
+        lazy='selectin', order_by='ProfileInterest.id'
+    )
+
+    def __repr__(self):
+        return f'<TasteProfile user={self.user_id}>'
+
+    def interest_names(self):
+        return [item.interest for item in self.interests]
+
+    def add_interest(self, interest, categories):
+        """Store one interest's formatted results and fold them into the aggregates"""
+        counts = dict(self.category_counts or {})
+        entity_count = 0
+        for category, entities in categories.items():
+            counts[category] = counts.get(category, 0) + len(entities)
+            entity_count += len(entities)
+
+        self.interests.append(ProfileInterest(interest=interest, categories=categories, entity_count=entity_count))
+        # Reassign so SQLAlchemy notices the JSON change
+        self.category_counts = counts
+        self.total_entities += entity_count
+        self.updated_at = datetime.now()
+
+    def remove_interest(self, interest):
+        """Drop one interest and subtract its contribution from the aggregates"""
+        item = next((item for item in self.interests if item.interest == interest), None)
+        if item is None:
+            return False
+
+        counts = dict(self.category_counts or {})
+        for category, entities in item.categories.items():
+            remaining = counts.get(category, 0) - len(entities)
+            if remaining > 0:
+                counts[category] = remaining
+            else:
+                counts.pop(category, None)
+
+        self.interests.remove(item)
+        self.category_counts = counts
+        self.total_entities -= item.entity_count
+        self.updated_at = datetime.now()
+        return True
+
+class ProfileInterest(db.Model):
+    """Formatted Qloo results for one interest of a taste profile"""
+    __table_args__ = (db.UniqueConstraint('profile_id', 'interest'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    profile_id = db.Column(db.Integer, db.ForeignKey('taste_profile.id', ondelete='CASCADE'), nullable=False, index=True)
+    interest = db.Column(db.String(200), nullable=False)
+    categories = db.Column(db.JSON, nullable=False, default=dict)
+    entity_count = db.Column(db.Integer, nullable=False, default=0)
+    fetched_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
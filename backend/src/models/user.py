@@ -1,11 +1,26 @@
+import os
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
 
 db = SQLAlchemy()
 
+# Applied to every new SQLite connection; WAL lets readers in other gunicorn
+# workers proceed while one worker writes
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": 5000,
+    "cache_size": -20000,  # ~20MB page cache per connection
+    "temp_store": "MEMORY",
+    "mmap_size": 268435456,
+    "foreign_keys": "ON"
+}
+
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    username = db.Column(db.String(80), unique=True, nullable=False)
-    email = db.Column(db.String(120), unique=True, nullable=False)
+    username = db.Column(db.String(80), unique=True, nullable=False, index=True)
+    email = db.Column(db.String(120), unique=True, nullable=False, index=True)
 
     def __repr__(self):
         return f'<User {self.username}>'
@@ -16,3 +31,41 @@ class User(db.Model):
             'username': self.username,
             'email': self.email
         }
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for pragma, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {pragma}={value}")
+    cursor.close()
+
+def configure_database(app):
+    """Configure the SQLite user store and create its tables"""
+    database_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'database')
+    default_uri = f"sqlite:///{os.path.join(database_dir, 'app.db')}"
+    app.config.setdefault('SQLALCHEMY_DATABASE_URI', os.getenv('DATABASE_URL', default_uri))
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+
+    uri = app.config['SQLALCHEMY_DATABASE_URI']
+    if uri.startswith('sqlite') and uri not in ('sqlite://', 'sqlite:///:memory:'):
+        if uri == default_uri:
+            os.makedirs(database_dir, exist_ok=True)
+        app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', {
+            'pool_size': int(os.getenv('DB_POOL_SIZE', '5')),
+            'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', '10')),
+            'pool_timeout': 10,
+            'connect_args': {'timeout': 30, 'check_same_thread': False}
+        })
+
+    # Register every model before create_all, whichever one was used first
+    import src.models.taste_profile  # noqa: F401
+
+    db.init_app(app)
+    with app.app_context():
+        if db.engine.dialect.name == 'sqlite':
+            event.listen(db.engine, 'connect', _set_sqlite_pragmas)
+        try:
+            db.create_all()
+        except OperationalError as e:
+            # Another worker created the tables concurrently
+            if 'already exists' not in str(e):
+                raise
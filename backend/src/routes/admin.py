@@ -0,0 +1,28 @@
+from flask import Blueprint, Response, abort, jsonify, request
+from src.utils.profiling import admin_authorized, profiler
+
+admin_bp = Blueprint('admin', __name__)
+
+@admin_bp.before_request
+def require_admin_token():
+    if not admin_authorized():
+        abort(404)
+
+@admin_bp.route('/admin/profiler', methods=['POST'])
+def start_profiler():
+    seconds = float(request.args.get('seconds', 30))
+    interval_ms = float(request.args.get('interval_ms', 10))
+    if not profiler.start(seconds, interval_ms / 1000):
+        return jsonify({'success': False, 'error': 'Profiler already running', 'status': profiler.status()}), 409
+    return jsonify({'success': True, 'status': profiler.status()}), 202
+
+@admin_bp.route('/admin/profiler', methods=['GET'])
+def get_profile():
+    if request.args.get('format') == 'collapsed':
+        return Response(profiler.collapsed(), mimetype='text/plain')
+    return jsonify({'success': True, 'status': profiler.status()})
+
+@admin_bp.route('/admin/profiler', methods=['DELETE'])
+def stop_profiler():
+    profiler.stop()
+    return jsonify({'success': True, 'status': profiler.status()})
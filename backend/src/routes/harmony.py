@@ -1,17 +1,147 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, g, request, jsonify, url_for
+import logging
 import os
-import google.generativeai as genai
-from qloo_api import QlooAPI
+import time
+from qloo_api import reset_request_priority, set_request_priority, shared_lookups
+from src.utils.admission import admission_from_env
+from src.utils.clients import clients_loaded, get_db, get_qloo_api
+from src.utils.deadline import DeadlineExceeded, deadline_scope, has_budget, is_partial, mark_partial, remaining_time
+from src.utils.exposure import exposure_from_env
+from src.utils.gemini import generate_with_gemini, tier_stats, trim_names
+from src.utils.jobs import JobQueue, QueueFull
+from src.utils.log import logging_stats
+from src.utils.precomputed import store_from_env
+from src.utils.prefetch import Prefetcher
+from src.utils.streaming import ndjson_response, run_concurrently, wants_stream
+from src.utils.text_cache import NearDuplicateCache
+from src.utils.tracing import span
 import json
-import traceback
+import math
 import random
 from datetime import datetime
 
 harmony_bp = Blueprint("harmony", __name__)
+logger = logging.getLogger(__name__)
 
-# Initialize APIs
-qloo_api = QlooAPI(os.getenv("QLOO_API_KEY"))
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+# Qloo and Gemini clients are created on first use (see src.utils.clients)
+
+# Minimum remaining budget (seconds) for optional Qloo fallbacks
+FALLBACK_MIN_BUDGET = 2.0
+
+# Gemini mood analyses, reused for identical and near-identical texts
+mood_cache = NearDuplicateCache(
+    max_entries=int(os.getenv("MOOD_CACHE_SIZE", "5000")),
+    ttl=float(os.getenv("MOOD_CACHE_TTL", "3600")),
+    max_distance=int(os.getenv("MOOD_CACHE_MAX_DISTANCE", "5"))
+)
+
+# Batched mood analysis: texts per request, and per-prompt packing limits
+MOOD_BATCH_MAX_ITEMS = 500
+MOOD_BATCH_PROMPT_ITEMS = 100
+MOOD_BATCH_PROMPT_CHARS = 24000
+MOOD_TEXT_MAX_CHARS = 2000
+
+# Categories produced by QlooEntity.get_category, used to normalize diversity
+PROFILE_CATEGORIES = ("music", "movie", "book", "restaurant", "fashion", "general")
+
+# Budget (seconds) for a queued story generation, which no longer holds a request worker
+STORY_JOB_TIMEOUT = float(os.getenv("STORY_JOB_TIMEOUT", "120"))
+
+# Opt-in: warm /recommendations for the top discover results (PREFETCH_TOP_N > 0)
+PREFETCH_TOP_N = int(os.getenv("PREFETCH_TOP_N", "0"))
+PREFETCH_LIMIT = 16  # find_similar limit used by /recommendations with its default limit of 8
+
+prefetcher = Prefetcher(
+    # Same searches /recommendations makes; the first one tells whether the seed is warm
+    warm=lambda seed: get_qloo_api().find_similar(seed, limit=PREFETCH_LIMIT),
+    is_warm=lambda seed: get_qloo_api().search_cached(f"similar to {seed}", limit=PREFETCH_LIMIT // 2),
+    rate_per_minute=float(os.getenv("PREFETCH_RATE_PER_MINUTE", "30")),
+    max_pending=int(os.getenv("PREFETCH_QUEUE_SIZE", "50"))
+)
+
+# Nightly batch output (python -m src.batch) served by /recommendations when PRECOMPUTED_DB is set
+precomputed = store_from_env()
+
+# What each user was already shown, so /discover, /recommendations and /trending can skip or sink it
+exposure = exposure_from_env()
+
+def exposure_user(data=None):
+    """User whose exposure history shapes the ranking: user_id in the body or query, or X-User-Id"""
+    user = (data or {}).get("user_id") or request.args.get("user_id") or request.headers.get("X-User-Id")
+    return str(user) if user else None
+
+def result_name(result):
+    return result["name"]
+
+# Qloo priority class per endpoint (others are interactive); see qloo_api.RequestScheduler
+ENDPOINT_PRIORITIES = {
+    "harmony.get_trending": "background",
+    "harmony.build_taste_profile": "bulk",
+    "harmony.analyze_mood_batch": "bulk"
+}
+
+@harmony_bp.before_request
+def _set_qloo_priority():
+    priority = ENDPOINT_PRIORITIES.get(request.endpoint)
+    if priority:
+        g._qloo_priority_token = set_request_priority(priority)
+
+@harmony_bp.teardown_request
+def _reset_qloo_priority(exc=None):
+    token = g.pop("_qloo_priority_token", None)
+    if token is not None:
+        reset_request_priority(token)
+
+# Trending searches per time period (shared with the admission check below)
+TRENDING_QUERIES = {
+    "current": ["trending music", "popular songs", "hot tracks"],
+    "week": ["weekly trending music", "this week popular", "weekly hits"],
+    "month": ["monthly trending music", "this month popular", "monthly hits"]
+}
+
+# Per-endpoint concurrency limits with a short wait queue; see src.utils.admission
+admission = admission_from_env()
+
+def _trending_cached():
+    """Whether /trending with the current arguments is answered from the Qloo cache"""
+    if not clients_loaded()["qloo"]:
+        return False
+    queries = TRENDING_QUERIES.get(request.args.get("time_period", "current"), TRENDING_QUERIES["current"])
+    try:
+        limit = int(request.args.get("limit", 12))
+    except ValueError:
+        return False
+    api = get_qloo_api()
+    return all(api.search_cached(query, limit=limit//len(queries) + 2) for query in queries)
+
+# Cheap requests that never queue: health, job polling, async job submission, cached trending
+ADMISSION_EXEMPT = {
+    "harmony.health_check": lambda: True,
+    "harmony.get_story_job": lambda: True,
+    "harmony.generate_story": lambda: request.args.get("async") in ("1", "true"),
+    "harmony.get_trending": _trending_cached
+}
+
+@harmony_bp.before_request
+def _admit_request():
+    exempt = ADMISSION_EXEMPT.get(request.endpoint)
+    if request.endpoint is None or (exempt and exempt()):
+        return None
+    limiter, rejection = admission.admit(request.endpoint, client=request.remote_addr, timeout=remaining_time())
+    if rejection:
+        status, retry_after, message = rejection
+        response = jsonify({"success": False, "error": message})
+        response.status_code = status
+        response.headers["Retry-After"] = str(retry_after)
+        return response
+    g._admission = (limiter, time.monotonic())
+
+@harmony_bp.teardown_request
+def _release_admission(exc=None):
+    admitted = g.pop("_admission", None)
+    if admitted is not None:
+        limiter, started = admitted
+        limiter.release(time.monotonic() - started)
 
 @harmony_bp.route("/discover", methods=["POST"])
 def discover_music():
@@ -22,38 +152,42 @@ def discover_music():
         mood = data.get("mood", "happy")
         genre_preference = data.get("genre", "")
         limit = data.get("limit", 10)
+        user = exposure_user(data)
         
         # Build enhanced search query
         search_query = f"{user_input} {genre_preference} music"
         
         # Search with Qloo
-        music_entities = qloo_api.search(search_query, limit=limit * 2)
+        music_entities = get_qloo_api().search(search_query, limit=limit * 2)
         
         # Enhanced filtering and scoring
-        music_results = []
-        for entity in music_entities:
-            if entity.get_category() == "music" or "music" in str(entity.types).lower():
-                # Calculate relevance score
-                relevance_score = calculate_relevance_score(entity, mood, genre_preference)
-                
-                music_results.append({
-                    "name": entity.name,
-                    "category": entity.get_category(),
-                    "types": entity.types,
-                    "popularity": entity.popularity,
-                    "relevance_score": relevance_score,
-                    "mood_match": get_mood_match(entity, mood),
-                    "genre_tags": extract_genre_tags(entity)
-                })
-        
-        # Sort by relevance score and limit results
-        music_results.sort(key=lambda x: x["relevance_score"], reverse=True)
-        music_results = music_results[:limit]
+        with span("score"):
+            music_results = []
+            for entity in music_entities:
+                if entity.get_category() == "music" or "music" in str(entity.types).lower():
+                    # Calculate relevance score
+                    relevance_score = calculate_relevance_score(entity, mood, genre_preference)
+                    
+                    music_results.append({
+                        "name": entity.name,
+                        "category": entity.get_category(),
+                        "types": entity.types,
+                        "popularity": entity.popularity,
+                        "relevance_score": relevance_score,
+                        "mood_match": get_mood_match(entity, mood),
+                        "genre_tags": extract_genre_tags(entity)
+                    })
+            
+            # Sort by relevance score, move what the user has already seen down, and limit results
+            music_results.sort(key=lambda x: x["relevance_score"], reverse=True)
+            music_results = exposure.rank(user, music_results, result_name)[:limit]
         
-        # If not enough results, perform broader search
-        if len(music_results) < 5:
-            additional_entities = qloo_api.discover_by_category("music", limit=10)
-            for entity in additional_entities:
+        # If not enough results, perform broader search (optional, needs budget)
+        if len(music_results) < 5 and not has_budget(FALLBACK_MIN_BUDGET):
+            mark_partial("discover fallback skipped: deadline")
+        elif len(music_results) < 5:
+            additional_entities = get_qloo_api().discover_by_category("music", limit=10)
+            for entity in exposure.rank(user, additional_entities, lambda entity: entity.name):
                 if entity.name not in [r["name"] for r in music_results]:
                     music_results.append({
                         "name": entity.name,
@@ -65,6 +199,11 @@ def discover_music():
                         "genre_tags": extract_genre_tags(entity)
                     })
         
+        # Users usually open one of the top results next: warm its recommendations
+        if PREFETCH_TOP_N > 0:
+            prefetcher.submit([result["name"] for result in music_results[:PREFETCH_TOP_N]])
+        
+        exposure.record(user, [result["name"] for result in music_results[:limit]])
         return jsonify({
             "success": True,
             "results": music_results[:limit],
@@ -73,13 +212,13 @@ def discover_music():
             "search_metadata": {
                 "mood": mood,
                 "genre": genre_preference,
-                "timestamp": datetime.now().isoformat()
+                "timestamp": datetime.now().isoformat(),
+                "partial": is_partial()
             }
         })
         
     except Exception as e:
-        print(f"Error in discover_music: {e}")
-        traceback.print_exc()
+        logger.exception("Error in discover_music")
         return jsonify({
             "success": False,
             "error": str(e)
@@ -90,194 +229,263 @@ def generate_story():
     """Generate enhanced personalized stories with multiple styles and themes"""
     try:
         data = request.get_json()
-        music_preferences = data.get("music_preferences", [])
-        user_name = data.get("user_name", "User")
-        story_type = data.get("story_type", "journey")
-        story_length = data.get("story_length", "medium")  # short, medium, long
-        theme = data.get("theme", "inspirational")  # inspirational, nostalgic, adventurous
-        
-        # Prepare enhanced prompt for Gemini
-        music_list = ", ".join([music["name"] for music in music_preferences[:8]])
-        
-        # Enhanced story prompts with themes
-        prompts = {
-            "journey": {
-                "inspirational": f"""
-                Write an inspiring and uplifting story about {user_name}'s transformative musical journey.
-                
-                Featured music: {music_list}
-                
-                The story should:
-                - Be written in second person ("You")
-                - Be approximately {get_word_count(story_length)} words
-                - Show how music became a source of strength and growth
-                - Include specific moments where each song played a pivotal role
-                - Incorporate sensory details and emotional depth
-                - End with a powerful message about the future
-                
-                Start with "Your musical awakening began..." and weave each song into key life moments.
-                """,
-                "nostalgic": f"""
-                Write a deeply nostalgic story about {user_name}'s musical memories and connections.
-                
-                Featured music: {music_list}
-                
-                The story should:
-                - Be written in second person ("You")
-                - Be approximately {get_word_count(story_length)} words
-                - Evoke strong memories and emotional connections
-                - Show how music connects to specific people, places, and times
-                - Include bittersweet moments and cherished memories
-                - End with reflection on how music preserves our past
-                
-                Start with "The first notes took you back..." and explore the emotional landscape of memory.
-                """,
-                "adventurous": f"""
-                Write an adventurous story about {user_name}'s musical exploration and discovery.
-                
-                Featured music: {music_list}
-                
-                The story should:
-                - Be written in second person ("You")
-                - Be approximately {get_word_count(story_length)} words
-                - Frame music discovery as an exciting quest
-                - Include unexpected discoveries and bold choices
-                - Show courage in exploring new musical territories
-                - End with anticipation for future musical adventures
-                
-                Start with "Your musical expedition began..." and treat each discovery as a new frontier.
-                """
-            },
-            "concert": {
-                "inspirational": f"""
-                Write an electrifying story about {user_name} experiencing a life-changing concert.
-                
-                The concert features: {music_list}
-                
-                The story should:
-                - Be written in second person ("You")
-                - Be approximately {get_word_count(story_length)} words
-                - Capture the transformative power of live music
-                - Include detailed descriptions of lights, sound, and crowd energy
-                - Show personal breakthrough moments during the performance
-                - End with lasting impact and renewed purpose
-                
-                Start with "The venue doors opened..." and build to an emotional crescendo.
-                """,
-                "nostalgic": f"""
-                Write a touching story about {user_name} at a concert that brings back precious memories.
-                
-                The concert features: {music_list}
-                
-                The story should:
-                - Be written in second person ("You")
-                - Be approximately {get_word_count(story_length)} words
-                - Connect live music to cherished memories
-                - Include moments of recognition and emotional connection
-                - Show how music bridges past and present
-                - End with gratitude for musical memories
-                
-                Start with "As the first song began..." and weave memories throughout the performance.
-                """,
-                "adventurous": f"""
-                Write a thrilling story about {user_name} at an unexpected and amazing concert experience.
-                
-                The concert features: {music_list}
-                
-                The story should:
-                - Be written in second person ("You")
-                - Be approximately {get_word_count(story_length)} words
-                - Include surprising elements and unexpected moments
-                - Show spontaneous decisions and bold experiences
-                - Capture the thrill of musical discovery
-                - End with excitement for future musical adventures
-                
-                Start with "You never expected..." and build an exciting narrative.
-                """
-            },
-            "playlist": {
-                "inspirational": f"""
-                Write an empowering story about {user_name} creating a playlist that changes their life.
-                
-                Including: {music_list}
-                
-                The story should:
-                - Be written in second person ("You")
-                - Be approximately {get_word_count(story_length)} words
-                - Show how curating music becomes an act of self-discovery
-                - Explain the deeper meaning behind each song choice
-                - Include moments of clarity and personal growth
-                - End with confidence and self-understanding
-                
-                Start with "You opened your music app with purpose..." and show intentional curation.
-                """,
-                "nostalgic": f"""
-                Write a heartwarming story about {user_name} creating a playlist filled with meaningful memories.
-                
-                Including: {music_list}
-                
-                The story should:
-                - Be written in second person ("You")
-                - Be approximately {get_word_count(story_length)} words
-                - Connect each song to a specific memory or person
-                - Show how music preserves relationships and moments
-                - Include emotional discoveries while organizing music
-                - End with appreciation for music's role in life
-                
-                Start with "Each song held a story..." and explore the memories within.
-                """,
-                "adventurous": f"""
-                Write an exciting story about {user_name} creating a playlist for their next big adventure.
-                
-                Including: {music_list}
-                
-                The story should:
-                - Be written in second person ("You")
-                - Be approximately {get_word_count(story_length)} words
-                - Frame playlist creation as preparation for adventure
-                - Show bold musical choices and risk-taking
-                - Include anticipation and excitement for what's ahead
-                - End with readiness to embrace new experiences
-                
-                Start with "The adventure playlist needed..." and build anticipation.
-                """
-            }
-        }
-        
-        # Select appropriate prompt
-        prompt = prompts.get(story_type, {}).get(theme, prompts["journey"]["inspirational"])
         
-        # Generate story with Gemini
-        model = genai.GenerativeModel("gemini-2.5-flash")
-        response = model.generate_content(prompt)
+        # Job mode: queue the generation and let the client poll or get a callback
+        if request.args.get("async") in ("1", "true"):
+            return enqueue_story_job(data)
         
-        # Calculate story metrics
-        story_text = response.text
-        word_count = len(story_text.split())
-        reading_time = max(1, word_count // 200)  # Approximate reading time in minutes
+        return jsonify(create_story(data))
         
+    except DeadlineExceeded:
         return jsonify({
-            "success": True,
-            "story": story_text,
-            "story_type": story_type,
-            "theme": theme,
-            "music_featured": music_list,
-            "metadata": {
-                "word_count": word_count,
-                "reading_time_minutes": reading_time,
-                "generated_at": datetime.now().isoformat(),
-                "story_length": story_length
-            }
-        })
-        
+            "success": False,
+            "error": "Story generation timed out. Please try again."
+        }), 504
     except Exception as e:
-        print(f"Error in generate_story: {e}")
-        traceback.print_exc()
+        logger.exception("Error in generate_story")
         return jsonify({
             "success": False,
             "error": str(e)
         }), 500
 
+def create_story(data):
+    """Generate a story with Gemini; shared by the sync route and story jobs"""
+    music_preferences = data.get("music_preferences", [])
+    user_name = data.get("user_name", "User")
+    story_type = data.get("story_type", "journey")
+    story_length = data.get("story_length", "medium")  # short, medium, long
+    theme = data.get("theme", "inspirational")  # inspirational, nostalgic, adventurous
+    
+    # Prepare enhanced prompt for Gemini
+    music_list = ", ".join(trim_names([music["name"] for music in music_preferences[:8]]))
+    
+    # Enhanced story prompts with themes
+    prompts = {
+        "journey": {
+            "inspirational": f"""
+            Write an inspiring and uplifting story about {user_name}'s transformative musical journey.
+            
+            Featured music: {music_list}
+            
+            The story should:
+            - Be written in second person ("You")
+            - Be approximately {get_word_count(story_length)} words
+            - Show how music became a source of strength and growth
+            - Include specific moments where each song played a pivotal role
+            - Incorporate sensory details and emotional depth
+            - End with a powerful message about the future
+            
+            Start with "Your musical awakening began..." and weave each song into key life moments.
+            """,
+            "nostalgic": f"""
+            Write a deeply nostalgic story about {user_name}'s musical memories and connections.
+            
+            Featured music: {music_list}
+            
+            The story should:
+            - Be written in second person ("You")
+            - Be approximately {get_word_count(story_length)} words
+            - Evoke strong memories and emotional connections
+            - Show how music connects to specific people, places, and times
+            - Include bittersweet moments and cherished memories
+            - End with reflection on how music preserves our past
+            
+            Start with "The first notes took you back..." and explore the emotional landscape of memory.
+            """,
+            "adventurous": f"""
+            Write an adventurous story about {user_name}'s musical exploration and discovery.
+            
+            Featured music: {music_list}
+            
+            The story should:
+            - Be written in second person ("You")
+            - Be approximately {get_word_count(story_length)} words
+            - Frame music discovery as an exciting quest
+            - Include unexpected discoveries and bold choices
+            - Show courage in exploring new musical territories
+            - End with anticipation for future musical adventures
+            
+            Start with "Your musical expedition began..." and treat each discovery as a new frontier.
+            """
+        },
+        "concert": {
+            "inspirational": f"""
+            Write an electrifying story about {user_name} experiencing a life-changing concert.
+            
+            The concert features: {music_list}
+            
+            The story should:
+            - Be written in second person ("You")
+            - Be approximately {get_word_count(story_length)} words
+            - Capture the transformative power of live music
+            - Include detailed descriptions of lights, sound, and crowd energy
+            - Show personal breakthrough moments during the performance
+            - End with lasting impact and renewed purpose
+            
+            Start with "The venue doors opened..." and build to an emotional crescendo.
+            """,
+            "nostalgic": f"""
+            Write a touching story about {user_name} at a concert that brings back precious memories.
+            
+            The concert features: {music_list}
+            
+            The story should:
+            - Be written in second person ("You")
+            - Be approximately {get_word_count(story_length)} words
+            - Connect live music to cherished memories
+            - Include moments of recognition and emotional connection
+            - Show how music bridges past and present
+            - End with gratitude for musical memories
+            
+            Start with "As the first song began..." and weave memories throughout the performance.
+            """,
+            "adventurous": f"""
+            Write a thrilling story about {user_name} at an unexpected and amazing concert experience.
+            
+            The concert features: {music_list}
+            
+            The story should:
+            - Be written in second person ("You")
+            - Be approximately {get_word_count(story_length)} words
+            - Include surprising elements and unexpected moments
+            - Show spontaneous decisions and bold experiences
+            - Capture the thrill of musical discovery
+            - End with excitement for future musical adventures
+            
+            Start with "You never expected..." and build an exciting narrative.
+            """
+        },
+        "playlist": {
+            "inspirational": f"""
+            Write an empowering story about {user_name} creating a playlist that changes their life.
+            
+            Including: {music_list}
+            
+            The story should:
+            - Be written in second person ("You")
+            - Be approximately {get_word_count(story_length)} words
+            - Show how curating music becomes an act of self-discovery
+            - Explain the deeper meaning behind each song choice
+            - Include moments of clarity and personal growth
+            - End with confidence and self-understanding
+            
+            Start with "You opened your music app with purpose..." and show intentional curation.
+            """,
+            "nostalgic": f"""
+            Write a heartwarming story about {user_name} creating a playlist filled with meaningful memories.
+            
+            Including: {music_list}
+            
+            The story should:
+            - Be written in second person ("You")
+            - Be approximately {get_word_count(story_length)} words
+            - Connect each song to a specific memory or person
+            - Show how music preserves relationships and moments
+            - Include emotional discoveries while organizing music
+            - End with appreciation for music's role in life
+            
+            Start with "Each song held a story..." and explore the memories within.
+            """,
+            "adventurous": f"""
+            Write an exciting story about {user_name} creating a playlist for their next big adventure.
+            
+            Including: {music_list}
+            
+            The story should:
+            - Be written in second person ("You")
+            - Be approximately {get_word_count(story_length)} words
+            - Frame playlist creation as preparation for adventure
+            - Show bold musical choices and risk-taking
+            - Include anticipation and excitement for what's ahead
+            - End with readiness to embrace new experiences
+            
+            Start with "The adventure playlist needed..." and build anticipation.
+            """
+        }
+    }
+    
+    # Select appropriate prompt
+    prompt = prompts.get(story_type, {}).get(theme, prompts["journey"]["inspirational"])
+    
+    # Generate story with Gemini
+    response = generate_with_gemini(prompt, "story", story_length=story_length)
+    
+    # Calculate story metrics
+    story_text = response.text
+    word_count = len(story_text.split())
+    reading_time = max(1, word_count // 200)  # Approximate reading time in minutes
+    
+    return {
+        "success": True,
+        "story": story_text,
+        "story_type": story_type,
+        "theme": theme,
+        "music_featured": music_list,
+        "metadata": {
+            "word_count": word_count,
+            "reading_time_minutes": reading_time,
+            "generated_at": datetime.now().isoformat(),
+            "story_length": story_length
+        }
+    }
+
+def run_story_job(data):
+    """Story job handler: runs on a job worker under its own deadline"""
+    with deadline_scope(STORY_JOB_TIMEOUT):
+        return create_story(data)
+
+# Jobs are kept in SQLite so any worker process can answer a poll and a recycled worker loses nothing
+story_jobs = JobQueue(
+    run_story_job,
+    path=os.getenv("STORY_JOB_DB", os.path.join(os.path.dirname(os.path.dirname(__file__)), "database", "jobs.db")),
+    workers=int(os.getenv("STORY_JOB_WORKERS", "2")),
+    max_pending=int(os.getenv("STORY_JOB_QUEUE_SIZE", "100")),
+    result_ttl=float(os.getenv("STORY_JOB_TTL", "900")),
+    lease=2 * STORY_JOB_TIMEOUT,
+    name="story",
+    callback_hosts=[host.strip() for host in os.getenv("STORY_CALLBACK_HOSTS", "").split(",") if host.strip()]
+)
+
+def enqueue_story_job(data):
+    """Queue a story generation and answer 202 with where to poll for it"""
+    payload = {key: value for key, value in data.items() if key not in ("priority", "callback_url")}
+    try:
+        job = story_jobs.submit(
+            payload,
+            priority=data.get("priority", "normal"),
+            callback_url=data.get("callback_url")
+        )
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    except QueueFull:
+        response = jsonify({
+            "success": False,
+            "error": "Story queue is full. Please try again shortly."
+        })
+        response.headers["Retry-After"] = "30"
+        return response, 503
+
+    status_url = url_for("harmony.get_story_job", job_id=job.id)
+    response = jsonify({
+        "success": True,
+        "job_id": job.id,
+        "status": job.status,
+        "status_url": status_url
+    })
+    response.headers["Location"] = status_url
+    return response, 202
+
+@harmony_bp.route("/story/jobs/<job_id>", methods=["GET"])
+def get_story_job(job_id):
+    """Poll a queued story generation"""
+    job = story_jobs.get(job_id)
+    if job is None:
+        return jsonify({
+            "success": False,
+            "error": "Job not found or expired"
+        }), 404
+    return jsonify({"success": True, **job.to_dict()})
+
 @harmony_bp.route("/recommendations", methods=["POST"])
 def get_recommendations():
     """Get enhanced recommendations with similarity scoring"""
@@ -286,33 +494,43 @@ def get_recommendations():
         seed_entity = data.get("seed_entity", "")
         limit = data.get("limit", 8)
         include_metadata = data.get("include_metadata", True)
+        user = exposure_user(data)
         
-        # Find similar items with Qloo
-        similar_entities = qloo_api.find_similar(seed_entity, limit=limit * 2)
+        # Precomputed by the batch job: a single indexed lookup, no Qloo calls. Twice the
+        # limit is read, as live, so unseen candidates can replace those the user already got
+        stored = precomputed.recommendations(seed_entity, limit, depth=limit * 2) if precomputed else None
+        if stored is not None:
+            recommendations, computed_at = stored
+            recommendations = exposure.rank(user, recommendations, result_name)[:limit]
+            exposure.record(user, [rec["name"] for rec in recommendations])
+            if not include_metadata:
+                recommendations = [
+                    {key: value for key, value in rec.items() if key not in ("genre_tags", "recommendation_reason")}
+                    for rec in recommendations
+                ]
+            return jsonify({
+                "success": True,
+                "recommendations": recommendations,
+                "seed": seed_entity,
+                "metadata": {
+                    "total_found": len(recommendations),
+                    "algorithm": "qloo_similarity_enhanced",
+                    "precomputed": True,
+                    "generated_at": datetime.fromtimestamp(computed_at).isoformat(),
+                    "partial": False
+                }
+            })
         
-        recommendations = []
-        for entity in similar_entities:
-            similarity_score = calculate_similarity_score(seed_entity, entity)
-            
-            rec_data = {
-                "name": entity.name,
-                "category": entity.get_category(),
-                "types": entity.types,
-                "popularity": entity.popularity,
-                "similarity_score": similarity_score
-            }
-            
-            if include_metadata:
-                rec_data.update({
-                    "genre_tags": extract_genre_tags(entity),
-                    "recommendation_reason": generate_recommendation_reason(seed_entity, entity)
-                })
-            
-            recommendations.append(rec_data)
+        # Find similar items with Qloo (often prefetched after /discover)
+        if limit * 2 == PREFETCH_LIMIT:
+            prefetcher.claim(seed_entity)
+        similar_entities = get_qloo_api().find_similar(seed_entity, limit=limit * 2)
         
-        # Sort by similarity score and limit
-        recommendations.sort(key=lambda x: x["similarity_score"], reverse=True)
-        recommendations = recommendations[:limit]
+        with span("score"):
+            # Score every candidate so unseen ones can replace those the user already got
+            recommendations = score_recommendations(seed_entity, similar_entities, len(similar_entities), include_metadata)
+            recommendations = exposure.rank(user, recommendations, result_name)[:limit]
+        exposure.record(user, [rec["name"] for rec in recommendations])
         
         return jsonify({
             "success": True,
@@ -321,13 +539,13 @@ def get_recommendations():
             "metadata": {
                 "total_found": len(recommendations),
                 "algorithm": "qloo_similarity_enhanced",
-                "generated_at": datetime.now().isoformat()
+                "generated_at": datetime.now().isoformat(),
+                "partial": is_partial()
             }
         })
         
     except Exception as e:
-        print(f"Error in get_recommendations: {e}")
-        traceback.print_exc()
+        logger.exception("Error in get_recommendations")
         return jsonify({
             "success": False,
             "error": str(e)
@@ -340,43 +558,43 @@ def get_trending():
         category = request.args.get("category", "music")
         time_period = request.args.get("time_period", "current")  # current, week, month
         limit = int(request.args.get("limit", 12))
+        user = exposure_user()
         
         # Get trending music with enhanced queries
-        trending_queries = {
-            "current": ["trending music", "popular songs", "hot tracks"],
-            "week": ["weekly trending music", "this week popular", "weekly hits"],
-            "month": ["monthly trending music", "this month popular", "monthly hits"]
-        }
-        
-        queries = trending_queries.get(time_period, trending_queries["current"])
+        queries = TRENDING_QUERIES.get(time_period, TRENDING_QUERIES["current"])
         all_trending = []
-        
-        for query in queries:
-            trending_music = qloo_api.search(query, limit=limit//len(queries) + 2)
-            all_trending.extend(trending_music)
+        with shared_lookups():
+            get_qloo_api().warm_from_shared(queries, limit//len(queries) + 2)
+            for query in queries:
+                trending_music = get_qloo_api().search(query, limit=limit//len(queries) + 2)
+                all_trending.extend(trending_music)
         
         # Process and enhance trending results
-        trending_results = []
-        seen_names = set()
-        
-        for entity in all_trending:
-            if entity.name not in seen_names and len(trending_results) < limit:
-                seen_names.add(entity.name)
-                
-                trending_data = {
-                    "name": entity.name,
-                    "category": entity.get_category(),
-                    "types": entity.types,
-                    "popularity": entity.popularity,
-                    "trend_score": calculate_trend_score(entity),
-                    "genre_tags": extract_genre_tags(entity),
-                    "trend_reason": generate_trend_reason(entity)
-                }
-                
-                trending_results.append(trending_data)
-        
-        # Sort by trend score
-        trending_results.sort(key=lambda x: x["trend_score"], reverse=True)
+        with span("score"):
+            trending_results = []
+            seen_names = set()
+            
+            for entity in all_trending:
+                # With a known user keep every candidate so seen ones can be replaced
+                if entity.name not in seen_names and (user or len(trending_results) < limit):
+                    seen_names.add(entity.name)
+                    
+                    trending_data = {
+                        "name": entity.name,
+                        "category": entity.get_category(),
+                        "types": entity.types,
+                        "popularity": entity.popularity,
+                        "trend_score": calculate_trend_score(entity),
+                        "genre_tags": extract_genre_tags(entity),
+                        "trend_reason": generate_trend_reason(entity)
+                    }
+                    
+                    trending_results.append(trending_data)
+            
+            # Sort by trend score
+            trending_results.sort(key=lambda x: x["trend_score"], reverse=True)
+            trending_results = exposure.rank(user, trending_results, result_name)[:limit]
+        exposure.record(user, [result["name"] for result in trending_results])
         
         return jsonify({
             "success": True,
@@ -385,13 +603,13 @@ def get_trending():
                 "category": category,
                 "time_period": time_period,
                 "total_results": len(trending_results),
-                "generated_at": datetime.now().isoformat()
+                "generated_at": datetime.now().isoformat(),
+                "partial": is_partial()
             }
         })
         
     except Exception as e:
-        print(f"Error in get_trending: {e}")
-        traceback.print_exc()
+        logger.exception("Error in get_trending")
         return jsonify({
             "success": False,
             "error": str(e)
@@ -410,72 +628,21 @@ def analyze_mood():
                 "error": "Text input is required"
             }), 400
         
-        # Use Gemini to analyze mood
-        model = genai.GenerativeModel("gemini-2.5-flash")
-        mood_prompt = f"""
-        Analyze the emotional tone and mood of this text: "{text_input}"
-        
-        Return your response as valid JSON with the following structure:
-        {{
-            "primary_mood": "happy",
-            "mood_intensity": 7,
-            "secondary_moods": ["energetic", "optimistic"],
-            "music_suggestions": ["pop", "upbeat rock", "dance"],
-            "explanation": "The text expresses joy and excitement with energetic language"
-        }}
-        
-        Primary mood options: happy, sad, energetic, calm, romantic, nostalgic, anxious, excited, angry, peaceful
-        Mood intensity: 1-10 scale
-        Include 2-3 music suggestions that match the mood.
-        
-        Respond ONLY with valid JSON, no other text.
-        """
-        
-        response = model.generate_content(mood_prompt)
-        response_text = response.text.strip()
-        
-        # Clean the response - remove markdown formatting if present
-        if response_text.startswith("```json"):
-            response_text = response_text.replace("```json", "").replace("```", "").strip()
-        elif response_text.startswith("```"):
-            response_text = response_text.replace("```", "").strip()
-        
-        # Try to parse JSON with fallback
-        try:
-            mood_analysis = json.loads(response_text)
-        except json.JSONDecodeError as json_error:
-            print(f"JSON parsing failed. Response text: {response_text}")
-            # Create fallback mood analysis
-            mood_analysis = create_fallback_mood_analysis(text_input)
-        
-        # Validate and fix mood_analysis structure
-        mood_analysis = validate_mood_analysis(mood_analysis)
+        # Near-duplicate submissions reuse an earlier Gemini analysis
+        mood_analysis = mood_cache.get(text_input)
+        cached = mood_analysis is not None
+        if not cached:
+            mood_analysis = analyze_text_mood(text_input)
         
         # Get music recommendations based on mood
         primary_mood = mood_analysis.get("primary_mood", "happy")
         music_suggestions = mood_analysis.get("music_suggestions", ["pop"])
         
         # Search for music matching the analyzed mood
-        mood_music = []
         try:
-            for suggestion in music_suggestions[:2]:  # Limit to 2 suggestions
-                search_query = f"{suggestion} {primary_mood} music"
-                entities = qloo_api.search(search_query, limit=3)
-                for entity in entities:
-                    if entity.get_category() == "music" or "music" in str(entity.types).lower():
-                        mood_music.append({
-                            "name": entity.name,
-                            "category": entity.get_category(),
-                            "types": entity.types,
-                            "popularity": entity.popularity,
-                            "mood_match_reason": f"Matches {primary_mood} mood with {suggestion} style"
-                        })
-                        if len(mood_music) >= 6:  # Stop at 6 recommendations
-                            break
-                if len(mood_music) >= 6:
-                    break
+            mood_music = find_mood_music(primary_mood, music_suggestions)
         except Exception as search_error:
-            print(f"Music search error: {search_error}")
+            logger.warning("Music search error: %s", search_error)
             # Add some default music if search fails
             mood_music = get_default_mood_music(primary_mood)
         
@@ -485,18 +652,252 @@ def analyze_mood():
             "recommended_music": mood_music[:6],  # Limit to 6 recommendations
             "metadata": {
                 "analyzed_text_length": len(text_input),
-                "generated_at": datetime.now().isoformat()
+                "cached": cached,
+                "generated_at": datetime.now().isoformat(),
+                "partial": is_partial()
             }
         })
         
     except Exception as e:
-        print(f"Error in analyze_mood: {e}")
-        traceback.print_exc()
+        logger.exception("Error in analyze_mood")
         return jsonify({
             "success": False,
             "error": "Failed to analyze mood. Please try again."
         }), 500
 
+def analyze_text_mood(text_input):
+    """Analyze one text with Gemini; successful analyses are cached, fallbacks are not"""
+    # Use Gemini to analyze mood
+    mood_prompt = f"""
+    Analyze the emotional tone and mood of this text: "{text_input}"
+    
+    Return your response as valid JSON with the following structure:
+    {{
+        "primary_mood": "happy",
+        "mood_intensity": 7,
+        "secondary_moods": ["energetic", "optimistic"],
+        "music_suggestions": ["pop", "upbeat rock", "dance"],
+        "explanation": "The text expresses joy and excitement with energetic language"
+    }}
+    
+    Primary mood options: happy, sad, energetic, calm, romantic, nostalgic, anxious, excited, angry, peaceful
+    Mood intensity: 1-10 scale
+    Include 2-3 music suggestions that match the mood.
+    
+    Respond ONLY with valid JSON, no other text.
+    """
+    
+    cacheable = False
+    try:
+        response_text = generate_with_gemini(mood_prompt, "mood").text.strip()
+    except DeadlineExceeded:
+        mark_partial("gemini mood analysis skipped: deadline")
+        response_text = None
+    
+    if response_text is None:
+        # Out of time: use the keyword-based analysis instead
+        mood_analysis = create_fallback_mood_analysis(text_input)
+    else:
+        # Try to parse JSON with fallback
+        try:
+            mood_analysis = parse_gemini_json(response_text)
+            cacheable = True
+        except json.JSONDecodeError as json_error:
+            logger.warning("Mood JSON parsing failed, response text: %.500s", response_text)
+            # Create fallback mood analysis
+            mood_analysis = create_fallback_mood_analysis(text_input)
+    
+    # Validate and fix mood_analysis structure
+    mood_analysis = validate_mood_analysis(mood_analysis)
+    if cacheable:
+        mood_cache.set(text_input, mood_analysis)
+    return mood_analysis
+
+@harmony_bp.route("/mood-analysis/batch", methods=["POST"])
+def analyze_mood_batch():
+    """Analyze many texts with a few packed Gemini calls and shared music searches"""
+    try:
+        data = request.get_json()
+        texts = data.get("texts", [])
+        include_music = data.get("include_music", True)
+        
+        if not isinstance(texts, list) or not texts:
+            return jsonify({
+                "success": False,
+                "error": "texts must be a non-empty list"
+            }), 400
+        if len(texts) > MOOD_BATCH_MAX_ITEMS:
+            return jsonify({
+                "success": False,
+                "error": f"At most {MOOD_BATCH_MAX_ITEMS} texts per batch"
+            }), 400
+        texts = [str(text) for text in texts]
+        
+        analyses = {}
+        for index, text in enumerate(texts):
+            cached_analysis = mood_cache.get(text)
+            if cached_analysis is not None:
+                analyses[index] = cached_analysis
+        cached_count = len(analyses)
+        
+        gemini_calls = 0
+        pending = [index for index in range(len(texts)) if index not in analyses]
+        for chunk in pack_mood_batches(texts, pending):
+            try:
+                response_text = generate_with_gemini(build_mood_batch_prompt(chunk, texts), "mood_batch", items=len(chunk)).text.strip()
+                gemini_calls += 1
+            except DeadlineExceeded:
+                mark_partial("gemini mood analysis skipped: deadline")
+                break
+            for index, raw_analysis in parse_mood_batch_response(response_text, chunk).items():
+                analyses[index] = validate_mood_analysis(raw_analysis)
+                mood_cache.set(texts[index], analyses[index])
+        
+        # Identical (mood, suggestion) searches are made once for the whole batch
+        search_cache = {}
+        results = []
+        fallbacks = 0
+        for index, text in enumerate(texts):
+            mood_analysis = analyses.get(index)
+            if mood_analysis is None:
+                fallbacks += 1
+                mood_analysis = create_fallback_mood_analysis(text)
+            mood_analysis = validate_mood_analysis(mood_analysis)
+            
+            item = {"index": index, "mood_analysis": mood_analysis}
+            if include_music:
+                primary_mood = mood_analysis["primary_mood"]
+                try:
+                    item["recommended_music"] = find_mood_music(primary_mood, mood_analysis["music_suggestions"], search_cache)
+                except Exception as search_error:
+                    logger.warning("Music search error: %s", search_error)
+                    item["recommended_music"] = get_default_mood_music(primary_mood)
+            results.append(item)
+        
+        return jsonify({
+            "success": True,
+            "results": results,
+            "metadata": {
+                "total_texts": len(texts),
+                "cached_analyses": cached_count,
+                "gemini_calls": gemini_calls,
+                "music_searches": len(search_cache),
+                "fallback_analyses": fallbacks,
+                "generated_at": datetime.now().isoformat(),
+                "partial": is_partial()
+            }
+        })
+        
+    except Exception as e:
+        logger.exception("Error in analyze_mood_batch")
+        return jsonify({
+            "success": False,
+            "error": "Failed to analyze moods. Please try again."
+        }), 500
+
+def pack_mood_batches(texts, indexes):
+    """Group text indexes into prompts bounded by item count and total characters"""
+    chunks = []
+    current, size = [], 0
+    for index in indexes:
+        length = min(len(texts[index]), MOOD_TEXT_MAX_CHARS)
+        if current and (len(current) >= MOOD_BATCH_PROMPT_ITEMS or size + length > MOOD_BATCH_PROMPT_CHARS):
+            chunks.append(current)
+            current, size = [], 0
+        current.append(index)
+        size += length
+    if current:
+        chunks.append(current)
+    return chunks
+
+def build_mood_batch_prompt(chunk, texts):
+    """Prompt asking for one mood analysis per text, as a JSON array keyed by index"""
+    entries = json.dumps(
+        [{"index": index, "text": texts[index][:MOOD_TEXT_MAX_CHARS]} for index in chunk],
+        ensure_ascii=False
+    )
+    return f"""
+    Analyze the emotional tone and mood of each text in this JSON array:
+    {entries}
+    
+    Return your response as a valid JSON array with one object per text, in any order:
+    [
+        {{
+            "index": 0,
+            "primary_mood": "happy",
+            "mood_intensity": 7,
+            "secondary_moods": ["energetic", "optimistic"],
+            "music_suggestions": ["pop", "upbeat rock", "dance"],
+            "explanation": "The text expresses joy and excitement with energetic language"
+        }}
+    ]
+    
+    "index" must be copied from the input entry.
+    Primary mood options: happy, sad, energetic, calm, romantic, nostalgic, anxious, excited, angry, peaceful
+    Mood intensity: 1-10 scale
+    Include 2-3 music suggestions that match the mood.
+    
+    Respond ONLY with valid JSON, no other text.
+    """
+
+def parse_mood_batch_response(response_text, chunk):
+    """Map text index -> raw mood analysis; unusable items are left out for the fallback"""
+    try:
+        items = parse_gemini_json(response_text)
+    except json.JSONDecodeError:
+        logger.warning("Batch mood JSON parsing failed, response text: %.500s", response_text)
+        return {}
+    if not isinstance(items, list):
+        return {}
+    
+    expected = set(chunk)
+    analyses = {}
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        try:
+            index = int(item.get("index"))
+        except (ValueError, TypeError):
+            continue
+        if index in expected:
+            analyses[index] = item
+    return analyses
+
+def parse_gemini_json(response_text):
+    """Parse a Gemini JSON answer, removing markdown formatting if present"""
+    if response_text.startswith("```json"):
+        response_text = response_text.replace("```json", "").replace("```", "").strip()
+    elif response_text.startswith("```"):
+        response_text = response_text.replace("```", "").strip()
+    return json.loads(response_text)
+
+def find_mood_music(primary_mood, music_suggestions, search_cache=None):
+    """Search Qloo for music matching a mood; search_cache shares results across batch items"""
+    mood_music = []
+    for suggestion in music_suggestions[:2]:  # Limit to 2 suggestions
+        search_query = f"{suggestion} {primary_mood} music"
+        if search_cache is None:
+            entities = get_qloo_api().search(search_query, limit=3)
+        else:
+            key = search_query.lower().strip()
+            if key not in search_cache:
+                search_cache[key] = get_qloo_api().search(search_query, limit=3)
+            entities = search_cache[key]
+        for entity in entities:
+            if entity.get_category() == "music" or "music" in str(entity.types).lower():
+                mood_music.append({
+                    "name": entity.name,
+                    "category": entity.get_category(),
+                    "types": entity.types,
+                    "popularity": entity.popularity,
+                    "mood_match_reason": f"Matches {primary_mood} mood with {suggestion} style"
+                })
+                if len(mood_music) >= 6:  # Stop at 6 recommendations
+                    break
+        if len(mood_music) >= 6:
+            break
+    return mood_music
+
 def create_fallback_mood_analysis(text_input):
     """Create fallback mood analysis when AI parsing fails"""
     # Simple keyword-based mood detection
@@ -650,27 +1051,30 @@ def generate_playlist():
         
         # Search for tracks
         all_tracks = []
-        for query in playlist_queries[:3]:  # Limit queries to avoid rate limits
-            tracks = qloo_api.search(query, limit=8)
-            all_tracks.extend([t for t in tracks if t.get_category() == "music"])
+        with shared_lookups():
+            get_qloo_api().warm_from_shared(playlist_queries[:3], 8)
+            for query in playlist_queries[:3]:  # Limit queries to avoid rate limits
+                tracks = get_qloo_api().search(query, limit=8)
+                all_tracks.extend([t for t in tracks if t.get_category() == "music"])
         
         # Remove duplicates and score tracks
-        unique_tracks = {}
-        for track in all_tracks:
-            if track.name not in unique_tracks:
-                playlist_score = calculate_playlist_score(track, theme, mood, activity)
-                unique_tracks[track.name] = {
-                    "name": track.name,
-                    "category": track.get_category(),
-                    "types": track.types,
-                    "popularity": track.popularity,
-                    "playlist_score": playlist_score,
-                    "genre_tags": extract_genre_tags(track),
-                    "estimated_duration": random.randint(180, 300)  # 3-5 minutes
-                }
-        
-        # Sort by playlist score and create balanced playlist
-        sorted_tracks = sorted(unique_tracks.values(), key=lambda x: x["playlist_score"], reverse=True)
+        with span("score"):
+            unique_tracks = {}
+            for track in all_tracks:
+                if track.name not in unique_tracks:
+                    playlist_score = calculate_playlist_score(track, theme, mood, activity)
+                    unique_tracks[track.name] = {
+                        "name": track.name,
+                        "category": track.get_category(),
+                        "types": track.types,
+                        "popularity": track.popularity,
+                        "playlist_score": playlist_score,
+                        "genre_tags": extract_genre_tags(track),
+                        "estimated_duration": random.randint(180, 300)  # 3-5 minutes
+                    }
+            
+            # Sort by playlist score and create balanced playlist
+            sorted_tracks = sorted(unique_tracks.values(), key=lambda x: x["playlist_score"], reverse=True)
         
         # Calculate how many tracks we need (assuming average 4 minutes per track)
         target_tracks = max(10, duration_minutes // 4)
@@ -688,7 +1092,8 @@ def generate_playlist():
                 "total_tracks": len(playlist_tracks),
                 "total_duration_seconds": total_duration,
                 "total_duration_minutes": round(total_duration / 60, 1),
-                "created_at": datetime.now().isoformat()
+                "created_at": datetime.now().isoformat(),
+                "partial": is_partial()
             },
             "criteria": {
                 "theme": theme,
@@ -699,8 +1104,7 @@ def generate_playlist():
         })
         
     except Exception as e:
-        print(f"Error in generate_playlist: {e}")
-        traceback.print_exc()
+        logger.exception("Error in generate_playlist")
         return jsonify({
             "success": False,
             "error": str(e)
@@ -759,6 +1163,30 @@ def extract_genre_tags(entity):
     
     return found_genres[:3]  # Limit to 3 genres
 
+def score_recommendations(seed_entity, entities, limit, include_metadata=True):
+    """Score similar entities against the seed and keep the best `limit`"""
+    recommendations = []
+    for entity in entities:
+        rec_data = {
+            "name": entity.name,
+            "category": entity.get_category(),
+            "types": entity.types,
+            "popularity": entity.popularity,
+            "similarity_score": calculate_similarity_score(seed_entity, entity)
+        }
+        
+        if include_metadata:
+            rec_data.update({
+                "genre_tags": extract_genre_tags(entity),
+                "recommendation_reason": generate_recommendation_reason(seed_entity, entity)
+            })
+        
+        recommendations.append(rec_data)
+    
+    # Sort by similarity score and limit
+    recommendations.sort(key=lambda x: x["similarity_score"], reverse=True)
+    return recommendations[:limit]
+
 def calculate_similarity_score(seed, entity):
     """Calculate similarity score between seed and entity"""
     base_score = 0.5
@@ -838,60 +1266,120 @@ def calculate_playlist_score(track, theme, mood, activity):
 @harmony_bp.route("/profile", methods=["POST"])
 def build_taste_profile():
     """Build enhanced taste profile with detailed analysis"""
+    user_id = None
     try:
         data = request.get_json()
         interests = data.get("interests", [])
+        user_id = data.get("user_id")
         
-        # Build taste profile with Qloo
-        taste_profile = qloo_api.build_taste_profile(interests)
+        # Stored profiles only fetch interests that were added since the last call
+        if user_id is not None:
+            profile = get_or_create_profile(user_id)
+            if profile is None:
+                return jsonify({
+                    "success": False,
+                    "error": "User not found"
+                }), 404
+            
+            requested = unique_interests(interests)
+            for interest in profile.interest_names():
+                if interest not in requested:
+                    profile.remove_interest(interest)
+            stored = set(profile.interest_names())
+            for interest in requested:
+                if interest not in stored:
+                    add_profile_interest(profile, interest)
+            get_db().session.commit()
+            return jsonify(stored_profile_response(profile))
         
-        # Enhanced profile formatting with analytics
-        formatted_profile = {}
-        total_entities = 0
-        category_distribution = {}
+        # NDJSON: one record per interest as it completes, then the analytics
+        if wants_stream():
+            return ndjson_response(stream_taste_profile(unique_interests(interests)))
         
-        for interest, categories in taste_profile.items():
-            formatted_profile[interest] = {}
-            for category, entities in categories.items():
-                entity_data = []
-                for entity in entities[:5]:  # Limit to 5 per category
-                    entity_info = {
-                        "name": entity.name,
-                        "category": entity.get_category(),
-                        "types": entity.types,
-                        "popularity": entity.popularity,
-                        "profile_relevance": calculate_relevance_score(entity, "mixed", interest)
-                    }
-                    entity_data.append(entity_info)
-                    total_entities += 1
-                
-                formatted_profile[interest][category] = entity_data
-                category_distribution[category] = category_distribution.get(category, 0) + len(entity_data)
+        # Build taste profile with Qloo
+        taste_profile = get_qloo_api().build_taste_profile(interests)
         
-        # Generate profile insights
-        insights = generate_profile_insights(formatted_profile, category_distribution)
+        # Enhanced profile formatting with analytics
+        with span("score"):
+            formatted = format_taste_profile(interests, taste_profile)
         
         return jsonify({
             "success": True,
-            "profile": formatted_profile,
-            "analytics": {
-                "total_entities": total_entities,
-                "category_distribution": category_distribution,
-                "interests_analyzed": len(interests),
-                "profile_diversity_score": calculate_diversity_score(category_distribution)
-            },
-            "insights": insights,
-            "generated_at": datetime.now().isoformat()
+            **formatted,
+            "generated_at": datetime.now().isoformat(),
+            "partial": is_partial()
         })
         
     except Exception as e:
-        print(f"Error in build_taste_profile: {e}")
-        traceback.print_exc()
+        # Only stored profiles touch the user store
+        if user_id is not None:
+            get_db().session.rollback()
+        logger.exception("Error in build_taste_profile")
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 500
+
+@harmony_bp.route("/profile/<int:user_id>", methods=["GET"])
+def get_stored_profile(user_id):
+    """Serve a stored taste profile without calling Qloo"""
+    from src.models.taste_profile import TasteProfile
+    get_db()
+    profile = TasteProfile.query.filter_by(user_id=user_id).first()
+    if profile is None:
+        return jsonify({
+            "success": False,
+            "error": "Profile not found"
+        }), 404
+    return jsonify(stored_profile_response(profile))
+
+@harmony_bp.route("/profile/<int:user_id>/interests", methods=["POST"])
+def add_stored_profile_interest(user_id):
+    """Add one interest to a stored profile, fetching only that interest"""
+    try:
+        data = request.get_json()
+        interest = (data.get("interest") or "").strip()
+        if not interest:
+            return jsonify({
+                "success": False,
+                "error": "Interest is required"
+            }), 400
+        
+        profile = get_or_create_profile(user_id)
+        if profile is None:
+            return jsonify({
+                "success": False,
+                "error": "User not found"
+            }), 404
+        
+        created = interest not in profile.interest_names()
+        if created:
+            add_profile_interest(profile, interest)
+            get_db().session.commit()
+        return jsonify(stored_profile_response(profile)), 201 if created else 200
+        
+    except Exception as e:
+        get_db().session.rollback()
+        logger.exception("Error in add_stored_profile_interest")
         return jsonify({
             "success": False,
             "error": str(e)
         }), 500
 
+@harmony_bp.route("/profile/<int:user_id>/interests/<path:interest>", methods=["DELETE"])
+def remove_stored_profile_interest(user_id, interest):
+    """Remove one interest from a stored profile"""
+    from src.models.taste_profile import TasteProfile
+    db = get_db()
+    profile = TasteProfile.query.filter_by(user_id=user_id).first()
+    if profile is None or not profile.remove_interest(interest):
+        return jsonify({
+            "success": False,
+            "error": "Interest not found"
+        }), 404
+    db.session.commit()
+    return jsonify(stored_profile_response(profile))
+
 @harmony_bp.route("/cross-domain", methods=["POST"])
 def cross_domain_discovery():
     """Enhanced cross-domain discovery with detailed connections"""
@@ -901,25 +1389,18 @@ def cross_domain_discovery():
         domains = data.get("domains", ["movies", "books", "restaurants"])
         limit = data.get("limit", 5)
         
+        # NDJSON: one record per domain as it completes, then the metadata
+        if wants_stream():
+            return ndjson_response(stream_cross_domain(seed_entity, domains, limit))
+        
         # Cross-domain discovery with Qloo
-        cross_results = qloo_api.cross_domain_discovery(seed_entity, domains, limit=limit)
+        cross_results = get_qloo_api().cross_domain_discovery(seed_entity, domains, limit=limit)
         
         # Enhanced formatting with connection explanations
-        formatted_results = {}
-        for domain, entities in cross_results.items():
-            domain_data = []
-            for entity in entities:
-                entity_info = {
-                    "name": entity.name,
-                    "category": entity.get_category(),
-                    "types": entity.types,
-                    "popularity": entity.popularity,
-                    "connection_strength": calculate_connection_strength(seed_entity, entity),
-                    "connection_explanation": generate_connection_explanation(seed_entity, entity, domain)
-                }
-                domain_data.append(entity_info)
-            
-            formatted_results[domain] = domain_data
+        with span("score"):
+            formatted_results = {}
+            for domain, entities in cross_results.items():
+                formatted_results[domain] = format_domain_results(seed_entity, domain, entities)
         
         return jsonify({
             "success": True,
@@ -928,18 +1409,195 @@ def cross_domain_discovery():
             "metadata": {
                 "domains_explored": len(domains),
                 "total_connections": sum(len(entities) for entities in formatted_results.values()),
-                "generated_at": datetime.now().isoformat()
+                "generated_at": datetime.now().isoformat(),
+                "partial": is_partial()
             }
         })
         
     except Exception as e:
-        print(f"Error in cross_domain_discovery: {e}")
-        traceback.print_exc()
+        logger.exception("Error in cross_domain_discovery")
         return jsonify({
             "success": False,
             "error": str(e)
         }), 500
 
+def format_taste_profile(interests, taste_profile):
+    """Formatted profile, analytics and insights for Qloo results per interest"""
+    formatted_profile = {}
+    total_entities = 0
+    category_distribution = {}
+    
+    for interest, categories in taste_profile.items():
+        formatted_profile[interest] = format_interest_categories(interest, categories)
+        for category, entity_data in formatted_profile[interest].items():
+            total_entities += len(entity_data)
+            category_distribution[category] = category_distribution.get(category, 0) + len(entity_data)
+    
+    return {
+        "profile": formatted_profile,
+        "analytics": {
+            "total_entities": total_entities,
+            "category_distribution": category_distribution,
+            "interests_analyzed": len(interests),
+            "profile_diversity_score": calculate_diversity_score(category_distribution)
+        },
+        # Generate profile insights
+        "insights": generate_profile_insights(formatted_profile, category_distribution)
+    }
+
+def format_domain_results(seed_entity, domain, entities):
+    """Format one domain's Qloo entities with their connection to the seed"""
+    return [
+        {
+            "name": entity.name,
+            "category": entity.get_category(),
+            "types": entity.types,
+            "popularity": entity.popularity,
+            "connection_strength": calculate_connection_strength(seed_entity, entity),
+            "connection_explanation": generate_connection_explanation(seed_entity, entity, domain)
+        }
+        for entity in entities
+    ]
+
+def stream_taste_profile(interests):
+    """NDJSON records for /profile?stream=1: interests in completion order, then a summary"""
+    # Workers start with a copy of this context, so they share the warmed keys
+    with shared_lookups():
+        get_qloo_api().warm_from_shared(interests, 10)
+        results = run_concurrently(interests, get_qloo_api().interest_profile)
+    
+    def records():
+        formatted_profile = {}
+        total_entities = 0
+        category_distribution = {}
+        for interest, categories, error in results:
+            if error is not None:
+                logger.warning("Error profiling interest %r: %s", interest, error)
+                yield {"type": "error", "interest": interest, "error": str(error)}
+                continue
+            with span("score"):
+                formatted = format_interest_categories(interest, categories)
+            if formatted:
+                formatted_profile[interest] = formatted
+            for category, entity_data in formatted.items():
+                total_entities += len(entity_data)
+                category_distribution[category] = category_distribution.get(category, 0) + len(entity_data)
+            yield {"type": "interest", "interest": interest, "categories": formatted}
+        
+        yield {
+            "type": "summary",
+            "success": True,
+            "analytics": {
+                "total_entities": total_entities,
+                "category_distribution": category_distribution,
+                "interests_analyzed": len(interests),
+                "profile_diversity_score": calculate_diversity_score(category_distribution)
+            },
+            "insights": generate_profile_insights(formatted_profile, category_distribution),
+            "generated_at": datetime.now().isoformat(),
+            "partial": is_partial()
+        }
+    
+    return records()
+
+def stream_cross_domain(seed_entity, domains, limit):
+    """NDJSON records for /cross-domain?stream=1: domains in completion order, then a summary"""
+    api = get_qloo_api()
+    with shared_lookups():
+        api.warm_domains(seed_entity, domains, limit)
+        results = run_concurrently(domains, lambda domain: api.domain_discovery(seed_entity, domain, limit=limit))
+    
+    def records():
+        total_connections = 0
+        for domain, entities, error in results:
+            if error is not None:
+                logger.warning("Error in cross-domain discovery for %r: %s", domain, error)
+                yield {"type": "error", "domain": domain, "error": str(error)}
+                continue
+            with span("score"):
+                formatted = format_domain_results(seed_entity, domain, entities)
+            total_connections += len(formatted)
+            yield {"type": "domain", "domain": domain, "results": formatted}
+        
+        yield {
+            "type": "summary",
+            "success": True,
+            "seed": seed_entity,
+            "metadata": {
+                "domains_explored": len(domains),
+                "total_connections": total_connections,
+                "generated_at": datetime.now().isoformat(),
+                "partial": is_partial()
+            }
+        }
+    
+    return records()
+
+def format_interest_categories(interest, categories):
+    """Format one interest's categorized Qloo entities for a profile response"""
+    formatted = {}
+    for category, entities in categories.items():
+        formatted[category] = [
+            {
+                "name": entity.name,
+                "category": entity.get_category(),
+                "types": entity.types,
+                "popularity": entity.popularity,
+                "profile_relevance": calculate_relevance_score(entity, "mixed", interest)
+            }
+            for entity in entities[:5]  # Limit to 5 per category
+        ]
+    return formatted
+
+def unique_interests(interests):
+    """Strip blanks and duplicates while keeping the caller's order"""
+    seen = []
+    for interest in interests:
+        interest = str(interest).strip()
+        if interest and interest not in seen:
+            seen.append(interest)
+    return seen
+
+def get_or_create_profile(user_id):
+    """Load a user's stored profile, creating an empty one; None if the user doesn't exist"""
+    from src.models.taste_profile import TasteProfile
+    from src.models.user import User
+    db = get_db()
+    profile = TasteProfile.query.filter_by(user_id=user_id).first()
+    if profile is None:
+        if db.session.get(User, user_id) is None:
+            return None
+        profile = TasteProfile(user_id=user_id, category_counts={}, total_entities=0)
+        db.session.add(profile)
+    return profile
+
+def add_profile_interest(profile, interest):
+    """Fetch a single interest from Qloo and store it in the profile"""
+    taste_profile = get_qloo_api().build_taste_profile([interest])
+    categories = format_interest_categories(interest, taste_profile.get(interest, {}))
+    # Empty results may be a skipped or failed call; don't store them so they are retried
+    if categories:
+        profile.add_interest(interest, categories)
+
+def stored_profile_response(profile):
+    """Build the /profile response body from a stored profile and its aggregates"""
+    formatted_profile = {item.interest: item.categories for item in profile.interests}
+    category_distribution = dict(profile.category_counts or {})
+    return {
+        "success": True,
+        "user_id": profile.user_id,
+        "profile": formatted_profile,
+        "analytics": {
+            "total_entities": profile.total_entities,
+            "category_distribution": category_distribution,
+            "interests_analyzed": len(formatted_profile),
+            "profile_diversity_score": calculate_diversity_score(category_distribution)
+        },
+        "insights": generate_profile_insights(formatted_profile, category_distribution),
+        "generated_at": profile.updated_at.isoformat(),
+        "partial": is_partial()
+    }
+
 def generate_profile_insights(profile, distribution):
     """Generate insights about user's taste profile"""
     insights = []
@@ -970,14 +1628,15 @@ def calculate_diversity_score(distribution):
     if total == 0:
         return 0.0
     
-    # Calculate entropy-based diversity score
-    diversity = 0
+    # Shannon entropy of the category distribution
+    diversity = 0.0
     for count in distribution.values():
         if count > 0:
             p = count / total
-            diversity -= p * (p.bit_length() - 1) if p > 0 else 0
+            diversity -= p * math.log2(p)
     
-    return min(1.0, diversity / 3)  # Normalize to 0-1 scale
+    # Normalize to 0-1 by the entropy of an even spread over all categories
+    return min(1.0, diversity / math.log2(len(PROFILE_CATEGORIES)))
 
 def calculate_connection_strength(seed, entity):
     """Calculate connection strength between entities"""
@@ -1034,8 +1693,19 @@ def health_check():
         },
         "apis": {
             "qloo_configured": bool(os.getenv("QLOO_API_KEY")),
-            "gemini_configured": bool(os.getenv("GEMINI_API_KEY"))
+            "gemini_configured": bool(os.getenv("GEMINI_API_KEY")),
+            "qloo_circuits": get_qloo_api().breaker_status() if clients_loaded()["qloo"] else {},
+            "qloo_shards": get_qloo_api().shard_status() if clients_loaded()["qloo"] else {},
+            "qloo_cache": get_qloo_api().cache_status() if clients_loaded()["qloo"] else {}
         },
+        "story_jobs": story_jobs.stats(),
+        "mood_cache": mood_cache.stats(),
+        "gemini_tiers": tier_stats.status(),
+        "prefetch": prefetcher.stats() if PREFETCH_TOP_N > 0 else {"enabled": False},
+        "admission": admission.status(),
+        "precomputed": precomputed.stats() if precomputed else {"enabled": False},
+        "exposure": exposure.stats(),
+        "logging": logging_stats(),
         "timestamp": datetime.now().isoformat()
     })
 
@@ -1,39 +1,148 @@
 from flask import Blueprint, jsonify, request
-from src.models.user import User, db
+from src.utils.clients import get_db
 
 user_bp = Blueprint('user', __name__)
 
+# SQLAlchemy and the models are imported inside the handlers so they are only
+# loaded when the user API is actually used, not on every worker boot
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+MAX_BULK_SIZE = 10000
+
 @user_bp.route('/users', methods=['GET'])
 def get_users():
-    users = User.query.all()
-    return jsonify([user.to_dict() for user in users])
+    from sqlalchemy import select
+    from src.models.user import User
+    db = get_db()
+    # Indexed lookups by username/email
+    username = request.args.get('username')
+    email = request.args.get('email')
+    if username or email:
+        query = select(User)
+        if username:
+            query = query.where(User.username == username)
+        if email:
+            query = query.where(User.email == email)
+        users = db.session.execute(query).scalars().all()
+        return jsonify([user.to_dict() for user in users])
+
+    # Keyset pagination: ?after_id=<last id seen>&limit=<n>
+    limit = max(1, min(request.args.get('limit', DEFAULT_PAGE_SIZE, type=int), MAX_PAGE_SIZE))
+    after_id = request.args.get('after_id', 0, type=int)
+    users = db.session.execute(
+        select(User).where(User.id > after_id).order_by(User.id).limit(limit + 1)
+    ).scalars().all()
+
+    has_more = len(users) > limit
+    users = users[:limit]
+    response = jsonify([user.to_dict() for user in users])
+    if has_more:
+        next_cursor = users[-1].id
+        response.headers['X-Next-Cursor'] = str(next_cursor)
+        response.headers['Link'] = f'</api/users?after_id={next_cursor}&limit={limit}>; rel="next"'
+    return response
 
 @user_bp.route('/users', methods=['POST'])
 def create_user():
-    
+    from sqlalchemy.exc import IntegrityError
+    from src.models.user import User
+    db = get_db()
+
     data = request.json
     user = User(username=data['username'], email=data['email'])
     db.session.add(user)
-    db.session.commit()
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({'error': 'Username or email already exists'}), 409
     return jsonify(user.to_dict()), 201
 
+@user_bp.route('/users/bulk', methods=['POST'])
+def bulk_create_users():
+    from sqlalchemy import insert
+    from sqlalchemy.exc import IntegrityError
+    from src.models.user import User
+    db = get_db()
+    rows, error = _bulk_rows(request.json, ('username', 'email'))
+    if error:
+        return jsonify({'error': error}), 400
+
+    try:
+        ids = db.session.scalars(insert(User).returning(User.id), rows).all()
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({'error': 'Username or email already exists'}), 409
+    return jsonify({'created': len(ids), 'ids': ids}), 201
+
+@user_bp.route('/users/bulk', methods=['PUT'])
+def bulk_update_users():
+    from sqlalchemy import select, update
+    from sqlalchemy.exc import IntegrityError
+    from src.models.user import User
+    db = get_db()
+    rows, error = _bulk_rows(request.json, ('id',))
+    if error:
+        return jsonify({'error': error}), 400
+
+    rows = [{key: row[key] for key in ('id', 'username', 'email') if key in row} for row in rows]
+    existing = set(db.session.execute(
+        select(User.id).where(User.id.in_([row['id'] for row in rows]))
+    ).scalars())
+    missing = [row['id'] for row in rows if row['id'] not in existing]
+    if missing:
+        return jsonify({'error': 'Unknown user ids', 'ids': missing[:100]}), 404
+
+    try:
+        db.session.execute(update(User), rows)
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({'error': 'Username or email already exists'}), 409
+    return jsonify({'updated': len(rows)})
+
 @user_bp.route('/users/<int:user_id>', methods=['GET'])
 def get_user(user_id):
-    user = User.query.get_or_404(user_id)
+    from src.models.user import User
+    db = get_db()
+    user = db.get_or_404(User, user_id)
     return jsonify(user.to_dict())
 
 @user_bp.route('/users/<int:user_id>', methods=['PUT'])
 def update_user(user_id):
-    user = User.query.get_or_404(user_id)
+    from sqlalchemy.exc import IntegrityError
+    from src.models.user import User
+    db = get_db()
+    user = db.get_or_404(User, user_id)
     data = request.json
     user.username = data.get('username', user.username)
     user.email = data.get('email', user.email)
-    db.session.commit()
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({'error': 'Username or email already exists'}), 409
     return jsonify(user.to_dict())
 
 @user_bp.route('/users/<int:user_id>', methods=['DELETE'])
 def delete_user(user_id):
-    user = User.query.get_or_404(user_id)
+    from src.models.user import User
+    db = get_db()
+    user = db.get_or_404(User, user_id)
     db.session.delete(user)
     db.session.commit()
     return '', 204
+
+def _bulk_rows(payload, required):
+    """Validate a bulk payload (a list, or {"users": [...]}) and return (rows, error)"""
+    rows = payload.get('users') if isinstance(payload, dict) else payload
+    if not isinstance(rows, list) or not rows:
+        return None, 'Expected a non-empty list of users'
+    if len(rows) > MAX_BULK_SIZE:
+        return None, f'At most {MAX_BULK_SIZE} users per request'
+    for index, row in enumerate(rows):
+        if not isinstance(row, dict) or any(key not in row for key in required):
+            return None, f"Item {index} must include {', '.join(required)}"
+    return rows, None
@@ -0,0 +1,229 @@
+"""
+Admission control and load shedding
+Each endpoint has a concurrency limit and a short, bounded wait queue.
+Requests beyond both, or that wait longer than the queue allows, are
+rejected right away with 503 and a Retry-After estimate instead of tying up
+a worker until it is killed. Optional per-client token buckets answer
+clients that exceed their rate with 429. Behind a reverse proxy, set
+PROXY_TRUSTED_HOPS so clients are told apart by their forwarded address
+
+Limits apply per worker process (they matter with threaded workers, e.g.
+gunicorn --threads)
+"""
+
+import logging
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from werkzeug.middleware.proxy_fix import ProxyFix
+
+logger = logging.getLogger(__name__)
+
+# Concurrent requests per endpoint; endpoints not listed use DEFAULT_LIMIT
+ENDPOINT_LIMITS = {
+    "harmony.discover_music": 16,
+    "harmony.get_recommendations": 16,
+    "harmony.get_trending": 8,
+    "harmony.analyze_mood": 8,
+    "harmony.analyze_mood_batch": 2,
+    "harmony.generate_playlist": 8,
+    "harmony.build_taste_profile": 4,
+    "harmony.cross_domain_discovery": 4,
+    "harmony.generate_story": 4
+}
+DEFAULT_LIMIT = 16
+
+
+class EndpointLimiter:
+    """Concurrency limit with a bounded FIFO wait queue for one endpoint"""
+
+    def __init__(self, limit: int, queue_size: int, max_wait: float):
+        self.limit = limit
+        self.queue_size = queue_size
+        self.max_wait = max_wait
+        self._cond = threading.Condition()
+        self._active = 0
+        self._waiting = []  # Tickets in arrival order
+        self._service_time = 1.0  # EWMA of seconds a request holds a slot
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self._wait_total = 0.0
+
+    def acquire(self, timeout: Optional[float] = None) -> Tuple[bool, str]:
+        """Take a slot, waiting at most max_wait (or timeout); returns (admitted, reason)"""
+        wait = self.max_wait if timeout is None else min(self.max_wait, timeout)
+        with self._cond:
+            if self._active < self.limit and not self._waiting:
+                self._active += 1
+                self.admitted += 1
+                return True, ""
+            if len(self._waiting) >= self.queue_size or wait <= 0:
+                self.rejected += 1
+                return False, "queue full"
+            ticket = object()
+            self._waiting.append(ticket)
+            started = time.monotonic()
+            deadline = started + wait
+            try:
+                while self._active >= self.limit or self._waiting[0] is not ticket:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.timed_out += 1
+                        return False, "queue wait exceeded"
+                    self._cond.wait(remaining)
+            finally:
+                self._waiting.remove(ticket)
+                # The next waiter may be able to go now that this one left the queue
+                self._cond.notify_all()
+            self._active += 1
+            self.admitted += 1
+            self._wait_total += time.monotonic() - started
+            return True, ""
+
+    def release(self, held: float):
+        with self._cond:
+            self._active -= 1
+            self._service_time = 0.8 * self._service_time + 0.2 * held
+            self._cond.notify_all()
+
+    def retry_after(self) -> int:
+        """Seconds until the current backlog has likely drained"""
+        with self._cond:
+            backlog = self._active + len(self._waiting) + 1
+            return max(1, math.ceil(self._service_time * backlog / self.limit))
+
+    def status(self) -> Dict:
+        with self._cond:
+            return {
+                "limit": self.limit,
+                "active": self._active,
+                "waiting": len(self._waiting),
+                "admitted": self.admitted,
+                "rejected": self.rejected,
+                "timed_out": self.timed_out,
+                "avg_wait_ms": round(self._wait_total / self.admitted * 1000, 1) if self.admitted else 0.0,
+                "avg_service_ms": round(self._service_time * 1000, 1)
+            }
+
+
+class ClientRateLimiter:
+    """Token bucket per client key, keeping at most max_clients buckets (LRU)"""
+
+    def __init__(self, rate: float, burst: float, max_clients: int = 10000):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self._buckets: "OrderedDict[str, list]" = OrderedDict()  # client -> [tokens, refilled_at]
+        self._lock = threading.Lock()
+        self.throttled = 0
+
+    def allow(self, client: str) -> Tuple[bool, int]:
+        """Take a token for the client; returns (allowed, retry_after_seconds)"""
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.pop(client, None) or [self.burst, now]
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+            self._buckets[client] = bucket
+            while len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                return True, 0
+            self.throttled += 1
+            return False, max(1, math.ceil((1 - bucket[0]) / self.rate))
+
+    def status(self) -> Dict:
+        with self._lock:
+            return {"rate": self.rate, "burst": self.burst, "clients": len(self._buckets), "throttled": self.throttled}
+
+
+class AdmissionController:
+    """Per-endpoint limiters plus optional per-client rate limiting"""
+
+    def __init__(self, limits: Optional[Dict[str, int]] = None, default_limit: int = DEFAULT_LIMIT,
+                 queue_factor: float = 1.0, max_wait: float = 2.0,
+                 client_rate: float = 0.0, client_burst: float = 20.0):
+        self.limits = dict(ENDPOINT_LIMITS if limits is None else limits)
+        self.default_limit = default_limit
+        self.queue_factor = queue_factor
+        self.max_wait = max_wait
+        self.clients = ClientRateLimiter(client_rate, client_burst) if client_rate > 0 else None
+        self._limiters: Dict[str, EndpointLimiter] = {}
+        self._lock = threading.Lock()
+
+    def limiter(self, endpoint: str) -> EndpointLimiter:
+        limiter = self._limiters.get(endpoint)
+        if limiter is None:
+            with self._lock:
+                limiter = self._limiters.get(endpoint)
+                if limiter is None:
+                    limit = self.limits.get(endpoint, self.default_limit)
+                    limiter = EndpointLimiter(limit, max(1, math.ceil(limit * self.queue_factor)), self.max_wait)
+                    self._limiters[endpoint] = limiter
+        return limiter
+
+    def admit(self, endpoint: str, client: Optional[str] = None,
+              timeout: Optional[float] = None) -> Tuple[Optional[EndpointLimiter], Optional[Tuple[int, int, str]]]:
+        """Admit a request: (limiter to release, None) or (None, (status, retry_after, message))"""
+        if self.clients is not None and client:
+            allowed, retry_after = self.clients.allow(client)
+            if not allowed:
+                return None, (429, retry_after, "Too many requests from this client")
+        limiter = self.limiter(endpoint)
+        admitted, reason = limiter.acquire(timeout)
+        if not admitted:
+            return None, (503, limiter.retry_after(), f"Server busy ({reason}), please retry")
+        return limiter, None
+
+    def status(self) -> Dict:
+        with self._lock:
+            limiters = dict(self._limiters)
+        return {
+            "max_wait_s": self.max_wait,
+            "endpoints": {endpoint: limiter.status() for endpoint, limiter in sorted(limiters.items())},
+            "clients": self.clients.status() if self.clients else {"enabled": False}
+        }
+
+
+def _configured_limits() -> Dict[str, int]:
+    """Endpoint limits with ADMISSION_LIMITS overrides, e.g. 'generate_story=2,discover_music=32'"""
+    limits = dict(ENDPOINT_LIMITS)
+    for item in os.getenv("ADMISSION_LIMITS", "").split(","):
+        if "=" not in item:
+            continue
+        name, value = item.split("=", 1)
+        name = name.strip()
+        try:
+            limits[name if "." in name else f"harmony.{name}"] = max(1, int(value))
+        except ValueError:
+            logger.warning("Ignoring invalid admission limit: %s", item)
+    return limits
+
+
+def admission_from_env() -> AdmissionController:
+    return AdmissionController(
+        limits=_configured_limits(),
+        default_limit=int(os.getenv("ADMISSION_DEFAULT_LIMIT", str(DEFAULT_LIMIT))),
+        queue_factor=float(os.getenv("ADMISSION_QUEUE_FACTOR", "1.0")),
+        max_wait=float(os.getenv("ADMISSION_MAX_WAIT", "2.0")),
+        client_rate=float(os.getenv("ADMISSION_CLIENT_RATE", "0")),
+        client_burst=float(os.getenv("ADMISSION_CLIENT_BURST", "20"))
+    )
+
+
+def init_proxy_fix(app):
+    """Trust X-Forwarded-* from PROXY_TRUSTED_HOPS proxies in front of the app
+
+    Without it every client behind a proxy has the proxy's address and they
+    share one rate bucket. Only set it when such proxies are always in front:
+    a client reaching the app directly could forge its address
+    """
+    hops = int(os.getenv("PROXY_TRUSTED_HOPS", "0"))
+    if hops > 0:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=hops, x_proto=hops, x_host=hops)
@@ -0,0 +1,200 @@
+"""
+Warm-start snapshots of the Qloo response cache
+The cache (which also backs trending, recommendations and discovery results)
+is periodically written to a gzip JSON-lines file and streamed back in by a
+background thread when a worker starts, so fresh workers begin with a hot
+cache without delaying boot
+
+All workers share one file: each save merges the worker's cache into what is
+already on disk (newest stored_at wins, expired entries are dropped) under a
+file lock, so no worker's entries are lost to another's rewrite
+
+File layout: a header line {"version", "created_at"} followed by one
+{"k": key, "t": stored_at, "d": data} line per entry
+"""
+
+import atexit
+import gzip
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterable, Iterator, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Not on Windows; saves are then only atomic, not merged under a lock
+    fcntl = None
+
+from src.utils.clients import clients_loaded, get_qloo_api
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_VERSION = 1
+LOAD_BATCH_SIZE = 500  # Entries handed to the cache at a time while streaming
+
+
+class SnapshotError(Exception):
+    """Raised for unreadable or incompatible snapshot files"""
+
+
+def write_snapshot(path: str, entries) -> int:
+    """Atomically write entries to path; returns how many were written"""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    count = 0
+    try:
+        with gzip.open(temp_path, "wt", encoding="utf-8", compresslevel=5) as f:
+            f.write(json.dumps({"version": SNAPSHOT_VERSION, "created_at": time.time()}) + "\n")
+            for key, stored_at, data in entries:
+                f.write(json.dumps({"k": key, "t": stored_at, "d": data}, separators=(",", ":")) + "\n")
+                count += 1
+        # Readers only ever see a complete file, even with several workers writing
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    return count
+
+
+def iter_snapshot(path: str) -> Iterator[Tuple[str, float, dict]]:
+    """Stream (key, stored_at, data) entries from a snapshot file"""
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            header = json.loads(f.readline() or "{}")
+            if header.get("version") != SNAPSHOT_VERSION:
+                raise SnapshotError(f"Unsupported snapshot version {header.get('version')} in {path}")
+            for line in f:
+                record = json.loads(line)
+                yield record["k"], record["t"], record["d"]
+    except (OSError, EOFError, ValueError, KeyError) as e:
+        raise SnapshotError(f"Could not read snapshot {path}: {e}") from e
+
+
+@contextmanager
+def _locked(path: str):
+    """Exclusive lock shared by every process saving to path"""
+    if fcntl is None:
+        yield
+        return
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(f"{path}.lock", "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def merged_entries(path: str, entries: Iterable[Tuple[str, float, dict]],
+                   max_age: Optional[float]) -> Iterator[Tuple[str, float, dict]]:
+    """Entries already in the snapshot at path combined with new ones, newest stored_at per key"""
+    now = time.time()
+    merged = {}
+    if os.path.exists(path):
+        try:
+            for key, stored_at, data in iter_snapshot(path):
+                if max_age is None or now - stored_at < max_age:
+                    merged[key] = (stored_at, data)
+        except SnapshotError as e:
+            logger.warning("Replacing unreadable cache snapshot: %s", e)
+    for key, stored_at, data in entries:
+        current = merged.get(key)
+        if current is None or stored_at > current[0]:
+            merged[key] = (stored_at, data)
+    return ((key, stored_at, data) for key, (stored_at, data) in merged.items())
+
+
+def save_snapshot(path: str, entries: Iterable[Tuple[str, float, dict]], max_age: Optional[float]) -> int:
+    """Merge entries into the snapshot at path and rewrite it atomically; returns entries written"""
+    with _locked(path):
+        return write_snapshot(path, merged_entries(path, entries, max_age))
+
+
+def load_snapshot(api, path: str) -> int:
+    """Stream a snapshot into the client's cache in batches; returns entries loaded"""
+    loaded = 0
+    batch = []
+    for entry in iter_snapshot(path):
+        batch.append(entry)
+        if len(batch) >= LOAD_BATCH_SIZE:
+            loaded += api.import_cache(batch)
+            batch = []
+    if batch:
+        loaded += api.import_cache(batch)
+    return loaded
+
+
+class CacheSnapshotter:
+    """Loads the snapshot once, then rewrites it on an interval when the cache changed"""
+
+    def __init__(self, path: str, interval: float = 300.0):
+        self.path = path
+        self.interval = interval
+        self.loaded = 0
+        self.written = 0
+        self.last_written_at: Optional[float] = None
+        self._last_writes = 0
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="cache-snapshot", daemon=True)
+        self._thread.start()
+        atexit.register(self.save)
+
+    def _run(self):
+        self.warm()
+        while True:
+            time.sleep(self.interval)
+            self.save()
+
+    def warm(self):
+        if not os.path.exists(self.path):
+            return
+        api = get_qloo_api()
+        # Loaded entries are already on disk; only requests served since then need saving
+        self._last_writes = api.cache_writes
+        started = time.time()
+        try:
+            self.loaded = load_snapshot(api, self.path)
+            logger.info("Warmed Qloo cache with %d entries in %.2fs", self.loaded, time.time() - started)
+        except SnapshotError as e:
+            logger.warning("Skipping cache snapshot: %s", e)
+
+    def save(self):
+        # Nothing to save if the client was never used in this worker
+        if not clients_loaded()["qloo"]:
+            return
+        api = get_qloo_api()
+        with self._lock:
+            if api.cache_writes == self._last_writes:
+                return
+            writes = api.cache_writes
+            try:
+                self.written = save_snapshot(self.path, api.export_cache(), api.cache_ttl)
+                self.last_written_at = time.time()
+                self._last_writes = writes
+            except OSError as e:
+                logger.warning("Failed to write cache snapshot: %s", e)
+
+    def status(self) -> dict:
+        return {
+            "path": self.path,
+            "loaded": self.loaded,
+            "written": self.written,
+            "last_written_at": self.last_written_at
+        }
+
+
+def init_cache_snapshots(app):
+    """Start warm-start snapshots when QLOO_CACHE_SNAPSHOT points at a file"""
+    path = os.getenv("QLOO_CACHE_SNAPSHOT")
+    if not path:
+        return
+    snapshotter = CacheSnapshotter(path, interval=float(os.getenv("QLOO_CACHE_SNAPSHOT_INTERVAL", "300")))
+    snapshotter.start()
+    app.extensions["cache_snapshot"] = snapshotter
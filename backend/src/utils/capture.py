@@ -0,0 +1,259 @@
+"""
+Opt-in production traffic capture for replay-based performance testing
+A sample of harmony API requests is written to a JSON-lines log together
+with the Qloo and Gemini responses they used, so benchmarks/replay.py can
+re-run the real query mix against another build without network access
+
+Identity fields are dropped and free text (journal entries, search input,
+seeds, interests) is pseudonymized word by word with a salted hash, which
+keeps repeated and near-duplicate texts recognizable without storing their
+content. The words of a request's free text and identity fields are
+pseudonymized the same way wherever they reach the capture: in Qloo query
+parameters and responses and in Gemini response text. Replay sends the pseudonymized body, so the queries it makes
+still match the recorded ones
+
+Enable with TRAFFIC_CAPTURE_PATH (one file per worker process is written
+next to it) and TRAFFIC_CAPTURE_SAMPLE (fraction of requests, default 0.01)
+"""
+
+import hashlib
+import hmac
+import json
+import os
+import random
+import re
+import threading
+import time
+import uuid
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+from flask import g, request
+
+from src.utils.clients import get_qloo_api
+
+CAPTURE_VERSION = 1
+
+# Request fields that identify people: dropped from the capture
+IDENTITY_FIELDS = {"user_name", "username", "email", "user_id", "callback_url"}
+# Free-text request fields (and everything nested in them): pseudonymized word by word
+TEXT_FIELDS = {"text", "texts", "input", "seed_entity", "interest", "interests", "music_preferences", "theme"}
+# Request headers that influence behaviour and are safe to keep
+KEPT_HEADERS = ("Accept", "Accept-Encoding", "Content-Type", "X-Request-Deadline-Ms")
+# Endpoints that are not worth replaying
+SKIPPED_ENDPOINTS = {"harmony.health_check", "harmony.get_story_job"}
+
+WORD = re.compile(r"\w+")
+# JSON object keys are kept in Gemini responses, so replayed responses still parse
+JSON_KEY_OR_WORD = re.compile(r'("(?:[^"\\]|\\.)*"\s*:)|(\w+)')
+
+_current_capture: ContextVar[Optional[Dict[str, Any]]] = ContextVar("current_capture", default=None)
+
+
+def query_key(endpoint: str, params: Optional[Dict]) -> str:
+    """Key of one Qloo call, shared by capture and replay (values as sent on the wire)"""
+    return f"{endpoint}?{json.dumps({key: str(value) for key, value in (params or {}).items()}, sort_keys=True)}"
+
+
+def prompt_key(prompt: str) -> str:
+    return hashlib.sha256(prompt.encode()).hexdigest()
+
+
+class TrafficRecorder:
+    """Writes sampled requests and their upstream responses to a JSON-lines file"""
+
+    def __init__(self, path: str, sample_rate: float = 0.01, salt: Optional[str] = None):
+        root, ext = os.path.splitext(path)
+        self.path = f"{root}.{os.getpid()}{ext or '.jsonl'}"
+        self.sample_rate = sample_rate
+        self._salt = (salt or uuid.uuid4().hex).encode()
+        self._lock = threading.Lock()
+        self._seen_queries = set()  # Each Qloo response is written once per process
+        self.captured = 0
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._write({"type": "header", "version": CAPTURE_VERSION, "created_at": time.time()})
+
+    def _write(self, record: Dict[str, Any]):
+        line = json.dumps(record, separators=(",", ":"), default=str) + "\n"
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+
+    def pseudonymize(self, text: str) -> str:
+        def replace(match):
+            digest = hmac.new(self._salt, match.group(0).lower().encode(), hashlib.sha256).hexdigest()
+            return f"w{digest[:6]}"
+        return WORD.sub(replace, text)
+
+    def anonymize(self, value: Any, field: Optional[str] = None, free_text: bool = False) -> Any:
+        free_text = free_text or field in TEXT_FIELDS
+        if isinstance(value, dict):
+            return {key: self.anonymize(item, key, free_text) for key, item in value.items() if key not in IDENTITY_FIELDS}
+        if isinstance(value, list):
+            return [self.anonymize(item, field, free_text) for item in value]
+        if isinstance(value, str) and free_text:
+            return self.pseudonymize(value)
+        return value
+
+    def scrub(self, text: str, vocabulary: Dict[str, str]) -> str:
+        """Pseudonymize the words of text that came from the request's free text"""
+        return WORD.sub(lambda match: vocabulary.get(match.group(0).casefold(), match.group(0)), text)
+
+    def scrub_response(self, text: str, vocabulary: Dict[str, str]) -> str:
+        """scrub() for a Gemini response, leaving JSON object keys alone"""
+        def replace(match):
+            if match.group(1):
+                return match.group(1)
+            return vocabulary.get(match.group(2).casefold(), match.group(2))
+        return JSON_KEY_OR_WORD.sub(replace, text)
+
+    def record_qloo(self, endpoint: str, params: Dict, data: Dict, from_cache: bool, elapsed: float):
+        capture = _current_capture.get()
+        if capture is None:
+            return
+        capture["qloo_cache_hits" if from_cache else "qloo_calls"] += 1
+        vocabulary = capture["vocabulary"]
+        params = {
+            name: self.scrub(value, vocabulary) if isinstance(value, str) else value
+            for name, value in (params or {}).items()
+        }
+        key = query_key(endpoint, params)
+        with self._lock:
+            if key in self._seen_queries:
+                return
+            self._seen_queries.add(key)
+        # Responses can echo the query (e.g. a name searched for), so they are scrubbed too
+        data = json.loads(self.scrub_response(json.dumps(data, default=str), vocabulary))
+        self._write({"type": "qloo", "key": key, "ms": round(elapsed * 1000, 1), "data": data})
+
+    def record_gemini(self, prompt: str, text: str, elapsed: float):
+        capture = _current_capture.get()
+        if capture is None:
+            return
+        # Replay sees the pseudonymized request, so key the prompt the same way
+        for original, replacement in capture["substitutions"]:
+            prompt = prompt.replace(original, replacement)
+        capture["gemini_calls"] += 1
+        self._write({
+            "type": "gemini",
+            "request": capture["id"],
+            "seq": capture["gemini_calls"],
+            "key": prompt_key(prompt),
+            "ms": round(elapsed * 1000, 1),
+            "text": self.scrub_response(text, capture["vocabulary"])
+        })
+
+    def start(self):
+        if request.blueprint != "harmony" or request.endpoint in SKIPPED_ENDPOINTS:
+            return
+        if random.random() >= self.sample_rate:
+            return
+        body = request.get_json(silent=True)
+        capture = {
+            "id": uuid.uuid4().hex,
+            "recorder": self,
+            "started": time.perf_counter(),
+            "body": self.anonymize(body) if body is not None else None,
+            "substitutions": self._substitutions(body),
+            "vocabulary": self._vocabulary(body),
+            "qloo_calls": 0,
+            "qloo_cache_hits": 0,
+            "gemini_calls": 0
+        }
+        api = get_qloo_api()
+        if api.observer is None:
+            api.observer = self.record_qloo
+        g._capture_token = _current_capture.set(capture)
+
+    def _substitutions(self, body: Any):
+        return [(value, self.pseudonymize(value)) for value in free_texts(body) if value]
+
+    def _vocabulary(self, body: Any) -> Dict[str, str]:
+        """Pseudonym of every word in the request's free text and identity fields, keyed by its case-folded form"""
+        vocabulary = {}
+        for value in free_texts(body) + identity_texts(body):
+            for word in WORD.findall(value):
+                # Numbers are left alone: they also appear as limits and offsets
+                if not word.isdigit():
+                    vocabulary[word.casefold()] = self.pseudonymize(word)
+        return vocabulary
+
+    def finish(self, response):
+        capture = _current_capture.get()
+        if capture is None:
+            return response
+        self._write({
+            "type": "request",
+            "id": capture["id"],
+            "at": time.time(),
+            "method": request.method,
+            "path": request.path,
+            "query": request.query_string.decode(),
+            "headers": {name: request.headers[name] for name in KEPT_HEADERS if name in request.headers},
+            "body": capture["body"],
+            "status": response.status_code,
+            "ms": round((time.perf_counter() - capture["started"]) * 1000, 1),
+            "qloo_calls": capture["qloo_calls"],
+            "qloo_cache_hits": capture["qloo_cache_hits"],
+            "gemini_calls": capture["gemini_calls"]
+        })
+        self.captured += 1
+        return response
+
+
+def free_texts(value: Any, free_text: bool = False) -> List[str]:
+    """Strings in the free-text fields of a request body"""
+    if isinstance(value, dict):
+        return [text for key, item in value.items() for text in free_texts(item, free_text or key in TEXT_FIELDS)]
+    if isinstance(value, list):
+        return [text for item in value for text in free_texts(item, free_text)]
+    return [value] if free_text and isinstance(value, str) else []
+
+
+def identity_texts(value: Any) -> List[str]:
+    """Strings in the identity fields of a request body, which responses may echo back"""
+    if isinstance(value, dict):
+        return [text for key, item in value.items()
+                for text in (free_texts(item, True) if key in IDENTITY_FIELDS else identity_texts(item))]
+    if isinstance(value, list):
+        return [text for item in value for text in identity_texts(item)]
+    return []
+
+
+def record_gemini(prompt: str, response: Any, elapsed: float):
+    """Record a Gemini response if the current request is being captured"""
+    capture = _current_capture.get()
+    if capture is None:
+        return
+    try:
+        text = response.text
+    except ValueError:  # Blocked or empty candidates: nothing to replay
+        return
+    capture["recorder"].record_gemini(prompt, text, elapsed)
+
+
+def init_traffic_capture(app):
+    """Capture a sample of API traffic when TRAFFIC_CAPTURE_PATH is set"""
+    path = os.getenv("TRAFFIC_CAPTURE_PATH")
+    if not path:
+        return
+    recorder = TrafficRecorder(
+        path,
+        sample_rate=float(os.getenv("TRAFFIC_CAPTURE_SAMPLE", "0.01")),
+        salt=os.getenv("TRAFFIC_CAPTURE_SALT")
+    )
+    app.extensions["traffic_capture"] = recorder
+
+    @app.before_request
+    def _start_capture():
+        recorder.start()
+
+    @app.after_request
+    def _finish_capture(response):
+        return recorder.finish(response)
+
+    @app.teardown_request
+    def _end_capture(exc=None):
+        token = g.pop("_capture_token", None)
+        if token is not None:
+            _current_capture.reset(token)
@@ -0,0 +1,113 @@
+"""
+Lazily initialized upstream clients
+The Qloo wrapper, the Gemini SDK (gRPC, protobuf) and the SQLAlchemy user
+store are imported and configured on first use instead of at import time, so
+worker boot stays fast
+"""
+
+import os
+import threading
+
+from flask import current_app
+
+from src.utils.deadline import current_deadline
+from src.utils.tracing import span
+
+_lock = threading.Lock()
+_qloo_api = None
+_genai = None
+
+
+def _qloo_credentials():
+    """(api_key, base_url) pairs from QLOO_API_KEYS / QLOO_API_BASES, or None for a single key
+
+    Keys and bases are comma separated; a single base is shared by every key,
+    otherwise they are paired in order
+    """
+    keys = [key.strip() for key in os.getenv("QLOO_API_KEYS", "").split(",") if key.strip()]
+    if not keys:
+        return None
+    bases = [base.strip() for base in os.getenv("QLOO_API_BASES", "").split(",") if base.strip()]
+    bases = bases or ["https://hackathon.api.qloo.com"]
+    return [(key, bases[index % len(bases)]) for index, key in enumerate(keys)]
+
+
+def get_qloo_api():
+    """Return the shared QlooAPI instance, creating it on first use"""
+    global _qloo_api
+    if _qloo_api is None:
+        with _lock:
+            if _qloo_api is None:
+                from qloo_api import QlooAPI, RetryPolicy
+                from src.utils.distributed_cache import distributed_cache_from_env
+
+                client = QlooAPI(
+                    os.getenv("QLOO_API_KEY"),
+                    timeout=float(os.getenv("QLOO_TIMEOUT", "10")),
+                    retry_policy=RetryPolicy(
+                        max_retries=int(os.getenv("QLOO_MAX_RETRIES", "2")),
+                        backoff_base=float(os.getenv("QLOO_BACKOFF_BASE", "0.2")),
+                        backoff_max=float(os.getenv("QLOO_BACKOFF_MAX", "2.0"))
+                    ),
+                    breaker_threshold=float(os.getenv("QLOO_BREAKER_THRESHOLD", "0.5")),
+                    breaker_min_requests=int(os.getenv("QLOO_BREAKER_MIN_REQUESTS", "5")),
+                    breaker_cooldown=float(os.getenv("QLOO_BREAKER_COOLDOWN", "30")),
+                    cache_ttl=float(os.getenv("QLOO_CACHE_TTL", "3600")),
+                    min_request_interval=float(os.getenv("QLOO_MIN_REQUEST_INTERVAL", "0.1")),
+                    preempt_threshold=int(os.getenv("QLOO_PREEMPT_THRESHOLD", "4")),
+                    credentials=_qloo_credentials(),
+                    shard_cooldown=float(os.getenv("QLOO_SHARD_COOLDOWN", "30")),
+                    sort_query_tokens=os.getenv("QLOO_SORT_QUERY_TOKENS", "0") in ("1", "true")
+                )
+                client.tracer = span
+                client.deadline_provider = current_deadline
+                client.shared_cache = distributed_cache_from_env()
+                _qloo_api = client
+    return _qloo_api
+
+
+def get_genai():
+    """Return the configured google.generativeai module, importing it on first use"""
+    global _genai
+    if _genai is None:
+        with _lock:
+            if _genai is None:
+                import google.generativeai as genai
+
+                genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+                _genai = genai
+    return _genai
+
+
+def get_db():
+    """Return the Flask-SQLAlchemy handle, configuring the user store for the current app on first use"""
+    app = current_app._get_current_object()
+    if "sqlalchemy" not in app.extensions:
+        with _lock:
+            if "sqlalchemy" not in app.extensions:
+                from src.models.user import configure_database
+
+                # Flask rejects setup calls (init_app registers a teardown) once a request
+                # was handled; nothing has used the database yet, so this one is safe
+                handled, app._got_first_request = app._got_first_request, False
+                try:
+                    configure_database(app)
+                finally:
+                    app._got_first_request = handled
+    from src.models.user import db
+    return db
+
+
+def use_clients(qloo_api=None, genai=None):
+    """Install substitute clients (e.g. replay from a recording) instead of the real ones"""
+    global _qloo_api, _genai
+    with _lock:
+        if qloo_api is not None:
+            _qloo_api = qloo_api
+        if genai is not None:
+            _genai = genai
+
+
+def clients_loaded() -> dict:
+    """Which clients have been initialized in this worker"""
+    return {"qloo": _qloo_api is not None, "gemini": _genai is not None}
@@ -0,0 +1,149 @@
+"""
+End-to-end request deadlines
+Each request gets a time budget (per endpoint, optionally shortened by the
+client) that upstream calls use to cap their timeouts and skip optional work
+"""
+
+import logging
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+from flask import g, request
+
+logger = logging.getLogger(__name__)
+
+# Default budgets in seconds, keyed by Flask endpoint name
+ENDPOINT_BUDGETS = {
+    "harmony.discover_music": 8.0,
+    "harmony.get_recommendations": 8.0,
+    "harmony.get_trending": 6.0,
+    "harmony.analyze_mood": 12.0,
+    "harmony.analyze_mood_batch": 60.0,
+    "harmony.generate_playlist": 10.0,
+    "harmony.build_taste_profile": 15.0,
+    "harmony.cross_domain_discovery": 12.0,
+    "harmony.generate_story": 45.0
+}
+
+DEADLINE_HEADER = "X-Request-Deadline-Ms"
+
+_current_deadline: ContextVar[Optional["Deadline"]] = ContextVar("current_deadline", default=None)
+
+
+class DeadlineExceeded(Exception):
+    """Raised when there is not enough budget left for a required upstream call"""
+
+
+class Deadline:
+    """Absolute point in time by which a request should have answered"""
+
+    def __init__(self, budget: float):
+        self.budget = budget
+        self.expires_at = time.monotonic() + budget
+        self.partial = False
+        self.skipped: List[str] = []
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def mark_partial(self, reason: str):
+        """Record that some work was skipped to stay within the budget"""
+        self.partial = True
+        if reason not in self.skipped:
+            self.skipped.append(reason)
+
+
+def current_deadline() -> Optional[Deadline]:
+    return _current_deadline.get()
+
+
+@contextmanager
+def deadline_scope(budget: Optional[float]):
+    """Run a block (e.g. a background job) under its own deadline"""
+    if budget is None:
+        yield None
+        return
+    deadline = Deadline(budget)
+    token = _current_deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current_deadline.reset(token)
+
+
+def remaining_time() -> Optional[float]:
+    """Seconds left for the current request, or None when no deadline applies"""
+    deadline = _current_deadline.get()
+    return deadline.remaining() if deadline else None
+
+
+def has_budget(seconds: float) -> bool:
+    """Whether at least `seconds` remain (always True without a deadline)"""
+    remaining = remaining_time()
+    return remaining is None or remaining >= seconds
+
+
+def mark_partial(reason: str):
+    deadline = _current_deadline.get()
+    if deadline:
+        deadline.mark_partial(reason)
+
+
+def is_partial() -> bool:
+    deadline = _current_deadline.get()
+    return bool(deadline and deadline.partial)
+
+
+def _configured_budgets() -> Dict[str, float]:
+    """Endpoint budgets with REQUEST_DEADLINES overrides, e.g. 'discover_music=5,generate_story=30'"""
+    budgets = dict(ENDPOINT_BUDGETS)
+    for item in os.getenv("REQUEST_DEADLINES", "").split(","):
+        if "=" not in item:
+            continue
+        name, value = item.split("=", 1)
+        name = name.strip()
+        try:
+            budgets[name if "." in name else f"harmony.{name}"] = float(value)
+        except ValueError:
+            logger.warning("Ignoring invalid deadline override: %s", item)
+    return budgets
+
+
+def init_deadlines(app):
+    """Register hooks that attach a deadline to every API request"""
+    budgets = _configured_budgets()
+    default_budget = float(os.getenv("REQUEST_DEADLINE_SECONDS", "15"))
+
+    @app.before_request
+    def _start_deadline():
+        if not request.path.startswith("/api/"):
+            return
+        budget = budgets.get(request.endpoint, default_budget)
+
+        # Clients may ask for a tighter deadline, never a looser one
+        client_ms = request.headers.get(DEADLINE_HEADER)
+        if client_ms:
+            try:
+                budget = min(budget, max(0.0, float(client_ms) / 1000))
+            except ValueError:
+                pass
+        g._deadline_token = _current_deadline.set(Deadline(budget))
+
+    @app.after_request
+    def _flag_partial(response):
+        deadline = _current_deadline.get()
+        if deadline and deadline.partial:
+            response.headers["X-Partial-Result"] = "true"
+        return response
+
+    @app.teardown_request
+    def _end_deadline(exc=None):
+        token = g.pop("_deadline_token", None)
+        if token is not None:
+            _current_deadline.reset(token)
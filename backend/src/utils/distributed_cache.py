@@ -0,0 +1,126 @@
+"""
+Distributed Qloo response cache
+Shards cache entries across cache nodes (python -m src.cache_node) on the
+same consistent-hash ring with virtual nodes that routes Qloo shards, so a
+response fetched by any host is reused by all of them and total cache size
+grows with the number of nodes. Lookups for several keys cost one request
+per node, sent in parallel
+
+A node that fails is skipped for a cooldown; its keys then miss here and
+QlooAPI carries on with its local in-process cache
+"""
+
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import requests
+
+from qloo_api import HashRing
+
+logger = logging.getLogger(__name__)
+
+
+class CacheNode:
+    """One cache node as seen by the client: health and hit counts"""
+
+    def __init__(self, url: str, cooldown: float):
+        self.url = url.rstrip("/")
+        self.cooldown = cooldown
+        self.down_until = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.errors = 0
+
+    def healthy(self) -> bool:
+        return time.monotonic() >= self.down_until
+
+    def mark_down(self, error: Exception):
+        self.errors += 1
+        if self.healthy():
+            logger.warning("Cache node %s unavailable for %ss, using the local cache: %s", self.url, self.cooldown, error)
+        self.down_until = time.monotonic() + self.cooldown
+
+    def status(self) -> Dict:
+        return {
+            "healthy": self.healthy(),
+            "hits": self.hits,
+            "misses": self.misses,
+            "writes": self.writes,
+            "errors": self.errors
+        }
+
+
+class DistributedCache:
+    """Client for a set of cache nodes; plugs into QlooAPI.shared_cache"""
+
+    def __init__(self, nodes: List[str], vnodes: int = 64, timeout: float = 0.25, cooldown: float = 10.0):
+        self.nodes = [CacheNode(url, cooldown) for url in nodes]
+        self._ring = HashRing(self.nodes, vnodes=vnodes, name=lambda node: node.url)
+        self.timeout = timeout
+        self.session = requests.Session()
+        self._pool = ThreadPoolExecutor(len(self.nodes), thread_name_prefix="cache-node") if len(self.nodes) > 1 else None
+
+    def owner(self, key: str) -> CacheNode:
+        """Node a key lives on; keys are not moved while it is down, they just miss"""
+        return next(self._ring.walk(key))
+
+    def _post(self, node: CacheNode, path: str, payload: Dict) -> Optional[Dict]:
+        try:
+            response = self.session.post(f"{node.url}{path}", json=payload, timeout=self.timeout)
+            response.raise_for_status()
+            return response.json()
+        except (requests.RequestException, ValueError) as e:
+            node.mark_down(e)
+            return None
+
+    def _get_from(self, node: CacheNode, keys: List[str]) -> Dict[str, Tuple[Dict, float]]:
+        reply = self._post(node, "/mget", {"keys": keys})
+        if reply is None:
+            return {}
+        entries = reply.get("entries", {})
+        node.hits += len(entries)
+        node.misses += len(keys) - len(entries)
+        return {key: (data, stored_at) for key, (stored_at, data) in entries.items()}
+
+    def get_many(self, keys: List[str]) -> Dict[str, Tuple[Dict, float]]:
+        """(data, stored_at) for the keys found, with one request per node involved"""
+        by_node: Dict[CacheNode, List[str]] = {}
+        for key in keys:
+            node = self.owner(key)
+            if node.healthy():
+                by_node.setdefault(node, []).append(key)
+        if not by_node:
+            return {}
+        if len(by_node) == 1 or self._pool is None:
+            batches = [self._get_from(node, node_keys) for node, node_keys in by_node.items()]
+        else:
+            batches = self._pool.map(lambda batch: self._get_from(*batch), by_node.items())
+        found = {}
+        for batch in batches:
+            found.update(batch)
+        return found
+
+    def set(self, key: str, data: Dict, stored_at: float):
+        node = self.owner(key)
+        if node.healthy() and self._post(node, "/mset", {"entries": [[key, stored_at, data]]}) is not None:
+            node.writes += 1
+
+    def status(self) -> Dict:
+        return {node.url: node.status() for node in self.nodes}
+
+
+def distributed_cache_from_env() -> Optional[DistributedCache]:
+    """Client for QLOO_CACHE_NODES (comma-separated base URLs), or None when unset"""
+    nodes = [node.strip() for node in os.getenv("QLOO_CACHE_NODES", "").split(",") if node.strip()]
+    if not nodes:
+        return None
+    return DistributedCache(
+        nodes,
+        vnodes=int(os.getenv("QLOO_CACHE_VNODES", "64")),
+        timeout=float(os.getenv("QLOO_CACHE_NODE_TIMEOUT", "0.25")),
+        cooldown=float(os.getenv("QLOO_CACHE_NODE_COOLDOWN", "10"))
+    )
@@ -0,0 +1,179 @@
+"""
+Per-user exposure history
+Remembers which items each user has already been shown, so ranking can
+filter or down-rank them. Each user gets a pair of Bloom filters (current
+and previous generation) that rotate when the current one is full or a
+window has passed, so an item is remembered for between one and two
+windows and memory per user is fixed. Users are kept in an LRU up to
+max_users, which bounds the whole store
+
+A membership check costs one hash and k bit probes regardless of history
+length. False positives (an unseen item treated as seen) stay below
+error_rate; there are no false negatives within the window
+"""
+
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, TypeVar
+
+T = TypeVar("T")
+
+MODES = ("downrank", "filter", "off")
+
+
+def item_key(name: str) -> str:
+    return " ".join(str(name).casefold().split())
+
+
+def bit_positions(name: str, size: int, hashes: int) -> List[int]:
+    """Bloom filter bits of an item: double hashing over the two halves of its hash
+
+    hash() is salted per process, which is fine for a store that lives in one process
+    """
+    value = hash(item_key(name))
+    first = value & 0xFFFFFFFF
+    second = (value >> 32) | 1
+    return [(first + index * second) % size for index in range(hashes)]
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over precomputed bit positions"""
+
+    __slots__ = ("bits", "count")
+
+    def __init__(self, size: int):
+        self.bits = bytearray((size + 7) // 8)
+        self.count = 0
+
+    def add(self, positions: List[int]):
+        for position in positions:
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, positions: List[int]) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in positions)
+
+
+class UserExposure:
+    """Two rotating Bloom filter generations for one user"""
+
+    __slots__ = ("current", "previous", "started_at")
+
+    def __init__(self, size: int, now: float):
+        self.current = BloomFilter(size)
+        self.previous: Optional[BloomFilter] = None
+        self.started_at = now
+
+    def seen(self, positions: List[int]) -> bool:
+        return positions in self.current or (self.previous is not None and positions in self.previous)
+
+
+class ExposureStore:
+    """Exposure history for up to max_users users, each within a fixed memory budget"""
+
+    def __init__(self, max_users: int = 50000, capacity: int = 256, error_rate: float = 0.01,
+                 window: float = 86400.0, mode: str = "downrank"):
+        if mode not in MODES:
+            raise ValueError(f"Unknown exposure mode '{mode}', expected one of {', '.join(MODES)}")
+        self.max_users = max_users
+        self.capacity = capacity  # Items per generation before it rotates
+        self.window = window  # Seconds per generation
+        self.mode = mode
+        # Optimal Bloom parameters for `capacity` items; both generations are checked,
+        # so each gets half the error budget
+        self.size = max(64, math.ceil(-capacity * math.log(error_rate / 2) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self._users: "OrderedDict[str, UserExposure]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"checks": 0, "seen": 0, "recorded": 0, "rotations": 0, "evictions": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != "off"
+
+    def _user(self, user: str, create: bool) -> Optional[UserExposure]:
+        """A user's filters, rotated if due (lock held)"""
+        now = time.time()
+        exposure = self._users.get(user)
+        if exposure is None:
+            if not create:
+                return None
+            exposure = self._users[user] = UserExposure(self.size, now)
+            while len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+                self._stats["evictions"] += 1
+        else:
+            self._users.move_to_end(user)
+        self._rotate(exposure, now)
+        return exposure
+
+    def _rotate(self, exposure: UserExposure, now: float):
+        """Start a new generation when the current one is full or a window old (lock held)"""
+        if now - exposure.started_at < self.window and exposure.current.count < self.capacity:
+            return
+        # Items older than two windows are forgotten entirely
+        expired = now - exposure.started_at >= 2 * self.window
+        exposure.previous = None if expired else exposure.current
+        exposure.current = BloomFilter(self.size)
+        exposure.started_at = now
+        self._stats["rotations"] += 1
+
+    def rank(self, user: Optional[str], items: List[T], name: Callable[[T], str]) -> List[T]:
+        """Items the user has not seen first (order kept); seen ones last, or dropped when filtering"""
+        if not user or not self.enabled or not items or user not in self._users:
+            return items
+        # Hash outside the lock; only the bit probes need it
+        positions = [bit_positions(name(item), self.size, self.hashes) for item in items]
+        with self._lock:
+            exposure = self._user(user, create=False)
+            if exposure is None:
+                return items
+            seen_flags = [exposure.seen(item_positions) for item_positions in positions]
+            self._stats["checks"] += len(items)
+            self._stats["seen"] += sum(seen_flags)
+        unseen = [item for item, seen in zip(items, seen_flags) if not seen]
+        if self.mode == "filter":
+            return unseen
+        return unseen + [item for item, seen in zip(items, seen_flags) if seen]
+
+    def record(self, user: Optional[str], names: List[str]):
+        """Remember that the user was shown these items"""
+        if not user or not self.enabled or not names:
+            return
+        positions = [bit_positions(item_name, self.size, self.hashes) for item_name in names]
+        with self._lock:
+            exposure = self._user(user, create=True)
+            for item_positions in positions:
+                if not exposure.seen(item_positions):
+                    # A full generation rotates mid-batch (age was already checked)
+                    self._rotate(exposure, exposure.started_at)
+                    exposure.current.add(item_positions)
+            self._stats["recorded"] += len(names)
+
+    def bytes_per_user(self) -> int:
+        return 2 * ((self.size + 7) // 8)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "mode": self.mode,
+                "users": len(self._users),
+                "max_users": self.max_users,
+                "bits_per_generation": self.size,
+                "hashes": self.hashes,
+                "max_filter_bytes": len(self._users) * self.bytes_per_user(),
+                **self._stats
+            }
+
+
+def exposure_from_env() -> ExposureStore:
+    return ExposureStore(
+        max_users=int(os.getenv("EXPOSURE_MAX_USERS", "50000")),
+        capacity=int(os.getenv("EXPOSURE_CAPACITY", "256")),
+        error_rate=float(os.getenv("EXPOSURE_ERROR_RATE", "0.01")),
+        window=float(os.getenv("EXPOSURE_WINDOW", "86400")),
+        mode=os.getenv("EXPOSURE_MODE", "downrank")
+    )
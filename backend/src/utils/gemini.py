@@ -0,0 +1,157 @@
+"""
+Gemini model routing and token budgeting
+Each operation is sent to a model tier (a lighter, faster model for short or
+structured answers) with an output cap sized for the answer it needs. Prompt
+size is estimated before sending, and latency and token usage are tracked
+per tier
+"""
+
+import math
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+from src.utils.capture import record_gemini
+from src.utils.clients import get_genai
+from src.utils.deadline import DeadlineExceeded, remaining_time
+from src.utils.tracing import span
+
+GEMINI_MIN_BUDGET = 1.0  # Minimum remaining request budget (seconds) for a call
+
+TIERS = {
+    "lite": os.getenv("GEMINI_MODEL_LITE", "gemini-2.5-flash-lite"),
+    "standard": os.getenv("GEMINI_MODEL_STANDARD", "gemini-2.5-flash")
+}
+
+# Tier and answer size (in tokens) per operation; stories depend on story_length
+OPERATIONS = {
+    "mood": {"tier": "lite", "answer_tokens": 256},
+    "mood_batch": {"tier": "lite", "answer_tokens": 256, "tokens_per_item": 120},
+    "story": {
+        "short": {"tier": "lite", "answer_tokens": 450},
+        "medium": {"tier": "standard", "answer_tokens": 750},
+        "long": {"tier": "standard", "answer_tokens": 1200}
+    }
+}
+
+# 2.5 models spend part of max_output_tokens on thinking before answering
+THINKING_HEADROOM = int(os.getenv("GEMINI_THINKING_HEADROOM", "1024"))
+MAX_PROMPT_TOKENS = int(os.getenv("GEMINI_MAX_PROMPT_TOKENS", "30000"))
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about 4 characters per token for English text)"""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def trim_names(names: List[str], max_items: int = 8, max_chars: int = 80, max_tokens: int = 200) -> List[str]:
+    """Keep at most max_items names, each truncated, within a token budget"""
+    trimmed = []
+    used = 0
+    for name in names[:max_items]:
+        name = str(name).strip()[:max_chars]
+        cost = estimate_tokens(name) + 1
+        if trimmed and used + cost > max_tokens:
+            break
+        trimmed.append(name)
+        used += cost
+    return trimmed
+
+
+def route(operation: str, story_length: Optional[str] = None, items: int = 1) -> Dict[str, Any]:
+    """Model tier, model name and max_output_tokens for an operation"""
+    config = OPERATIONS[operation]
+    if operation == "story":
+        config = config.get(story_length, config["medium"])
+    answer_tokens = config["answer_tokens"] + config.get("tokens_per_item", 0) * items
+    return {
+        "tier": config["tier"],
+        "model": TIERS[config["tier"]],
+        "max_output_tokens": answer_tokens + THINKING_HEADROOM
+    }
+
+
+class TierStats:
+    """Latency and token usage per model tier"""
+
+    def __init__(self, samples: int = 200):
+        self._lock = threading.Lock()
+        self._samples = samples
+        self._tiers: Dict[str, Dict[str, Any]] = {}
+
+    def record(self, tier: str, latency: float, prompt_tokens: int, output_tokens: Optional[int], error: bool = False):
+        with self._lock:
+            stats = self._tiers.setdefault(tier, {
+                "calls": 0, "errors": 0, "prompt_tokens": 0, "output_tokens": 0,
+                "latencies": deque(maxlen=self._samples)
+            })
+            stats["calls"] += 1
+            stats["errors"] += int(error)
+            stats["prompt_tokens"] += prompt_tokens
+            stats["output_tokens"] += output_tokens or 0
+            stats["latencies"].append(latency)
+
+    def status(self) -> Dict[str, Dict]:
+        with self._lock:
+            report = {}
+            for tier, stats in self._tiers.items():
+                latencies = sorted(stats["latencies"])
+                report[tier] = {
+                    "model": TIERS.get(tier),
+                    "calls": stats["calls"],
+                    "errors": stats["errors"],
+                    "prompt_tokens": stats["prompt_tokens"],
+                    "output_tokens": stats["output_tokens"],
+                    "avg_latency_ms": round(sum(latencies) / len(latencies) * 1000, 1) if latencies else 0.0,
+                    "p95_latency_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000, 1) if latencies else 0.0
+                }
+            return report
+
+
+tier_stats = TierStats()
+
+
+def _output_tokens(response) -> Optional[int]:
+    usage = getattr(response, "usage_metadata", None)
+    return getattr(usage, "candidates_token_count", None) if usage else None
+
+
+def generate_with_gemini(prompt: str, operation: str = "story", story_length: Optional[str] = None, items: int = 1):
+    """Call the Gemini tier chosen for the operation, within the current request's deadline"""
+    request_options = None
+    remaining = remaining_time()
+    if remaining is not None:
+        if remaining < GEMINI_MIN_BUDGET:
+            raise DeadlineExceeded("Not enough time left for a Gemini call")
+        request_options = {"timeout": remaining}
+
+    prompt_tokens = estimate_tokens(prompt)
+    if prompt_tokens > MAX_PROMPT_TOKENS:
+        raise ValueError(f"Prompt too large: about {prompt_tokens} tokens (limit {MAX_PROMPT_TOKENS})")
+
+    choice = route(operation, story_length, items)
+    genai = get_genai()
+    from google.api_core import exceptions as google_exceptions
+
+    model = genai.GenerativeModel(choice["model"])
+    started = time.perf_counter()
+    try:
+        with span(f"gemini_{choice['tier']}"):
+            response = model.generate_content(
+                prompt,
+                generation_config={"max_output_tokens": choice["max_output_tokens"]},
+                request_options=request_options
+            )
+    except google_exceptions.DeadlineExceeded as e:
+        tier_stats.record(choice["tier"], time.perf_counter() - started, prompt_tokens, None, error=True)
+        raise DeadlineExceeded(str(e)) from e
+    except Exception:
+        tier_stats.record(choice["tier"], time.perf_counter() - started, prompt_tokens, None, error=True)
+        raise
+    elapsed = time.perf_counter() - started
+    tier_stats.record(choice["tier"], elapsed, prompt_tokens, _output_tokens(response))
+    record_gemini(prompt, response, elapsed)
+    return response
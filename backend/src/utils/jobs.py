@@ -0,0 +1,400 @@
+"""
+Background job queue for long-running generations
+Jobs live in a SQLite file shared by every worker process on the host, so a
+job can be polled from any worker and survives the process that queued it.
+Each process drains the queue with a dedicated pool of worker threads, so
+slow work (e.g. Gemini stories) does not hold request workers. Identical
+pending jobs are deduplicated (the job keeps every caller's webhook and the
+highest priority asked for) and finished results expire after a TTL. A
+running job whose lease runs out (its process died or was recycled) is
+queued again, once
+"""
+
+import hashlib
+import ipaddress
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional
+from urllib.parse import urlparse
+
+import requests
+
+from src.utils.log import request_id_scope
+
+logger = logging.getLogger(__name__)
+
+PRIORITIES = {"high": 0, "normal": 1, "low": 2}
+
+PENDING = "pending"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+WEBHOOK_TIMEOUT = 5
+MAX_ATTEMPTS = 2  # A job whose worker died is retried once, then failed
+POLL_INTERVAL = 1.0  # Seconds between checks for jobs queued by other processes
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    queue TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    priority TEXT NOT NULL,
+    rank INTEGER NOT NULL,
+    callback_url TEXT,  -- Newline separated, one per caller of a deduplicated job
+    status TEXT NOT NULL,
+    result TEXT,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    lease_until REAL,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_next ON jobs (queue, status, rank, created_at);
+CREATE INDEX IF NOT EXISTS jobs_fingerprint ON jobs (queue, fingerprint, status);
+"""
+
+_COLUMNS = "id, payload, fingerprint, priority, callback_url, status, result, error, created_at, started_at, finished_at"
+
+
+class QueueFull(Exception):
+    """Raised when the job queue has no room for another job"""
+
+
+@dataclass
+class Job:
+    """One queued unit of work and its outcome"""
+    id: str
+    payload: Dict[str, Any]
+    fingerprint: str
+    priority: str = "normal"
+    callback_urls: List[str] = field(default_factory=list)
+    status: str = PENDING
+    result: Any = None
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+    @classmethod
+    def from_row(cls, row: tuple) -> "Job":
+        (job_id, payload, key, priority, callback_url, status, result, error,
+         created_at, started_at, finished_at) = row
+        return cls(id=job_id, payload=json.loads(payload), fingerprint=key, priority=priority,
+                   callback_urls=split_callbacks(callback_url), status=status,
+                   result=json.loads(result) if result is not None else None, error=error,
+                   created_at=created_at, started_at=started_at, finished_at=finished_at)
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {
+            "job_id": self.id,
+            "status": self.status,
+            "priority": self.priority,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at
+        }
+        if self.status == SUCCEEDED:
+            data["result"] = self.result
+        elif self.status == FAILED:
+            data["error"] = self.error
+        return data
+
+
+def fingerprint(payload: Dict[str, Any]) -> str:
+    """Stable hash of a payload, used to spot identical pending jobs"""
+    encoded = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+def split_callbacks(value: Optional[str]) -> List[str]:
+    return value.split("\n") if value else []
+
+
+def valid_callback_url(url: Optional[str]) -> bool:
+    # Whitespace is refused so stored callbacks can be newline separated
+    if not url or any(char.isspace() for char in url):
+        return False
+    parsed = urlparse(url)
+    return parsed.scheme in ("http", "https") and bool(parsed.hostname)
+
+
+def callback_url_error(url: str, allowed_hosts: Optional[Iterable[str]] = None) -> Optional[str]:
+    """Why a callback URL may not be called, or None when it may
+
+    With allowed_hosts only those hosts are accepted. Otherwise the host must
+    resolve to public addresses only, so clients cannot make the server POST
+    to loopback, private, link-local (e.g. cloud metadata) or reserved ones
+    """
+    if not valid_callback_url(url):
+        return "callback_url must be an http(s) URL"
+    parsed = urlparse(url)
+    host = parsed.hostname.lower()
+    if allowed_hosts:
+        return None if host in allowed_hosts else f"callback_url host '{host}' is not allowed"
+    try:
+        addresses = {info[4][0] for info in socket.getaddrinfo(host, parsed.port or None, proto=socket.IPPROTO_TCP)}
+    except (socket.gaierror, UnicodeError, ValueError):
+        return f"callback_url host '{host}' does not resolve"
+    for address in addresses:
+        ip = ipaddress.ip_address(address.split("%", 1)[0])
+        if not ip.is_global or ip.is_multicast:
+            return f"callback_url host '{host}' resolves to a non-public address"
+    return None
+
+
+class JobQueue:
+    """Bounded priority queue in a shared SQLite file, with worker threads in each process"""
+
+    def __init__(self, handler: Callable[[Dict[str, Any]], Any], path: str, workers: int = 2,
+                 max_pending: int = 100, result_ttl: float = 900.0, lease: float = 300.0,
+                 name: str = "jobs", callback_hosts: Optional[Iterable[str]] = None):
+        self.handler = handler
+        self.path = path
+        self.workers = max(1, workers)
+        self.max_pending = max_pending
+        self.result_ttl = result_ttl
+        self.lease = lease  # Seconds a running job may go without finishing before it is requeued
+        self.name = name
+        self.callback_hosts = {host.lower() for host in callback_hosts} if callback_hosts else None
+        self._local = threading.local()
+        self._wakeup = threading.Condition()
+        self._threads = []
+        self._threads_pid = None
+        self._start_lock = threading.Lock()
+        # Counters for this process; job counts by status come from the shared table
+        self._completed = 0
+        self._failed = 0
+        self._deduplicated = 0
+
+    def _db(self) -> sqlite3.Connection:
+        """This thread's connection, opened again after a fork"""
+        local = self._local
+        if getattr(local, "pid", None) != os.getpid():
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.executescript(SCHEMA)
+            local.connection, local.pid = connection, os.getpid()
+        return local.connection
+
+    def _transaction(self):
+        """Write transaction taken up front, so check-then-write is atomic across processes"""
+        connection = self._db()
+        connection.execute("BEGIN IMMEDIATE")
+        return connection
+
+    def _ensure_workers(self):
+        # Started lazily (and again after a fork) so importing the module spawns nothing
+        with self._start_lock:
+            if self._threads_pid == os.getpid():
+                return
+            self._threads = []
+            self._threads_pid = os.getpid()
+            for index in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f"{self.name}-worker-{index}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(self, payload: Dict[str, Any], priority: str = "normal",
+               callback_url: Optional[str] = None) -> Job:
+        """Queue a job, or join the identical job that is already pending or running
+
+        Joining adds callback_url to the job's webhooks and raises a pending
+        job to the higher of the two priorities
+        """
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority '{priority}', expected one of {', '.join(PRIORITIES)}")
+        if callback_url:
+            error = callback_url_error(callback_url, self.callback_hosts)
+            if error:
+                raise ValueError(error)
+
+        key = fingerprint(payload)
+        self._ensure_workers()
+        connection = self._transaction()
+        try:
+            self._prune(connection)
+            row = connection.execute(
+                f"SELECT {_COLUMNS} FROM jobs WHERE queue = ? AND fingerprint = ? AND status IN (?, ?) LIMIT 1",
+                (self.name, key, PENDING, RUNNING)
+            ).fetchone()
+            if row is not None:
+                job = self._join(connection, Job.from_row(row), priority, callback_url)
+                connection.execute("COMMIT")
+                self._deduplicated += 1
+                return job
+
+            pending = connection.execute(
+                "SELECT COUNT(*) FROM jobs WHERE queue = ? AND status = ?", (self.name, PENDING)
+            ).fetchone()[0]
+            if pending >= self.max_pending:
+                raise QueueFull(f"{self.name} queue is full ({self.max_pending} pending)")
+
+            job = Job(id=uuid.uuid4().hex, payload=payload, fingerprint=key,
+                      priority=priority, callback_urls=[callback_url] if callback_url else [])
+            connection.execute(
+                "INSERT INTO jobs (id, queue, fingerprint, payload, priority, rank, callback_url, status, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (job.id, self.name, key, json.dumps(payload, default=str), priority, PRIORITIES[priority],
+                 callback_url, PENDING, job.created_at)
+            )
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        with self._wakeup:
+            self._wakeup.notify()
+        return job
+
+    def _join(self, connection: sqlite3.Connection, job: Job, priority: str,
+              callback_url: Optional[str]) -> Job:
+        """Attach another caller to a deduplicated job (transaction held)"""
+        if callback_url and callback_url not in job.callback_urls:
+            job.callback_urls.append(callback_url)
+            connection.execute("UPDATE jobs SET callback_url = ? WHERE id = ?",
+                               ("\n".join(job.callback_urls), job.id))
+        # Only a pending job can still be claimed sooner
+        if job.status == PENDING and PRIORITIES[priority] < PRIORITIES[job.priority]:
+            job.priority = priority
+            connection.execute("UPDATE jobs SET priority = ?, rank = ? WHERE id = ?",
+                               (priority, PRIORITIES[priority], job.id))
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        # Polling also starts workers, so jobs left by a recycled process are picked up
+        self._ensure_workers()
+        row = self._db().execute(
+            f"SELECT {_COLUMNS} FROM jobs WHERE id = ? AND queue = ? AND (finished_at IS NULL OR finished_at >= ?)",
+            (job_id, self.name, time.time() - self.result_ttl)
+        ).fetchone()
+        return Job.from_row(row) if row is not None else None
+
+    def _prune(self, connection: sqlite3.Connection):
+        """Forget finished jobs whose results have outlived the TTL (transaction held)"""
+        connection.execute("DELETE FROM jobs WHERE queue = ? AND finished_at < ?",
+                           (self.name, time.time() - self.result_ttl))
+
+    def _claim(self) -> Optional[Job]:
+        """Take the next pending job, first requeueing or failing ones whose lease ran out"""
+        now = time.time()
+        # Cheap read first, so idle workers do not take the write lock every poll
+        ready = self._db().execute(
+            "SELECT 1 FROM jobs WHERE queue = ? AND (status = ? OR (status = ? AND lease_until < ?)) LIMIT 1",
+            (self.name, PENDING, RUNNING, now)
+        ).fetchone()
+        if ready is None:
+            return None
+        connection = self._transaction()
+        try:
+            connection.execute(
+                "UPDATE jobs SET status = CASE WHEN attempts >= ? THEN ? ELSE ? END, "
+                "error = CASE WHEN attempts >= ? THEN 'worker lost while running the job' END, "
+                "finished_at = CASE WHEN attempts >= ? THEN ? END, lease_until = NULL "
+                "WHERE queue = ? AND status = ? AND lease_until < ?",
+                (MAX_ATTEMPTS, FAILED, PENDING, MAX_ATTEMPTS, MAX_ATTEMPTS, now, self.name, RUNNING, now)
+            )
+            row = connection.execute(
+                f"SELECT {_COLUMNS} FROM jobs WHERE queue = ? AND status = ? ORDER BY rank, created_at LIMIT 1",
+                (self.name, PENDING)
+            ).fetchone()
+            if row is None:
+                connection.execute("COMMIT")
+                return None
+            job = Job.from_row(row)
+            job.status, job.started_at = RUNNING, now
+            connection.execute(
+                "UPDATE jobs SET status = ?, started_at = ?, lease_until = ?, attempts = attempts + 1 WHERE id = ?",
+                (RUNNING, now, now + self.lease, job.id)
+            )
+            connection.execute("COMMIT")
+            return job
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+
+    def _work(self):
+        while True:
+            try:
+                job = self._claim()
+            except sqlite3.Error as e:
+                logger.warning("Could not claim a %s job: %s", self.name, e)
+                job = None
+            if job is None:
+                with self._wakeup:
+                    self._wakeup.wait(POLL_INTERVAL)
+                continue
+            self._run(job)
+
+    def _run(self, job: Job):
+        try:
+            # Log records from the job carry its id in place of a request id
+            with request_id_scope(job.id):
+                result = self.handler(job.payload)
+            status, error = SUCCEEDED, None
+        except Exception as e:
+            logger.exception("Error in %s job %s", self.name, job.id)
+            result, status, error = None, FAILED, str(e)
+
+        job.result, job.error, job.status, job.finished_at = result, error, status, time.time()
+        try:
+            connection = self._db()
+            connection.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ?, lease_until = NULL "
+                "WHERE id = ? AND status = ?",
+                (status, json.dumps(result, default=str) if result is not None else None, error,
+                 job.finished_at, job.id, RUNNING)
+            )
+            # Callers that joined while the job ran are read back once it can no longer be joined
+            row = connection.execute("SELECT callback_url FROM jobs WHERE id = ?", (job.id,)).fetchone()
+            if row is not None:
+                job.callback_urls = split_callbacks(row[0])
+        except sqlite3.Error as e:
+            logger.error("Could not store the result of %s job %s: %s", self.name, job.id, e)
+        if status == SUCCEEDED:
+            self._completed += 1
+        else:
+            self._failed += 1
+
+        for callback_url in job.callback_urls:
+            self._notify(job, callback_url)
+
+    def _notify(self, job: Job, callback_url: str):
+        """Best-effort webhook; clients can still poll if it fails"""
+        # Checked again at send time: the host's addresses may have changed since submit
+        error = callback_url_error(callback_url, self.callback_hosts)
+        if error:
+            logger.warning("Webhook for %s job %s skipped: %s", self.name, job.id, error)
+            return
+        try:
+            requests.post(callback_url, json=job.to_dict(), timeout=WEBHOOK_TIMEOUT, allow_redirects=False)
+        except requests.exceptions.RequestException as e:
+            logger.warning("Webhook for %s job %s failed: %s", self.name, job.id, e)
+
+    def stats(self) -> Dict[str, Any]:
+        counts = {PENDING: 0, RUNNING: 0, SUCCEEDED: 0, FAILED: 0}
+        rows = self._db().execute(
+            "SELECT status, COUNT(*) FROM jobs WHERE queue = ? AND (finished_at IS NULL OR finished_at >= ?) "
+            "GROUP BY status",
+            (self.name, time.time() - self.result_ttl)
+        )
+        for status, count in rows:
+            counts[status] = count
+        return {
+            "workers": len(self._threads) if self._threads_pid == os.getpid() else 0,
+            "max_pending": self.max_pending,
+            "jobs": counts,
+            "completed": self._completed,
+            "failed": self._failed,
+            "deduplicated": self._deduplicated
+        }
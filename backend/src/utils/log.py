@@ -0,0 +1,238 @@
+"""
+Structured, non-blocking logging
+Records are put on a bounded in-memory queue and written by a background
+thread, so a request never waits on stdout. Each message type (logger plus
+message template) is rate limited: beyond LOG_RATE_BURST records per second
+only one in LOG_SAMPLE_EVERY is kept, and the next record written for that
+type reports how many were suppressed. When the queue is full records are
+dropped and counted, so an error storm upstream costs a bounded amount of
+work per request
+
+Output is one JSON object per line with the request id (taken from
+X-Request-Id or generated, and echoed back) unless LOG_FORMAT=text. Levels
+come from LOG_LEVEL and per-logger LOG_LEVELS, e.g. 'qloo_api=WARNING'
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import re
+import sys
+import threading
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+from flask import g, request
+
+REQUEST_ID_HEADER = "X-Request-Id"
+VALID_REQUEST_ID = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+
+# Attributes every LogRecord has; anything else was passed with extra= and is logged as a field
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "request_id", "suppressed"}
+
+_request_id: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+_listener: Optional[logging.handlers.QueueListener] = None
+_handler: Optional["NonBlockingQueueHandler"] = None
+_configure_lock = threading.Lock()
+
+
+def current_request_id() -> Optional[str]:
+    return _request_id.get()
+
+
+@contextmanager
+def request_id_scope(request_id: str):
+    """Tag records logged inside the block (e.g. a background job) with an id"""
+    token = _request_id.set(request_id)
+    try:
+        yield
+    finally:
+        _request_id.reset(token)
+
+
+class RateLimitFilter(logging.Filter):
+    """Per-message-type rate limit with sampling past the limit"""
+
+    def __init__(self, burst: int = 20, sample_every: int = 100, max_types: int = 1000):
+        super().__init__()
+        self.burst = burst
+        self.sample_every = sample_every
+        self.max_types = max_types
+        self._types: "OrderedDict[tuple, list]" = OrderedDict()  # key -> [window, count, suppressed]
+        self._lock = threading.Lock()
+        self.suppressed = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.CRITICAL:
+            return True
+        key = (record.name, record.msg if isinstance(record.msg, str) else type(record.msg).__name__)
+        window = int(record.created)
+        with self._lock:
+            state = self._types.pop(key, None) or [window, 0, 0]
+            self._types[key] = state
+            while len(self._types) > self.max_types:
+                self._types.popitem(last=False)
+            if state[0] != window:
+                state[0], state[1] = window, 0
+            state[1] += 1
+            if state[1] > self.burst and (state[1] - self.burst) % self.sample_every:
+                state[2] += 1
+                self.suppressed += 1
+                return False
+            if state[2]:
+                record.suppressed = state[2]
+                state[2] = 0
+        return True
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops records instead of blocking when the queue is full"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Only resolve what can change later; message and traceback formatting
+        # happen on the listener thread
+        record.request_id = _request_id.get()
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage()
+        }
+        request_id = getattr(record, "request_id", None)
+        if request_id:
+            entry["request_id"] = request_id
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS:
+                entry[key] = value
+        if getattr(record, "suppressed", 0):
+            entry["suppressed"] = record.suppressed
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class TextFormatter(logging.Formatter):
+    """Readable single-line output for development"""
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        if not hasattr(record, "request_id"):
+            record.request_id = "-"
+        line = super().format(record)
+        if getattr(record, "suppressed", 0):
+            line += f" (+{record.suppressed} suppressed)"
+        return line
+
+
+def _configured_levels() -> Dict[str, str]:
+    levels = {}
+    for item in os.getenv("LOG_LEVELS", "").split(","):
+        if "=" in item:
+            name, level = item.split("=", 1)
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def configure_logging():
+    """Route all logging through the background queue (idempotent, once per process)"""
+    global _listener, _handler
+    with _configure_lock:
+        if _listener is not None:
+            return
+        output = logging.StreamHandler(sys.stdout)
+        output.setFormatter(TextFormatter() if os.getenv("LOG_FORMAT", "json") == "text" else JsonFormatter())
+
+        _handler = NonBlockingQueueHandler(queue.Queue(maxsize=int(os.getenv("LOG_QUEUE_SIZE", "10000"))))
+        _handler.addFilter(RateLimitFilter(
+            burst=int(os.getenv("LOG_RATE_BURST", "20")),
+            sample_every=max(1, int(os.getenv("LOG_SAMPLE_EVERY", "100")))
+        ))
+
+        root = logging.getLogger()
+        root.handlers = [_handler]
+        root.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+        for name, level in _configured_levels().items():
+            logging.getLogger(name).setLevel(level)
+
+        _listener = logging.handlers.QueueListener(_handler.queue, output, respect_handler_level=True)
+        _listener.start()
+        # Flush what is still queued when the process exits
+        atexit.register(_listener.stop)
+
+
+def _restart_after_fork():
+    """Forked workers (e.g. gunicorn --preload) need their own queue and writer thread"""
+    global _listener
+    if _listener is None:
+        return
+    atexit.unregister(_listener.stop)
+    # Locks and the queue may have been in use by another thread at fork time
+    _handler.filters[0]._lock = threading.Lock()
+    _handler.queue = queue.Queue(maxsize=_handler.queue.maxsize)
+    _listener = logging.handlers.QueueListener(_handler.queue, *_listener.handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+
+os.register_at_fork(after_in_child=_restart_after_fork)
+
+
+def logging_stats() -> Dict[str, int]:
+    if _handler is None:
+        return {}
+    rate_limit = _handler.filters[0]
+    return {
+        "queued": _handler.queue.qsize(),
+        "dropped": _handler.dropped,
+        "suppressed": rate_limit.suppressed
+    }
+
+
+def init_logging(app):
+    """Configure logging and give every request an id that is logged and echoed back"""
+    configure_logging()
+
+    @app.before_request
+    def _start_request_id():
+        incoming = request.headers.get(REQUEST_ID_HEADER, "")
+        request_id = incoming if VALID_REQUEST_ID.match(incoming) else uuid.uuid4().hex[:16]
+        g._request_id_token = _request_id.set(request_id)
+
+    @app.after_request
+    def _echo_request_id(response):
+        request_id = _request_id.get()
+        if request_id:
+            response.headers[REQUEST_ID_HEADER] = request_id
+        return response
+
+    @app.teardown_request
+    def _end_request_id(exc=None):
+        token = g.pop("_request_id_token", None)
+        if token is not None:
+            _request_id.reset(token)
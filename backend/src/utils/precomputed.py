@@ -0,0 +1,155 @@
+"""
+Precomputed recommendations and taste profiles
+Written by the offline batch job (python -m src.batch) to a SQLite file that
+doubles as its checkpoint, and read by the API with primary-key lookups
+
+Enable serving with PRECOMPUTED_DB; rows older than PRECOMPUTED_MAX_AGE
+seconds are ignored so a missed nightly run falls back to live results
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from qloo_api import canonicalize_query
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS recommendations (
+    seed_key TEXT PRIMARY KEY,
+    seed TEXT NOT NULL,
+    result_limit INTEGER NOT NULL,
+    payload TEXT NOT NULL,
+    computed_at REAL NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS profiles (
+    user_id TEXT PRIMARY KEY,
+    payload TEXT NOT NULL,
+    computed_at REAL NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS failures (
+    kind TEXT NOT NULL,
+    key TEXT NOT NULL,
+    error TEXT NOT NULL,
+    failed_at REAL NOT NULL,
+    PRIMARY KEY (kind, key)
+) WITHOUT ROWID;
+"""
+
+
+def seed_key(seed: str) -> str:
+    """Lookup key of a seed entity, shared by the batch job and the API"""
+    return canonicalize_query(seed)
+
+
+def dumps(payload: Any) -> str:
+    return json.dumps(payload, separators=(",", ":"))
+
+
+def open_output(path: str) -> sqlite3.Connection:
+    """Open (creating if needed) a batch output file for writing"""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    connection = sqlite3.connect(path)
+    # WAL lets API workers keep reading while the batch job writes
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    connection.executescript(SCHEMA)
+    version = connection.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+    if version is None:
+        connection.execute("INSERT INTO meta (key, value) VALUES ('version', ?)", (str(SCHEMA_VERSION),))
+        connection.commit()
+    elif int(version[0]) != SCHEMA_VERSION:
+        raise ValueError(f"{path} has schema version {version[0]}, expected {SCHEMA_VERSION}")
+    return connection
+
+
+class PrecomputedStore:
+    """Read-only lookups in a batch output file, one connection per thread"""
+
+    def __init__(self, path: str, max_age: Optional[float] = None, recheck_interval: float = 30.0):
+        self.path = path
+        self.max_age = max_age
+        self.recheck_interval = recheck_interval
+        self._local = threading.local()
+        self.hits = 0
+        self.misses = 0
+
+    def _connection(self) -> Optional[sqlite3.Connection]:
+        """Thread's connection, reopened when the file was replaced (e.g. by a fresh nightly run)"""
+        local = self._local
+        now = time.monotonic()
+        if getattr(local, "connection", None) is not None and now - local.checked_at < self.recheck_interval:
+            return local.connection
+        local.checked_at = now
+        try:
+            inode = os.stat(self.path).st_ino
+        except OSError:
+            local.connection = None
+            return None
+        if getattr(local, "connection", None) is None or local.inode != inode:
+            if getattr(local, "connection", None) is not None:
+                local.connection.close()
+            local.connection = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+            local.inode = inode
+        return local.connection
+
+    def _lookup(self, query: str, key: str) -> Optional[tuple]:
+        try:
+            connection = self._connection()
+            row = connection.execute(query, (key,)).fetchone() if connection is not None else None
+        except sqlite3.Error as e:
+            logger.warning("Precomputed lookup failed: %s", e)
+            row = None
+        if row is not None and self.max_age is not None and time.time() - row[-1] > self.max_age:
+            row = None
+        return row
+
+    def _count(self, found: bool):
+        if found:
+            self.hits += 1
+        else:
+            self.misses += 1
+
+    def recommendations(self, seed: str, limit: int, depth: Optional[int] = None) -> Optional[Tuple[list, float]]:
+        """Precomputed recommendations for a seed if at least `limit` were stored
+
+        Up to `depth` (default `limit`) of the stored candidates are returned,
+        best first, for callers that filter some out before taking `limit`
+        """
+        row = self._lookup(
+            "SELECT result_limit, payload, computed_at FROM recommendations WHERE seed_key = ?",
+            seed_key(seed)
+        )
+        found = row is not None and row[0] >= limit
+        self._count(found)
+        return (json.loads(row[1])[:depth or limit], row[2]) if found else None
+
+    def profile(self, user_id) -> Optional[Tuple[Dict, float]]:
+        row = self._lookup("SELECT payload, computed_at FROM profiles WHERE user_id = ?", str(user_id))
+        self._count(row is not None)
+        return (json.loads(row[0]), row[1]) if row is not None else None
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "path": self.path,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0
+        }
+
+
+def store_from_env() -> Optional[PrecomputedStore]:
+    path = os.getenv("PRECOMPUTED_DB")
+    if not path:
+        return None
+    max_age = float(os.getenv("PRECOMPUTED_MAX_AGE", "172800"))
+    return PrecomputedStore(path, max_age=max_age if max_age > 0 else None)
@@ -0,0 +1,132 @@
+"""
+Speculative prefetch of likely follow-up queries
+After a response, the entities a user is likely to open next are warmed in
+the background so the follow-up request is answered from the cache.
+Prefetches run on one low-priority worker thread, are deduplicated against
+the cache and each other, and are capped by a token-bucket rate budget.
+A prefetch counts as a hit when a follow-up claims it before claim_ttl,
+and as waste when it expires unclaimed
+"""
+
+import logging
+import queue
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable
+
+from qloo_api import request_priority
+
+logger = logging.getLogger(__name__)
+
+
+class Prefetcher:
+    """Background warmer for follow-up queries keyed by a seed (e.g. an entity name)"""
+
+    def __init__(self, warm: Callable[[str], object], is_warm: Callable[[str], bool],
+                 rate_per_minute: float = 30.0, max_pending: int = 50,
+                 claim_ttl: float = 600.0, max_tracked: int = 5000):
+        self.warm = warm
+        self.is_warm = is_warm
+        self.rate_per_minute = rate_per_minute
+        self.claim_ttl = claim_ttl
+        self.max_tracked = max_tracked
+        self._queue: "queue.Queue[str]" = queue.Queue(maxsize=max_pending)
+        self._pending = set()
+        self._warmed: "OrderedDict[str, float]" = OrderedDict()  # seed -> warmed at
+        self._tokens = rate_per_minute
+        self._refilled_at = time.monotonic()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stats = {"submitted": 0, "skipped_cached": 0, "dropped": 0,
+                       "warmed": 0, "failed": 0, "hits": 0, "wasted": 0}
+
+    @staticmethod
+    def _normalize(seed: str) -> str:
+        return " ".join(seed.lower().split())
+
+    def _take_token(self) -> bool:
+        now = time.monotonic()
+        self._tokens = min(self.rate_per_minute,
+                           self._tokens + (now - self._refilled_at) * self.rate_per_minute / 60)
+        self._refilled_at = now
+        if self._tokens < 1:
+            return False
+        self._tokens -= 1
+        return True
+
+    def submit(self, seeds: Iterable[str]):
+        """Queue warmups for seeds that are not already cached, queued or warmed"""
+        for seed in seeds:
+            key = self._normalize(seed)
+            if not key:
+                continue
+            with self._lock:
+                self._expire()
+                if key in self._pending or key in self._warmed:
+                    continue
+                if self.is_warm(seed):
+                    self._stats["skipped_cached"] += 1
+                    continue
+                if not self._take_token():
+                    self._stats["dropped"] += 1
+                    continue
+                try:
+                    self._queue.put_nowait(seed)
+                except queue.Full:
+                    self._stats["dropped"] += 1
+                    continue
+                self._pending.add(key)
+                self._stats["submitted"] += 1
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._work, name="prefetch", daemon=True)
+                    self._thread.start()
+
+    def claim(self, seed: str) -> bool:
+        """Record that a follow-up request used a prefetched seed"""
+        key = self._normalize(seed)
+        with self._lock:
+            self._expire()
+            if self._warmed.pop(key, None) is None:
+                return False
+            self._stats["hits"] += 1
+            return True
+
+    def _expire(self):
+        """Count warmed seeds that were never claimed as waste (lock held)"""
+        cutoff = time.monotonic() - self.claim_ttl
+        while self._warmed:
+            key, warmed_at = next(iter(self._warmed.items()))
+            if warmed_at >= cutoff and len(self._warmed) <= self.max_tracked:
+                break
+            self._warmed.popitem(last=False)
+            self._stats["wasted"] += 1
+
+    def _work(self):
+        while True:
+            seed = self._queue.get()
+            key = self._normalize(seed)
+            try:
+                with request_priority("background"):
+                    self.warm(seed)
+                with self._lock:
+                    self._warmed[key] = time.monotonic()
+                    self._stats["warmed"] += 1
+            except Exception as e:
+                logger.warning("Prefetch of %r failed: %s", seed, e)
+                with self._lock:
+                    self._stats["failed"] += 1
+            finally:
+                with self._lock:
+                    self._pending.discard(key)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            self._expire()
+            resolved = self._stats["hits"] + self._stats["wasted"]
+            return {
+                **self._stats,
+                "queued": self._queue.qsize(),
+                "outstanding": len(self._warmed),
+                "hit_rate": round(self._stats["hits"] / resolved, 3) if resolved else 0.0
+            }
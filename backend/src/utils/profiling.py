@@ -0,0 +1,175 @@
+"""
+On-demand profiling for live workers
+A low-overhead sampling profiler that can run for N seconds inside a
+worker, plus cProfile for single flagged requests
+"""
+
+import cProfile
+import hmac
+import io
+import logging
+import os
+import pstats
+import signal
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Optional
+
+from flask import Response, g, request
+
+logger = logging.getLogger(__name__)
+
+MAX_SAMPLE_SECONDS = 300
+
+
+def admin_authorized() -> bool:
+    """Check the request's X-Admin-Token against ADMIN_TOKEN (disabled when unset)"""
+    expected = os.getenv("ADMIN_TOKEN")
+    if not expected:
+        return False
+    provided = request.headers.get("X-Admin-Token", "")
+    return hmac.compare_digest(provided.encode(), expected.encode())
+
+
+class SamplingProfiler:
+    """Periodically samples every thread's stack and counts collapsed stacks"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.started_at: Optional[str] = None
+        self.duration = 0.0
+        self.interval = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, seconds: float, interval: float = 0.01, on_complete=None) -> bool:
+        """Start sampling in a background thread; returns False if already running"""
+        with self._lock:
+            if self.running:
+                return False
+            self.stacks = Counter()
+            self.samples = 0
+            self.started_at = datetime.now().isoformat()
+            self.duration = min(float(seconds), MAX_SAMPLE_SECONDS)
+            self.interval = max(float(interval), 0.001)
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._run, args=(on_complete,), name="sampling-profiler", daemon=True
+            )
+            self._thread.start()
+            return True
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self, on_complete):
+        own_id = threading.get_ident()
+        deadline = time.monotonic() + self.duration
+        while not self._stop.is_set() and time.monotonic() < deadline:
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id != own_id:
+                    self.stacks[_collapse(frame)] += 1
+            self.samples += 1
+            self._stop.wait(self.interval)
+        if on_complete:
+            on_complete(self)
+
+    def collapsed(self) -> str:
+        """Render samples in collapsed-stack format for flamegraph tools"""
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common())
+
+    def status(self) -> Dict:
+        return {
+            "running": self.running,
+            "started_at": self.started_at,
+            "duration_seconds": self.duration,
+            "interval_ms": round(self.interval * 1000, 2),
+            "samples": self.samples,
+            "unique_stacks": len(self.stacks)
+        }
+
+
+def _collapse(frame) -> str:
+    """Turn a frame into a root-first 'file:function' stack string"""
+    parts = []
+    while frame is not None:
+        code = frame.f_code
+        parts.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+        frame = frame.f_back
+    return ";".join(reversed(parts))
+
+
+profiler = SamplingProfiler()
+
+
+def _write_collapsed(sampler: SamplingProfiler):
+    output_dir = os.getenv("PROFILER_OUTPUT_DIR", "/tmp")
+    path = os.path.join(output_dir, f"profile-{os.getpid()}-{int(time.time())}.collapsed")
+    try:
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(sampler.collapsed())
+        logger.info("Profile written to %s", path)
+    except OSError as e:
+        logger.warning("Failed to write profile: %s", e)
+
+
+def _install_signal_handler():
+    """Start a sampling run when the configured signal (e.g. SIGUSR2) is received"""
+    signal_name = os.getenv("PROFILER_SIGNAL")
+    if not signal_name:
+        return
+    signum = getattr(signal, signal_name, None)
+    if signum is None:
+        logger.warning("Unknown profiler signal: %s", signal_name)
+        return
+
+    seconds = float(os.getenv("PROFILER_SIGNAL_SECONDS", "30"))
+
+    def _handle(signum, frame):
+        profiler.start(seconds, on_complete=_write_collapsed)
+
+    try:
+        signal.signal(signum, _handle)
+    except ValueError:
+        # Signal handlers can only be installed from the main thread
+        logger.warning("Profiler signal handler not installed (not in main thread)")
+
+
+def init_profiling(app):
+    """Install the profiler signal handler and per-request cProfile hooks"""
+    _install_signal_handler()
+
+    @app.before_request
+    def _start_request_profile():
+        flagged = request.headers.get("X-Profile") or request.args.get("profile")
+        if flagged and admin_authorized():
+            g._request_profiler = cProfile.Profile()
+            g._request_profiler.enable()
+
+    @app.after_request
+    def _finish_request_profile(response):
+        request_profiler = g.pop("_request_profiler", None)
+        if request_profiler is None:
+            return response
+
+        request_profiler.disable()
+        output = io.StringIO()
+        sort_key = request.args.get("profile_sort", "cumulative")
+        try:
+            stats = pstats.Stats(request_profiler, stream=output).sort_stats(sort_key)
+        except KeyError:
+            stats = pstats.Stats(request_profiler, stream=output).sort_stats("cumulative")
+        stats.print_stats(int(request.args.get("profile_limit", 50)))
+
+        profiled = Response(output.getvalue(), mimetype="text/plain")
+        profiled.headers["X-Profiled-Status"] = str(response.status_code)
+        return profiled
@@ -0,0 +1,117 @@
+"""
+Response encoding pipeline for API responses
+Fast JSON serialization, optional MessagePack via content negotiation,
+sparse fieldsets (?fields=name,popularity) for entity lists, and gzip/brotli
+compression of larger bodies
+"""
+
+import gzip
+import json
+import os
+from typing import Any, Optional, Set
+
+from flask import request
+from flask.json.provider import DefaultJSONProvider
+
+from src.utils.static_assets import preferred_encoding
+
+try:
+    import orjson
+except ImportError:  # Optional: falls back to the stdlib encoder
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # Optional: MessagePack is only offered when installed
+    msgpack = None
+
+try:
+    import brotli
+except ImportError:  # Optional: gzip is used instead
+    brotli = None
+
+MSGPACK_MIMETYPE = "application/x-msgpack"
+ENCODABLE_MIMETYPES = ("application/json", MSGPACK_MIMETYPE)
+
+# Keys that mark a dict as an entity record eligible for field projection
+ENTITY_KEYS = ("category", "types", "popularity")
+
+
+def project_fields(obj: Any, fields: Set[str]) -> Any:
+    """Keep only the requested keys (plus "name") in every entity record"""
+    if isinstance(obj, list):
+        return [project_fields(item, fields) for item in obj]
+    if isinstance(obj, dict):
+        if "name" in obj and any(key in obj for key in ENTITY_KEYS):
+            return {key: value for key, value in obj.items() if key == "name" or key in fields}
+        return {key: project_fields(value, fields) for key, value in obj.items()}
+    return obj
+
+
+def requested_fields() -> Optional[Set[str]]:
+    raw = request.args.get("fields", "")
+    fields = {field.strip() for field in raw.split(",") if field.strip()}
+    return fields or None
+
+
+def wants_msgpack() -> bool:
+    if msgpack is None:
+        return False
+    best = request.accept_mimetypes.best_match(["application/json", MSGPACK_MIMETYPE])
+    return best == MSGPACK_MIMETYPE
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """JSON provider using orjson when available, with projection and MessagePack support"""
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        if orjson is not None and not kwargs.get("indent"):
+            return orjson.dumps(obj, default=self.default, option=orjson.OPT_NON_STR_KEYS).decode()
+        kwargs.setdefault("default", self.default)
+        kwargs.setdefault("ensure_ascii", self.ensure_ascii)
+        return json.dumps(obj, **kwargs)
+
+    def response(self, *args: Any, **kwargs: Any):
+        obj = self._prepare_response_obj(args, kwargs)
+        if request:
+            fields = requested_fields()
+            if fields:
+                obj = project_fields(obj, fields)
+            if wants_msgpack():
+                body = msgpack.packb(obj, default=self.default, use_bin_type=True)
+                return self._app.response_class(body, mimetype=MSGPACK_MIMETYPE)
+
+        indent = 2 if (self.compact is None and self._app.debug) or self.compact is False else None
+        return self._app.response_class(f"{self.dumps(obj, indent=indent)}\n", mimetype=self.mimetype)
+
+
+def compress_body(data: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(data, quality=4)
+    return gzip.compress(data, compresslevel=6)
+
+
+def init_response_encoding(app):
+    """Install the fast JSON provider and compress API responses above a threshold"""
+    app.json = FastJSONProvider(app)
+    threshold = int(os.getenv("RESPONSE_COMPRESS_MIN_BYTES", "1024"))
+    available = {"gzip"} | ({"br"} if brotli is not None else set())
+
+    @app.after_request
+    def _compress_response(response):
+        if (response.direct_passthrough or response.is_streamed
+                or response.status_code < 200 or response.status_code in (204, 304)
+                or "Content-Encoding" in response.headers
+                or response.mimetype not in ENCODABLE_MIMETYPES):
+            return response
+
+        response.vary.add("Accept-Encoding")
+        if (response.content_length or 0) < threshold:
+            return response
+        encoding = preferred_encoding(request.headers.get("Accept-Encoding", ""), available)
+        if encoding is None:
+            return response
+
+        response.set_data(compress_body(response.get_data(), encoding))
+        response.headers["Content-Encoding"] = encoding
+        return response
@@ -0,0 +1,228 @@
+"""
+Static asset serving for the frontend build
+Builds an in-memory manifest of the static folder once at startup and serves
+pre-compressed variants, long-lived cache headers for fingerprinted files,
+and sendfile for large files, without touching the filesystem per request
+
+Pre-compress a build (writes .gz, and .br when brotli is installed):
+    python -m src.utils.static_assets src/static
+"""
+
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import sys
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Set
+
+from flask import Response, request, send_file
+
+try:
+    import brotli
+except ImportError:  # Optional: gzip variants are still served
+    brotli = None
+
+# Build manifest listing the fingerprinted output files (build.manifest in vite.config.js)
+VITE_MANIFESTS = (".vite/manifest.json", "manifest.json")
+# Without a manifest: Vite's default output name, assets/<name>-<8 hash chars>.<ext>
+HASHED_NAME = re.compile(r"^assets/(?:[^/]+/)*[^/]+-[A-Za-z0-9_-]{8}\.[A-Za-z0-9]+$")
+COMPRESSIBLE_TYPES = ("text/", "application/javascript", "application/json", "application/xml",
+                      "image/svg+xml", "application/wasm", "application/manifest+json")
+VARIANT_SUFFIXES = {".br": "br", ".gz": "gzip"}
+
+MEMORY_LIMIT = 256 * 1024  # Files up to this size are kept in memory
+MIN_COMPRESS_SIZE = 1024
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE = "no-cache"
+
+
+@dataclass
+class StaticAsset:
+    """One servable file and its pre-compressed variants"""
+    path: str
+    mimetype: str
+    size: int
+    etag: str
+    immutable: bool
+    data: Optional[bytes] = None
+    variants: Dict[str, str] = field(default_factory=dict)  # encoding -> file path
+    variant_data: Dict[str, bytes] = field(default_factory=dict)  # encoding -> bytes
+
+
+def _is_compressible(mimetype: str) -> bool:
+    return mimetype.startswith(COMPRESSIBLE_TYPES)
+
+
+class StaticManifest:
+    """In-memory index of a static folder, built once"""
+
+    def __init__(self, root: str):
+        self.root = root
+        self.assets: Dict[str, StaticAsset] = {}
+        self.build()
+
+    def _fingerprinted(self) -> Optional[Set[str]]:
+        """Output files named in the Vite build manifest, or None when there is none"""
+        for name in VITE_MANIFESTS:
+            path = os.path.join(self.root, name)
+            if not os.path.isfile(path):
+                continue
+            try:
+                with open(path, encoding="utf-8") as f:
+                    chunks = json.load(f)
+                files = set()
+                for chunk in chunks.values():
+                    files.add(chunk["file"])
+                    files.update(chunk.get("css", []))
+                    files.update(chunk.get("assets", []))
+                return files
+            except (OSError, ValueError, KeyError, TypeError, AttributeError):
+                continue
+        return None
+
+    def build(self):
+        fingerprinted = self._fingerprinted()
+        assets = {}
+        for dirpath, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                full_path = os.path.join(dirpath, filename)
+                if os.path.splitext(filename)[1] in VARIANT_SUFFIXES and os.path.exists(full_path[:-3]):
+                    continue  # Pre-compressed variant of another file
+                relative = os.path.relpath(full_path, self.root).replace(os.sep, "/")
+                if fingerprinted is not None:
+                    immutable = relative in fingerprinted
+                else:
+                    immutable = bool(HASHED_NAME.match(relative))
+                assets[relative] = self._load(full_path, filename, immutable)
+        self.assets = assets
+
+    def _load(self, full_path: str, filename: str, immutable: bool) -> StaticAsset:
+        mimetype = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+        size = os.path.getsize(full_path)
+        asset = StaticAsset(
+            path=full_path,
+            mimetype=mimetype,
+            size=size,
+            etag="",
+            immutable=immutable
+        )
+
+        for suffix, encoding in VARIANT_SUFFIXES.items():
+            if os.path.exists(full_path + suffix):
+                asset.variants[encoding] = full_path + suffix
+
+        if size <= MEMORY_LIMIT:
+            with open(full_path, "rb") as f:
+                asset.data = f.read()
+            asset.etag = hashlib.md5(asset.data).hexdigest()[:16]
+            for encoding, variant_path in asset.variants.items():
+                with open(variant_path, "rb") as f:
+                    asset.variant_data[encoding] = f.read()
+            # Compress small text files once here rather than on every request
+            if _is_compressible(mimetype) and size >= MIN_COMPRESS_SIZE:
+                if "gzip" not in asset.variant_data:
+                    asset.variant_data["gzip"] = gzip.compress(asset.data, compresslevel=9, mtime=0)
+                if brotli is not None and "br" not in asset.variant_data:
+                    asset.variant_data["br"] = brotli.compress(asset.data)
+        else:
+            stat = os.stat(full_path)
+            asset.etag = f"{int(stat.st_mtime):x}-{size:x}"
+        return asset
+
+    def get(self, path: str) -> Optional[StaticAsset]:
+        return self.assets.get(path)
+
+
+def parse_accept_encoding(accept_encoding: str) -> Dict[str, float]:
+    """Map each encoding in an Accept-Encoding header to its quality value"""
+    accepted = {}
+    for part in accept_encoding.split(","):
+        token, _, params = part.strip().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        if token.strip():
+            accepted[token.strip().lower()] = quality
+    return accepted
+
+
+def preferred_encoding(accept_encoding: str, available) -> Optional[str]:
+    """Pick br over gzip among the available encodings the client accepts"""
+    if not available or not accept_encoding:
+        return None
+    accepted = parse_accept_encoding(accept_encoding)
+    for encoding in ("br", "gzip"):
+        if encoding in available and accepted.get(encoding, accepted.get("*", 0)) > 0:
+            return encoding
+    return None
+
+
+def choose_encoding(asset: StaticAsset, accept_encoding: str) -> Optional[str]:
+    """Pick the best available variant of an asset the client accepts"""
+    return preferred_encoding(accept_encoding, set(asset.variant_data) | set(asset.variants))
+
+
+def serve_asset(asset: StaticAsset) -> Response:
+    """Build the response for an asset, honouring Accept-Encoding and If-None-Match"""
+    encoding = choose_encoding(asset, request.headers.get("Accept-Encoding", ""))
+    etag = f"{asset.etag}-{encoding}" if encoding else asset.etag
+
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    elif encoding and encoding in asset.variant_data:
+        response = Response(asset.variant_data[encoding], mimetype=asset.mimetype)
+    elif encoding:
+        response = send_file(asset.variants[encoding], mimetype=asset.mimetype, conditional=False, etag=False)
+    elif asset.data is not None:
+        response = Response(asset.data, mimetype=asset.mimetype)
+    else:
+        # Large file: let the server use sendfile via wsgi.file_wrapper
+        response = send_file(asset.path, mimetype=asset.mimetype, conditional=False, etag=False)
+
+    if encoding:
+        response.headers["Content-Encoding"] = encoding
+    if asset.variant_data or asset.variants:
+        response.headers["Vary"] = "Accept-Encoding"
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = IMMUTABLE_CACHE if asset.immutable else REVALIDATE_CACHE
+    return response
+
+
+def init_static_assets(app):
+    """Build the static manifest for the app's static folder"""
+    if app.static_folder and os.path.isdir(app.static_folder):
+        app.extensions["static_manifest"] = StaticManifest(app.static_folder)
+
+
+def precompress(root: str):
+    """Write .gz (and .br) variants next to compressible files in a build folder"""
+    written = 0
+    for dirpath, _, filenames in os.walk(root):
+        for filename in filenames:
+            if os.path.splitext(filename)[1] in VARIANT_SUFFIXES:
+                continue
+            full_path = os.path.join(dirpath, filename)
+            mimetype = mimetypes.guess_type(filename)[0] or ""
+            if not _is_compressible(mimetype) or os.path.getsize(full_path) < MIN_COMPRESS_SIZE:
+                continue
+            with open(full_path, "rb") as f:
+                data = f.read()
+            with open(full_path + ".gz", "wb") as f:
+                f.write(gzip.compress(data, compresslevel=9, mtime=0))
+            written += 1
+            if brotli is not None:
+                with open(full_path + ".br", "wb") as f:
+                    f.write(brotli.compress(data))
+                written += 1
+    return written
+
+
+if __name__ == "__main__":
+    target = sys.argv[1] if len(sys.argv) > 1 else os.path.join(os.path.dirname(os.path.dirname(__file__)), "static")
+    print(f"Wrote {precompress(target)} compressed variants in {target}")
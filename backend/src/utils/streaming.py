@@ -0,0 +1,68 @@
+"""
+Newline-delimited JSON (NDJSON) streaming responses
+Independent parts of a response (e.g. one per interest or domain) are
+computed concurrently and each is sent as one JSON line as soon as it is
+ready, so time to first content is set by the fastest part
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextvars import copy_context
+from typing import Any, Callable, Iterable, Iterator, Optional, Tuple
+
+from flask import current_app, request, stream_with_context
+
+from src.utils.responses import project_fields, requested_fields
+
+NDJSON_MIMETYPE = "application/x-ndjson"
+STREAM_MAX_WORKERS = int(os.getenv("STREAM_MAX_WORKERS", "4"))
+
+
+def wants_stream() -> bool:
+    """Whether the client asked for NDJSON (?stream=1 or Accept: application/x-ndjson)"""
+    if request.args.get("stream") in ("1", "true"):
+        return True
+    return request.accept_mimetypes.best == NDJSON_MIMETYPE
+
+
+def run_concurrently(keys: Iterable[Any], work: Callable[[Any], Any],
+                     max_workers: int = STREAM_MAX_WORKERS) -> Iterator[Tuple[Any, Any, Optional[Exception]]]:
+    """
+    Start work(key) for every key right away and yield (key, result, error) in
+    completion order. Each call runs in a copy of the caller's context, so the
+    request's deadline, trace and Qloo priority apply to it
+    """
+    keys = list(keys)
+    executor = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(keys))), thread_name_prefix="stream")
+    futures = {executor.submit(copy_context().run, work, key): key for key in keys}
+
+    def results():
+        try:
+            for future in as_completed(futures):
+                try:
+                    yield futures[future], future.result(), None
+                except Exception as e:
+                    yield futures[future], None, e
+        finally:
+            # Client went away or the stream ended: drop work that has not started
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    return results()
+
+
+def ndjson_response(records: Iterable[dict]):
+    """Stream records as one JSON document per line, applying ?fields= projection"""
+    fields = requested_fields()
+    dumps = current_app.json.dumps
+
+    def generate():
+        for record in records:
+            if fields:
+                record = project_fields(record, fields)
+            yield dumps(record) + "\n"
+
+    response = current_app.response_class(stream_with_context(generate()), mimetype=NDJSON_MIMETYPE)
+    response.headers["Cache-Control"] = "no-cache"
+    # Ask reverse proxies (nginx) not to buffer the stream
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
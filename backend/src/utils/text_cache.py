@@ -0,0 +1,167 @@
+"""
+Near-duplicate text cache
+Caches results keyed by normalized text and also answers lookups for texts
+that are almost the same (e.g. a resubmission after a small edit), using
+64-bit SimHash fingerprints indexed by LSH bands, with a TTL and an LRU bound
+"""
+
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+SIMHASH_BITS = 64
+BANDS = 8  # Fingerprints within BANDS - 1 bits always share at least one band
+BAND_BITS = SIMHASH_BITS // BANDS
+BAND_MASK = (1 << BAND_BITS) - 1
+
+# Word characters in any script (Chinese, Arabic, Cyrillic, ...), keeping inner apostrophes
+TOKEN = re.compile(r"\w+(?:'\w+)*")
+
+
+def normalize_text(text: str) -> str:
+    """Case fold and keep only word tokens, so spacing and punctuation edits don't matter"""
+    return " ".join(TOKEN.findall(text.casefold()))
+
+
+def _feature_hash(feature: str) -> int:
+    return int.from_bytes(hashlib.blake2b(feature.encode(), digest_size=8).digest(), "big")
+
+
+def simhash(tokens: List[str]) -> int:
+    """64-bit SimHash over words and word bigrams"""
+    features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+    weights = [0] * SIMHASH_BITS
+    for feature in features:
+        value = _feature_hash(feature)
+        for bit in range(SIMHASH_BITS):
+            weights[bit] += 1 if value >> bit & 1 else -1
+    fingerprint = 0
+    for bit, weight in enumerate(weights):
+        if weight > 0:
+            fingerprint |= 1 << bit
+    return fingerprint
+
+
+def _bands(fingerprint: int) -> List[Tuple[int, int]]:
+    return [(band, fingerprint >> (band * BAND_BITS) & BAND_MASK) for band in range(BANDS)]
+
+
+class NearDuplicateCache:
+    """Thread-safe TTL/LRU cache with exact and SimHash near-duplicate lookups"""
+
+    def __init__(self, max_entries: int = 5000, ttl: float = 3600.0,
+                 max_distance: int = 5, min_tokens: int = 8, min_chars: int = 3):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        # Beyond BANDS - 1 bits, band lookups could miss matches; keep the guarantee
+        self.max_distance = min(max_distance, BANDS - 1)
+        self.min_tokens = min_tokens  # Short texts only match exactly
+        # Texts that normalize to almost nothing (emoji only, "ok") are never cached,
+        # or unrelated inputs would share one entry
+        self.min_chars = min_chars
+        self._entries: "OrderedDict[str, Tuple[int, Any, float]]" = OrderedDict()
+        self._index: Dict[Tuple[int, int], Set[str]] = {}
+        self._lock = threading.Lock()
+        self._exact_hits = 0
+        self._near_hits = 0
+        self._misses = 0
+        self._skipped = 0
+
+    def cacheable(self, normalized: str) -> bool:
+        return len(normalized.replace(" ", "")) >= self.min_chars
+
+    def _key(self, normalized: str) -> str:
+        return hashlib.sha1(normalized.encode()).hexdigest()
+
+    def get(self, text: str) -> Optional[Any]:
+        normalized = normalize_text(text)
+        if not self.cacheable(normalized):
+            with self._lock:
+                self._skipped += 1
+            return None
+        key = self._key(normalized)
+        now = time.time()
+        with self._lock:
+            entry = self._live_entry(key, now)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self._exact_hits += 1
+                return entry[1]
+
+            tokens = normalized.split()
+            if len(tokens) >= self.min_tokens and self.max_distance > 0:
+                fingerprint = simhash(tokens)
+                match = self._nearest(fingerprint, now)
+                if match is not None:
+                    self._entries.move_to_end(match)
+                    self._near_hits += 1
+                    return self._entries[match][1]
+
+            self._misses += 1
+            return None
+
+    def _nearest(self, fingerprint: int, now: float) -> Optional[str]:
+        candidates = set()
+        for band in _bands(fingerprint):
+            candidates |= self._index.get(band, set())
+        best, best_distance = None, self.max_distance + 1
+        for key in candidates:
+            entry = self._live_entry(key, now)
+            if entry is None or entry[0] is None:
+                continue
+            distance = bin(entry[0] ^ fingerprint).count("1")
+            if distance < best_distance:
+                best, best_distance = key, distance
+        return best
+
+    def _live_entry(self, key: str, now: float):
+        entry = self._entries.get(key)
+        if entry is not None and now - entry[2] > self.ttl:
+            self._remove(key)
+            return None
+        return entry
+
+    def set(self, text: str, value: Any):
+        normalized = normalize_text(text)
+        if not self.cacheable(normalized):
+            return
+        key = self._key(normalized)
+        tokens = normalized.split()
+        fingerprint = simhash(tokens) if len(tokens) >= self.min_tokens else None
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (fingerprint, value, time.time())
+            if fingerprint is not None:
+                for band in _bands(fingerprint):
+                    self._index.setdefault(band, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, key: str):
+        fingerprint, _, _ = self._entries.pop(key)
+        if fingerprint is None:
+            return
+        for band in _bands(fingerprint):
+            keys = self._index.get(band)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._index[band]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            hits = self._exact_hits + self._near_hits
+            lookups = hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "exact_hits": self._exact_hits,
+                "near_hits": self._near_hits,
+                "misses": self._misses,
+                "skipped": self._skipped,
+                "hit_rate": round(hits / lookups, 3) if lookups else 0.0
+            }
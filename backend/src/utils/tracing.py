@@ -0,0 +1,133 @@
+"""
+Lightweight request-scoped tracing
+Collects timing spans for the current request and reports them as a
+Server-Timing header, optionally exporting slow requests to a JSONL file
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from flask import g, request
+
+logger = logging.getLogger(__name__)
+
+_current_trace: ContextVar[Optional["Trace"]] = ContextVar("current_trace", default=None)
+_export_lock = threading.Lock()
+
+
+class Trace:
+    """Spans recorded while handling one request"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.started_at = time.perf_counter()
+        self.spans: List[Dict] = []
+
+    def add(self, name: str, start: float, duration: float, error: bool = False):
+        self.spans.append({
+            "name": name,
+            "start_ms": round((start - self.started_at) * 1000, 2),
+            "duration_ms": round(duration * 1000, 2),
+            "error": error
+        })
+
+    def total_ms(self) -> float:
+        return (time.perf_counter() - self.started_at) * 1000
+
+    def summary(self) -> Dict[str, Dict]:
+        """Aggregate span durations and counts by name, keeping first-seen order"""
+        totals = {}
+        for span_data in self.spans:
+            entry = totals.setdefault(span_data["name"], {"duration_ms": 0.0, "count": 0})
+            entry["duration_ms"] += span_data["duration_ms"]
+            entry["count"] += 1
+        return totals
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+@contextmanager
+def span(name: str):
+    """Time a block of work; a no-op when no trace is active"""
+    trace = _current_trace.get()
+    if trace is None:
+        yield
+        return
+
+    start = time.perf_counter()
+    error = False
+    try:
+        yield
+    except Exception:
+        error = True
+        raise
+    finally:
+        trace.add(name, start, time.perf_counter() - start, error)
+
+
+def format_server_timing(trace: Trace) -> str:
+    """Render a trace as a Server-Timing header value"""
+    metrics = []
+    for name, entry in trace.summary().items():
+        metric = f"{name};dur={entry['duration_ms']:.1f}"
+        if entry["count"] > 1:
+            metric += f';desc="x{entry["count"]}"'
+        metrics.append(metric)
+    metrics.append(f"total;dur={trace.total_ms():.1f}")
+    return ", ".join(metrics)
+
+
+def export_trace(trace: Trace, path: str, status_code: int):
+    """Append a finished trace to a JSONL file"""
+    record = {
+        "timestamp": datetime.now().isoformat(),
+        "endpoint": trace.name,
+        "status": status_code,
+        "total_ms": round(trace.total_ms(), 2),
+        "spans": trace.spans
+    }
+    line = json.dumps(record) + "\n"
+    with _export_lock:
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(line)
+
+
+def init_tracing(app):
+    """Register request hooks that start traces and emit Server-Timing headers"""
+    export_path = os.getenv("TRACE_EXPORT_PATH")
+    slow_ms = float(os.getenv("TRACE_SLOW_MS", "1000"))
+
+    @app.before_request
+    def _start_trace():
+        g._trace_token = _current_trace.set(Trace(request.endpoint or request.path))
+
+    @app.after_request
+    def _finish_trace(response):
+        trace = _current_trace.get()
+        if trace is None:
+            return response
+
+        response.headers["Server-Timing"] = format_server_timing(trace)
+        response.headers["Timing-Allow-Origin"] = "*"
+
+        if export_path and trace.total_ms() >= slow_ms:
+            try:
+                export_trace(trace, export_path, response.status_code)
+            except OSError as e:
+                logger.warning("Failed to export trace: %s", e)
+        return response
+
+    @app.teardown_request
+    def _end_trace(exc=None):
+        token = g.pop("_trace_token", None)
+        if token is not None:
+            _current_trace.reset(token)
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# Tests run from backend/ (CI: python -m pytest tests/); imports match src/main.py
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
@@ -0,0 +1,108 @@
+import threading
+import time
+
+from src.utils.admission import AdmissionController, ClientRateLimiter, EndpointLimiter, _configured_limits
+
+
+def test_full_queue_is_rejected_without_waiting():
+    limiter = EndpointLimiter(limit=1, queue_size=1, max_wait=5.0)
+    assert limiter.acquire() == (True, "")
+
+    queued = threading.Thread(target=limiter.acquire)
+    queued.start()
+    while limiter.status()["waiting"] == 0:
+        time.sleep(0.001)
+
+    started = time.monotonic()
+    assert limiter.acquire() == (False, "queue full")
+    assert time.monotonic() - started < 0.05
+
+    limiter.release(0.1)
+    queued.join(1)
+    assert limiter.status()["active"] == 1
+    assert limiter.status()["rejected"] == 1
+
+
+def test_queued_request_times_out():
+    limiter = EndpointLimiter(limit=1, queue_size=4, max_wait=0.05)
+    limiter.acquire()
+    assert limiter.acquire() == (False, "queue wait exceeded")
+    assert limiter.acquire(timeout=0) == (False, "queue full")
+    status = limiter.status()
+    assert status["timed_out"] == 1
+    assert status["waiting"] == 0
+
+
+def test_waiters_are_admitted_in_arrival_order():
+    limiter = EndpointLimiter(limit=1, queue_size=3, max_wait=2.0)
+    limiter.acquire()
+    order = []
+
+    def wait(name):
+        limiter.acquire()
+        order.append(name)
+
+    threads = []
+    for name in "abc":
+        thread = threading.Thread(target=wait, args=(name,))
+        thread.start()
+        threads.append(thread)
+        while limiter.status()["waiting"] < len(threads):
+            time.sleep(0.001)
+    for _ in threads:
+        limiter.release(0.01)
+        time.sleep(0.02)
+    for thread in threads:
+        thread.join(1)
+    assert order == ["a", "b", "c"]
+
+
+def test_client_over_its_rate_gets_429():
+    controller = AdmissionController(limits={}, client_rate=1.0, client_burst=2)
+    for _ in range(2):
+        limiter, rejection = controller.admit("harmony.discover_music", client="10.0.0.1")
+        assert rejection is None
+        limiter.release(0.01)
+    limiter, rejection = controller.admit("harmony.discover_music", client="10.0.0.1")
+    assert limiter is None
+    assert rejection[0] == 429 and rejection[1] >= 1
+    # Other clients have their own bucket
+    assert controller.admit("harmony.discover_music", client="10.0.0.2")[1] is None
+
+
+def test_client_buckets_are_bounded():
+    limiter = ClientRateLimiter(rate=1.0, burst=1, max_clients=3)
+    for client in range(10):
+        limiter.allow(str(client))
+    assert limiter.status()["clients"] == 3
+
+
+def test_limit_overrides_from_env(monkeypatch):
+    monkeypatch.setenv("ADMISSION_LIMITS", "generate_story=2, harmony.get_trending=0, bogus=x")
+    limits = _configured_limits()
+    assert limits["harmony.generate_story"] == 2
+    assert limits["harmony.get_trending"] == 1
+    assert "harmony.bogus" not in limits
+
+
+def test_clients_behind_one_proxy_have_their_own_bucket(monkeypatch):
+    from flask import Flask
+
+    from src.routes import harmony
+    from src.utils.admission import init_proxy_fix
+
+    monkeypatch.setattr(harmony, "admission", AdmissionController(limits={}, client_rate=0.01, client_burst=1))
+    monkeypatch.setenv("PROXY_TRUSTED_HOPS", "1")
+    app = Flask(__name__)
+    app.register_blueprint(harmony.harmony_bp, url_prefix="/api")
+    init_proxy_fix(app)
+    client = app.test_client()
+
+    def post(forwarded_for):
+        return client.post("/api/mood-analysis", json={"text": ""}, headers={"X-Forwarded-For": forwarded_for},
+                           environ_base={"REMOTE_ADDR": "10.0.0.1"})
+
+    assert post("203.0.113.7").status_code == 400
+    assert post("203.0.113.7").status_code == 429
+    # Same proxy address, different client
+    assert post("198.51.100.4").status_code == 400
@@ -0,0 +1,84 @@
+import time
+
+from src import batch
+from src.utils.precomputed import open_output
+
+ITEMS = [("a", "A"), ("b", "B"), ("c", "C")]
+
+
+def add_row(connection, key, computed_at):
+    connection.execute(
+        "INSERT OR REPLACE INTO recommendations (seed_key, seed, result_limit, payload, computed_at) "
+        "VALUES (?, ?, 8, '[]', ?)",
+        (key, key.upper(), computed_at)
+    )
+    connection.commit()
+
+
+def test_rows_older_than_max_age_are_pending(tmp_path):
+    connection = open_output(str(tmp_path / "out.db"))
+    now = time.time()
+    add_row(connection, "a", now - 3600)
+    add_row(connection, "b", now - 2 * 86400)
+
+    assert batch.pending(connection, "recommendations", ITEMS) == ["C"]
+    assert batch.pending(connection, "recommendations", ITEMS, now - 43200) == ["B", "C"]
+
+
+def test_nightly_run_recomputes_last_nights_rows(tmp_path):
+    connection = open_output(str(tmp_path / "out.db"))
+    last_night = batch.start_run(connection, "recommendations", refresh=False)
+    last_night["started_at"] -= 86400
+    last_night["finished_at"] = last_night["started_at"] + 600
+    batch.save_run(connection, "recommendations", last_night)
+    add_row(connection, "a", last_night["started_at"] + 60)
+
+    tonight = batch.start_run(connection, "recommendations", refresh=False)
+    assert tonight["id"] != last_night["id"]
+    cutoff = tonight["started_at"] - batch.DEFAULT_MAX_AGE
+    assert batch.pending(connection, "recommendations", ITEMS, cutoff) == ["A", "B", "C"]
+
+
+def test_interrupted_refresh_resumes(tmp_path):
+    connection = open_output(str(tmp_path / "out.db"))
+    add_row(connection, "a", time.time() - 60)
+    add_row(connection, "b", time.time() - 60)
+
+    first = batch.start_run(connection, "recommendations", refresh=True)
+    add_row(connection, "a", time.time())
+    # Crash before the run is marked finished, then run the same command again
+    resumed = batch.start_run(connection, "recommendations", refresh=True)
+    assert resumed["id"] == first["id"]
+    assert batch.pending(connection, "recommendations", ITEMS, resumed["started_at"]) == ["B", "C"]
+
+    resumed["finished_at"] = time.time()
+    batch.save_run(connection, "recommendations", resumed)
+    assert batch.start_run(connection, "recommendations", refresh=True)["id"] != first["id"]
+
+
+def test_precomputed_candidates_replace_seen_recommendations(tmp_path, monkeypatch):
+    from flask import Flask
+
+    from src.routes import harmony
+    from src.utils.exposure import ExposureStore
+    from src.utils.precomputed import PrecomputedStore
+
+    path = str(tmp_path / "precomputed.db")
+    connection = open_output(path)
+    # What the batch job stores for --limit 4: twice that many candidates, best first
+    candidates = [{"name": f"Artist {index}", "similarity_score": 1 - index / 10} for index in range(8)]
+    batch.store(connection, "recommendations", "radiohead", "Radiohead", candidates, 4)
+    connection.commit()
+    monkeypatch.setattr(harmony, "precomputed", PrecomputedStore(path))
+    monkeypatch.setattr(harmony, "exposure", ExposureStore(mode="filter"))
+    app = Flask(__name__)
+    app.register_blueprint(harmony.harmony_bp, url_prefix="/api")
+    client = app.test_client()
+
+    def names():
+        response = client.post("/api/recommendations", json={"seed_entity": "Radiohead", "limit": 4, "user_id": "u1"})
+        assert response.get_json()["metadata"]["precomputed"]
+        return [rec["name"] for rec in response.get_json()["recommendations"]]
+
+    assert names() == [f"Artist {index}" for index in range(4)]
+    assert names() == [f"Artist {index}" for index in range(4, 8)]
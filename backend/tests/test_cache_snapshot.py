@@ -0,0 +1,40 @@
+import time
+
+from src.utils.cache_snapshot import iter_snapshot, save_snapshot, write_snapshot
+
+
+def snapshot(path):
+    return {key: (stored_at, data) for key, stored_at, data in iter_snapshot(path)}
+
+
+def test_workers_saving_to_one_file_keep_each_others_entries(tmp_path):
+    path = str(tmp_path / "qloo-cache.jsonl.gz")
+    now = time.time()
+    first_worker = [("a", now - 10, {"v": "a"}), ("shared", now - 5, {"v": "old"})]
+    second_worker = [("b", now - 10, {"v": "b"}), ("shared", now - 1, {"v": "new"})]
+
+    save_snapshot(path, first_worker, max_age=3600)
+    save_snapshot(path, second_worker, max_age=3600)
+    # A later save by the first worker must not bring back its older copy of "shared"
+    save_snapshot(path, first_worker, max_age=3600)
+
+    assert snapshot(path) == {
+        "a": (now - 10, {"v": "a"}),
+        "b": (now - 10, {"v": "b"}),
+        "shared": (now - 1, {"v": "new"})
+    }
+
+
+def test_expired_entries_are_dropped_when_merging(tmp_path):
+    path = str(tmp_path / "qloo-cache.jsonl.gz")
+    now = time.time()
+    write_snapshot(path, [("stale", now - 7200, {}), ("fresh", now - 60, {})])
+    assert save_snapshot(path, [("new", now, {})], max_age=3600) == 2
+    assert set(snapshot(path)) == {"fresh", "new"}
+
+
+def test_unreadable_snapshot_is_replaced(tmp_path):
+    path = tmp_path / "qloo-cache.jsonl.gz"
+    path.write_bytes(b"not gzip")
+    assert save_snapshot(str(path), [("k", time.time(), {})], max_age=None) == 1
+    assert set(snapshot(str(path))) == {"k"}
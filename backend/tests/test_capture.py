@@ -0,0 +1,100 @@
+import json
+import types
+
+from flask import Blueprint, Flask, jsonify, request
+
+from src.utils import capture
+from src.utils.capture import TrafficRecorder, query_key
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+def make_app(tmp_path, monkeypatch):
+    api = types.SimpleNamespace(observer=None)
+    monkeypatch.setattr(capture, "get_qloo_api", lambda: api)
+    recorder = TrafficRecorder(str(tmp_path / "traffic.jsonl"), sample_rate=1.0, salt="test")
+
+    bp = Blueprint("harmony", __name__)
+
+    @bp.route("/discover", methods=["POST"])
+    def discover():
+        data = request.get_json()
+        # What the app passes on: the search input, case folded, plus its own words
+        query = f"{data['seed_entity'].casefold()} music"
+        api.observer("/search", {"query": query, "limit": 10, "offset": 0}, {"results": []}, False, 0.01)
+        capture.record_gemini(
+            f"Describe {data['seed_entity']}",
+            FakeResponse('{"summary": "Fans of Radiohead like this", "score": 10}'),
+            0.02
+        )
+        return jsonify({"ok": True})
+
+    app = Flask(__name__)
+    app.register_blueprint(bp)
+    app.before_request(recorder.start)
+    app.after_request(recorder.finish)
+    return app, recorder
+
+
+def read_records(recorder):
+    with open(recorder.path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_search_input_never_reaches_the_capture(tmp_path, monkeypatch):
+    app, recorder = make_app(tmp_path, monkeypatch)
+    app.test_client().post("/discover", json={"seed_entity": "Radiohead", "limit": 10, "user_id": "u1"})
+
+    raw = open(recorder.path, encoding="utf-8").read()
+    assert "radiohead" not in raw.casefold()
+    assert "u1" not in raw
+
+    records = {record["type"]: record for record in read_records(recorder)}
+    pseudonym = recorder.pseudonymize("Radiohead")
+    assert records["request"]["body"] == {"seed_entity": pseudonym, "limit": 10}
+    # The app's own words, limits and offsets are kept, so replay still matches the query
+    replayed = {"query": f"{pseudonym} music", "limit": 10, "offset": 0}
+    assert records["qloo"]["key"] == query_key("/search", replayed)
+    # JSON keys survive so the replayed response still parses
+    text = json.loads(records["gemini"]["text"])
+    assert text["summary"] == f"Fans of {pseudonym} like this"
+    assert text["score"] == 10
+
+
+def test_nested_free_text_fields_are_pseudonymized(tmp_path):
+    recorder = TrafficRecorder(str(tmp_path / "traffic.jsonl"), salt="test")
+    body = {"music_preferences": [{"name": "Björk", "user_id": 7}], "story_type": "journey"}
+    assert recorder.anonymize(body) == {
+        "music_preferences": [{"name": recorder.pseudonymize("Björk")}],
+        "story_type": "journey"
+    }
+
+
+def test_identity_echoed_by_upstream_responses_is_scrubbed(tmp_path, monkeypatch):
+    api = types.SimpleNamespace(observer=None)
+    monkeypatch.setattr(capture, "get_qloo_api", lambda: api)
+    recorder = TrafficRecorder(str(tmp_path / "traffic.jsonl"), sample_rate=1.0, salt="test")
+    bp = Blueprint("harmony", __name__)
+
+    @bp.route("/story", methods=["POST"])
+    def story():
+        data = request.get_json()
+        results = {"results": [{"name": "Radiohead", "tags": [f"liked by {data['user_name']}", data["email"]]}]}
+        api.observer("/search", {"query": data["seed_entity"], "limit": 5}, results, False, 0.01)
+        capture.record_gemini("Write a story", FakeResponse(f'{{"story": "Zelda Quist, {data["email"]} wrote"}}'), 0.02)
+        return jsonify({"ok": True})
+
+    app = Flask(__name__)
+    app.register_blueprint(bp)
+    app.before_request(recorder.start)
+    app.after_request(recorder.finish)
+    app.test_client().post("/story", json={"seed_entity": "Radiohead", "user_name": "Zelda Quist",
+                                           "email": "zquist@mailbox.example"})
+
+    raw = open(recorder.path, encoding="utf-8").read().casefold()
+    assert all(word not in raw for word in ("zelda", "quist", "zquist", "mailbox", "radiohead"))
+    records = {record["type"]: record for record in read_records(recorder)}
+    assert records["qloo"]["data"]["results"][0]["name"] == recorder.pseudonymize("Radiohead")
@@ -0,0 +1,90 @@
+import threading
+import time
+from collections import Counter
+
+import pytest
+
+from qloo_api import HashRing, QlooAPI
+from src.cache_node import NodeStore, make_server
+from src.utils.distributed_cache import DistributedCache
+
+KEYS = [f"key{index}" for index in range(2000)]
+
+
+@pytest.fixture
+def nodes():
+    servers = []
+    for _ in range(2):
+        server = make_server("127.0.0.1", 0, NodeStore(max_entries=1000, ttl=60))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+    yield servers
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def url(server):
+    return f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def test_ring_spreads_keys_and_moves_few_when_a_node_joins():
+    ring = HashRing(["a", "b", "c"])
+    owners = {key: next(ring.walk(key)) for key in KEYS}
+    counts = Counter(owners.values())
+    assert min(counts.values()) > len(KEYS) / 3 * 0.6
+
+    grown = HashRing(["a", "b", "c", "d"])
+    moved = [key for key in KEYS if next(grown.walk(key)) != owners[key]]
+    # Only keys taken over by the new node move
+    assert all(next(grown.walk(key)) == "d" for key in moved)
+    assert len(moved) < len(KEYS) / 4 * 1.5
+    assert list(grown.walk("key1")) and len(set(grown.walk("key1"))) == 4
+
+
+def test_entries_are_shared_through_the_nodes(nodes):
+    cache = DistributedCache([url(server) for server in nodes])
+    stored_at = time.time()
+    for key in KEYS[:20]:
+        cache.set(key, {"results": [key]}, stored_at)
+    found = cache.get_many(KEYS[:30])
+    assert set(found) == set(KEYS[:20])
+    assert found["key3"] == ({"results": ["key3"]}, stored_at)
+    # Each node holds only the keys it owns
+    assert all(server.RequestHandlerClass.store.stats()["entries"] < 20 for server in nodes)
+
+
+def test_node_down_falls_back_to_the_local_cache(nodes):
+    cache = DistributedCache([url(server) for server in nodes], timeout=0.2, cooldown=30)
+    stored_at = time.time()
+    for key in KEYS[:20]:
+        cache.set(key, {"results": [key]}, stored_at)
+    down = nodes[0]
+    down.shutdown()
+    down.server_close()
+    cache.session.close()  # Drop kept-alive connections, as a node process exit would
+
+    found = cache.get_many(KEYS[:20])
+    survivor = cache.nodes[1]
+    assert set(found) == {key for key in KEYS[:20] if cache.owner(key) is survivor}
+    assert not cache.nodes[0].healthy()
+    # While it cools down the node is not asked at all
+    started = time.monotonic()
+    cache.get_many(KEYS[:20])
+    assert time.monotonic() - started < 0.1
+    assert cache.nodes[0].errors == 1
+
+    api = QlooAPI("test-key", min_request_interval=0)
+    api.shared_cache = cache
+    sent = []
+
+    class Response:
+        status_code = 200
+        headers = {}
+
+        def json(self):
+            return {"results": [{"name": "Artist"}]}
+    api.shards[0].session.get = lambda *args, **kwargs: sent.append(1) or Response()
+    assert api.search("jazz", limit=5)[0].name == "Artist"
+    assert api.search("jazz", limit=5)[0].name == "Artist"
+    assert len(sent) == 1
@@ -0,0 +1,60 @@
+import pytest
+
+from src.utils import exposure
+from src.utils.exposure import ExposureStore
+
+NAME = lambda item: item["name"]  # noqa: E731
+
+
+def items(*names):
+    return [{"name": name} for name in names]
+
+
+def test_seen_items_are_down_ranked_or_filtered():
+    store = ExposureStore()
+    store.record("alice", ["Radiohead", "björk"])
+    candidates = items("radiohead", "Portishead", "Björk", "Massive Attack")
+    assert [item["name"] for item in store.rank("alice", candidates, NAME)] == \
+        ["Portishead", "Massive Attack", "radiohead", "Björk"]
+    assert store.rank("bob", candidates, NAME) == candidates
+
+    store.mode = "filter"
+    assert [item["name"] for item in store.rank("alice", candidates, NAME)] == ["Portishead", "Massive Attack"]
+
+
+def test_false_positive_rate_stays_within_budget():
+    store = ExposureStore(capacity=256, error_rate=0.01)
+    store.record("alice", [f"shown {index}" for index in range(256)])
+    unseen = items(*(f"never shown {index}" for index in range(5000)))
+    store.rank("alice", unseen, NAME)
+    # No unseen item should be reported seen, so every "seen" is a false positive
+    false_positives = store.stats()["seen"]
+    assert false_positives / len(unseen) < 0.01
+
+
+def test_full_generation_rotates_and_old_items_are_forgotten(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(exposure.time, "time", lambda: now[0])
+    store = ExposureStore(capacity=4, window=60.0)
+    store.record("alice", ["a", "b", "c", "d", "e"])
+    assert store.stats()["rotations"] == 1
+    # Both generations are checked, so nothing recorded is lost on rotation
+    assert store.rank("alice", items("a", "e", "z"), NAME)[0]["name"] == "z"
+
+    now[0] += 200.0  # More than two windows later
+    assert store.rank("alice", items("a", "e", "z"), NAME) == items("a", "e", "z")
+
+
+def test_users_are_bounded():
+    store = ExposureStore(max_users=3)
+    for user in range(10):
+        store.record(f"user{user}", ["a"])
+    stats = store.stats()
+    assert stats["users"] == 3
+    assert stats["evictions"] == 7
+    assert stats["max_filter_bytes"] == 3 * store.bytes_per_user()
+
+
+def test_unknown_mode_is_rejected():
+    with pytest.raises(ValueError):
+        ExposureStore(mode="hide")
@@ -0,0 +1,140 @@
+import socket
+import threading
+import time
+
+import pytest
+
+from src.utils import jobs
+from src.utils.jobs import FAILED, PENDING, RUNNING, SUCCEEDED, JobQueue, callback_url_error
+
+
+def wait_for(queue, job_id, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = queue.get(job_id)
+        if job is not None and job.status in (SUCCEEDED, FAILED):
+            return job
+        time.sleep(0.02)
+    raise AssertionError(f"job {job_id} did not finish")
+
+
+@pytest.fixture
+def fast_poll(monkeypatch):
+    monkeypatch.setattr(jobs, "POLL_INTERVAL", 0.05)
+
+
+def test_job_is_visible_from_another_worker_process(tmp_path, fast_poll):
+    path = str(tmp_path / "jobs.db")
+    # Two queues on one file stand in for two gunicorn workers
+    first = JobQueue(lambda payload: {"echo": payload["text"]}, path=path, name="story")
+    second = JobQueue(lambda payload: {"echo": payload["text"]}, path=path, name="story")
+
+    job = first.submit({"text": "hello"})
+    finished = wait_for(second, job.id)
+    assert finished.status == SUCCEEDED
+    assert finished.result == {"echo": "hello"}
+    # Identical pending payloads are deduplicated across processes too
+    slow = JobQueue(lambda payload: time.sleep(0.3), path=path, name="slow")
+    pending = slow.submit({"text": "same"})
+    assert JobQueue(lambda payload: None, path=path, name="slow").submit({"text": "same"}).id == pending.id
+
+
+def test_job_of_a_dead_worker_is_requeued(tmp_path, fast_poll):
+    path = str(tmp_path / "jobs.db")
+    dead = JobQueue(lambda payload: None, path=path, name="story", lease=0.1)
+    # A row left running by a process that died: its lease has run out
+    dead._db().execute(
+        "INSERT INTO jobs (id, queue, fingerprint, payload, priority, rank, status, attempts, lease_until, created_at) "
+        "VALUES ('lost', 'story', 'f', '{\"text\": \"x\"}', 'normal', 1, ?, 1, ?, ?)",
+        (RUNNING, time.time() - 1, time.time())
+    )
+
+    survivor = JobQueue(lambda payload: "done", path=path, name="story", lease=5)
+    finished = wait_for(survivor, "lost")
+    assert finished.status == SUCCEEDED and finished.result == "done"
+
+
+def test_job_is_failed_after_its_last_attempt_is_lost(tmp_path, fast_poll):
+    path = str(tmp_path / "jobs.db")
+    queue = JobQueue(lambda payload: "never", path=path, name="story")
+    queue._db().execute(
+        "INSERT INTO jobs (id, queue, fingerprint, payload, priority, rank, status, attempts, lease_until, created_at) "
+        "VALUES ('lost', 'story', 'f', '{}', 'normal', 1, ?, ?, ?, ?)",
+        (RUNNING, jobs.MAX_ATTEMPTS, time.time() - 1, time.time())
+    )
+    finished = wait_for(queue, "lost")
+    assert finished.status == FAILED
+    assert "worker lost" in finished.error
+
+
+def fake_resolver(addresses):
+    def getaddrinfo(host, port, *args, **kwargs):
+        return [(socket.AF_INET, socket.SOCK_STREAM, 6, "", (addresses[host], port or 80))]
+    return getaddrinfo
+
+
+@pytest.mark.parametrize("url", [
+    "http://127.0.0.1/hook",
+    "http://169.254.169.254/latest/meta-data",
+    "http://10.0.0.5/hook",
+    "http://192.168.1.20:8080/hook",
+    "http://[::1]/hook",
+    "http://internal.example/hook",
+    "ftp://example.com/hook",
+])
+def test_callback_to_non_public_address_is_rejected(monkeypatch, url):
+    monkeypatch.setattr(socket, "getaddrinfo", fake_resolver({
+        "127.0.0.1": "127.0.0.1", "169.254.169.254": "169.254.169.254", "10.0.0.5": "10.0.0.5",
+        "192.168.1.20": "192.168.1.20", "::1": "::1", "internal.example": "172.16.3.4"
+    }))
+    assert callback_url_error(url) is not None
+
+
+def test_callback_allowlist_and_public_hosts(monkeypatch):
+    monkeypatch.setattr(socket, "getaddrinfo", fake_resolver({"hooks.example.com": "93.184.216.34"}))
+    assert callback_url_error("https://hooks.example.com/story") is None
+    assert callback_url_error("https://hooks.example.com/story", {"other.example.com"}) is not None
+    assert callback_url_error("http://10.0.0.5/hook", {"10.0.0.5"}) is None
+
+
+def test_submit_rejects_private_callback_and_webhook_does_not_follow_redirects(tmp_path, monkeypatch):
+    monkeypatch.setattr(socket, "getaddrinfo", fake_resolver({"hooks.example.com": "93.184.216.34",
+                                                              "127.0.0.1": "127.0.0.1"}))
+    calls = []
+    monkeypatch.setattr(jobs.requests, "post", lambda url, **kwargs: calls.append((url, kwargs)))
+    queue = JobQueue(lambda payload: "ok", path=str(tmp_path / "jobs.db"), name="story")
+
+    with pytest.raises(ValueError):
+        queue.submit({"text": "x"}, callback_url="http://127.0.0.1:5001/admin")
+
+    job = queue.submit({"text": "y"}, callback_url="https://hooks.example.com/story")
+    wait_for(queue, job.id)
+    deadline = time.time() + 2
+    while not calls and time.time() < deadline:
+        time.sleep(0.02)
+    assert calls and calls[0][0] == "https://hooks.example.com/story"
+    assert calls[0][1]["allow_redirects"] is False
+    assert queue.stats()["jobs"][PENDING] == 0
+
+
+def test_deduplicated_job_notifies_every_caller_at_the_highest_priority(tmp_path, monkeypatch, fast_poll):
+    calls = []
+    monkeypatch.setattr(jobs.requests, "post", lambda url, **kwargs: calls.append(url))
+    gate = threading.Event()
+    queue = JobQueue(lambda payload: gate.wait(5), path=str(tmp_path / "jobs.db"), name="story",
+                     workers=1, callback_hosts=["first.example.com", "second.example.com"])
+    busy = queue.submit({"text": "busy"})
+    while queue.get(busy.id).status != RUNNING:
+        time.sleep(0.01)
+
+    job = queue.submit({"text": "same"}, priority="low", callback_url="https://first.example.com/hook")
+    joined = queue.submit({"text": "same"}, priority="high", callback_url="https://second.example.com/hook")
+    assert joined.id == job.id
+    assert queue.get(job.id).priority == "high"
+
+    gate.set()
+    wait_for(queue, job.id)
+    deadline = time.time() + 2
+    while len(calls) < 2 and time.time() < deadline:
+        time.sleep(0.02)
+    assert sorted(calls) == ["https://first.example.com/hook", "https://second.example.com/hook"]
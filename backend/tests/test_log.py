@@ -0,0 +1,64 @@
+import json
+import logging
+import queue
+
+from src.utils.log import JsonFormatter, NonBlockingQueueHandler, RateLimitFilter, request_id_scope
+
+
+def make_record(msg="Qloo request to %s failed", created=1000.5, level=logging.WARNING, name="qloo_api"):
+    record = logging.LogRecord(name, level, __file__, 1, msg, ("/search",), None)
+    record.created = created
+    return record
+
+
+def test_burst_then_sampling_with_suppressed_count():
+    limiter = RateLimitFilter(burst=3, sample_every=10)
+    records = [make_record() for _ in range(25)]
+    kept = [index for index, record in enumerate(records) if limiter.filter(record)]
+    # The burst, then every 10th record past it
+    assert kept == [0, 1, 2, 12, 22]
+    assert limiter.suppressed == 20
+    # Each kept record reports what was dropped since the last one
+    assert records[12].suppressed == 9
+    assert records[22].suppressed == 9
+
+    # A new second starts a new burst, which reports the tail of the last one
+    record = make_record(created=1001.0)
+    assert limiter.filter(record)
+    assert record.suppressed == 2
+
+
+def test_message_types_are_limited_separately():
+    limiter = RateLimitFilter(burst=1, sample_every=100)
+    assert limiter.filter(make_record())
+    assert not limiter.filter(make_record())
+    assert limiter.filter(make_record(msg="Cache node %s unavailable"))
+    assert limiter.filter(make_record(name="src.utils.gemini"))
+    assert limiter.filter(make_record(level=logging.CRITICAL))
+
+
+def test_tracked_message_types_are_bounded():
+    limiter = RateLimitFilter(max_types=5)
+    for index in range(50):
+        limiter.filter(make_record(msg=f"message {index}"))
+    assert len(limiter._types) == 5
+
+
+def test_full_queue_drops_instead_of_blocking():
+    handler = NonBlockingQueueHandler(queue.Queue(maxsize=2))
+    for _ in range(5):
+        handler.emit(make_record())
+    assert handler.queue.qsize() == 2
+    assert handler.dropped == 3
+
+
+def test_json_output_carries_request_id_and_extra_fields():
+    handler = NonBlockingQueueHandler(queue.Queue())
+    with request_id_scope("req-1"):
+        record = make_record()
+        record.endpoint = "/search"
+        handler.emit(record)
+    entry = json.loads(JsonFormatter().format(handler.queue.get_nowait()))
+    assert entry["msg"] == "Qloo request to /search failed"
+    assert entry["request_id"] == "req-1"
+    assert entry["endpoint"] == "/search"
@@ -0,0 +1,52 @@
+import threading
+import time
+
+from qloo_api import CircuitBreaker, QlooAPI
+
+
+def make_api():
+    api = QlooAPI("test-key", min_request_interval=0.1)
+    acquired = []
+    scheduler = api.shards[0].scheduler
+    original = scheduler.acquire
+    scheduler.acquire = lambda *args, **kwargs: acquired.append(1) or original(*args, **kwargs)
+
+    def no_network(*args, **kwargs):
+        raise AssertionError("no request should be sent")
+    api.shards[0].session.get = no_network
+    return api, acquired
+
+
+def test_open_breaker_fails_fast_without_taking_a_slot():
+    api, acquired = make_api()
+    api._get_breaker(api.shards[0], "/search")._open()
+
+    durations = []
+
+    def call(index):
+        started = time.monotonic()
+        assert api._make_request("/search", {"query": f"q{index}", "limit": 5}) is None
+        durations.append(time.monotonic() - started)
+
+    threads = [threading.Thread(target=call, args=(index,)) for index in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(durations) == 20
+    assert max(durations) < 0.05
+    assert acquired == []
+
+
+def test_half_open_probe_is_returned_when_no_slot_is_granted():
+    api, _ = make_api()
+    breaker = api._get_breaker(api.shards[0], "/search")
+    breaker._open()
+    breaker.opened_at -= breaker.cooldown  # Cooldown over: the next call is the probe
+    api.shards[0].scheduler.acquire = lambda *args, **kwargs: False
+
+    assert api._make_request("/search", {"query": "q", "limit": 5}) is None
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    # The probe permit was given back, so the next caller may probe
+    assert breaker.allow_request()
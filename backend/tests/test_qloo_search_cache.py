@@ -0,0 +1,77 @@
+from qloo_api import QlooAPI
+
+
+class FakeResponse:
+    status_code = 200
+    headers = {}
+
+    def __init__(self, limit):
+        self.limit = limit
+
+    def json(self):
+        return {"results": [{"name": f"Artist {index}"} for index in range(self.limit)]}
+
+
+def make_api():
+    api = QlooAPI("test-key", min_request_interval=0)
+    sent = []
+
+    def get(url, params=None, timeout=None):
+        sent.append(dict(params))
+        return FakeResponse(params["limit"])
+    api.shards[0].session.get = get
+
+    key_builds = []
+    cache_key = api._cache_key
+    api._cache_key = lambda endpoint, params: key_builds.append(params) or cache_key(endpoint, params)
+    return api, sent, key_builds
+
+
+def test_smaller_page_is_served_from_a_larger_one_with_one_lookup():
+    api, sent, key_builds = make_api()
+    assert len(api.search("Indie Rock", limit=30)) == 30
+
+    key_builds.clear()
+    results = api.search("indie  rock", limit=5)
+    assert [entity.name for entity in results] == [f"Artist {index}" for index in range(5)]
+    assert len(sent) == 1
+    assert api.search_stats["page_hits"] == 1
+    # Only the key of the requested page itself, no probing of every larger limit
+    assert len(key_builds) == 1
+
+
+def test_search_miss_and_admission_check_do_not_probe_larger_pages():
+    api, sent, key_builds = make_api()
+    assert not api.search_cached("jazz", limit=4)
+    assert len(key_builds) == 1
+
+    key_builds.clear()
+    api.search("jazz", limit=4)
+    assert len(sent) == 1
+    assert len(key_builds) == 1
+
+
+def test_expired_larger_page_is_not_served():
+    api, sent, _ = make_api()
+    api.search("jazz", limit=20)
+    api.cache_ttl = 0
+    api.search("jazz", limit=5)
+    assert len(sent) == 2
+    assert api.search_stats["page_hits"] == 0
+
+
+def test_query_is_sent_as_typed_and_canonicalized_only_for_the_cache():
+    api, sent, _ = make_api()
+    for query in ("Duran Duran", "Talk Talk", "Bye Bye Bye", "The The", "None of the Above"):
+        api.search(f"  {query} ", limit=5)
+    assert [params["query"] for params in sent] == \
+        ["Duran Duran", "Talk Talk", "Bye Bye Bye", "The The", "None of the Above"]
+
+    # A band that repeats a word does not share a cache entry with the single word
+    api.search("Duran", limit=5)
+    assert sent[-1]["query"] == "Duran"
+    sent.clear()
+    api.search("talk  TALK", limit=5)
+    assert sent == []
+    # Only a query made of placeholders is dropped
+    assert api.search("null none", limit=5) == [] and sent == []
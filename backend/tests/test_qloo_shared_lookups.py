@@ -0,0 +1,65 @@
+from qloo_api import QlooAPI, shared_lookups
+from src.utils.streaming import run_concurrently
+
+
+class FakeResponse:
+    status_code = 200
+    headers = {}
+
+    def json(self):
+        return {"results": [{"name": "Artist"}]}
+
+
+class FakeSharedCache:
+    def __init__(self):
+        self.lookups = []
+        self.entries = {}
+
+    def get_many(self, keys):
+        self.lookups.append(len(keys))
+        return {key: self.entries[key] for key in keys if key in self.entries}
+
+    def set(self, key, data, stored_at):
+        self.entries[key] = (data, stored_at)
+
+    def status(self):
+        return {}
+
+
+def make_api():
+    api = QlooAPI("test-key", min_request_interval=0)
+    api.shards[0].session.get = lambda *args, **kwargs: FakeResponse()
+    api.shared_cache = FakeSharedCache()
+    return api
+
+
+def test_cross_domain_makes_one_shared_lookup():
+    api = make_api()
+    api.cross_domain_discovery("Radiohead", ["movies", "books", "restaurants"])
+    assert api.shared_cache.lookups == [9]
+
+
+def test_find_similar_makes_one_shared_lookup():
+    api = make_api()
+    api.find_similar("Taylor Swift", limit=10)
+    assert api.shared_cache.lookups == [4]
+
+
+def test_concurrent_workers_share_the_warmed_keys():
+    api = make_api()
+    domains = ["movies", "books", "restaurants"]
+    with shared_lookups():
+        api.warm_domains("Radiohead", domains)
+        results = run_concurrently(domains, lambda domain: api.domain_discovery("Radiohead", domain))
+    assert len(list(results)) == 3
+    assert api.shared_cache.lookups == [9]
+
+
+def test_searches_outside_a_fan_out_still_use_the_shared_cache():
+    api = make_api()
+    api.search("jazz", limit=5)
+    other_host = make_api()
+    other_host.shared_cache = api.shared_cache
+    other_host.shards[0].session.get = None  # Must be answered from the shared cache
+    assert other_host.search("jazz", limit=5)[0].name == "Artist"
+    assert api.shared_cache.lookups == [1, 1]
@@ -0,0 +1,39 @@
+import json
+import os
+
+from src.utils.static_assets import StaticManifest
+
+
+def write(root, relative, data=b"x"):
+    path = os.path.join(root, relative)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def test_only_manifest_files_are_immutable(tmp_path):
+    root = str(tmp_path)
+    for name in ("assets/index-BXa1b2c3.js", "assets/index-Cd4e5f6g.css", "assets/logo-Hh7i8j9k.png",
+                 "apple-touch-icon.png", "my.stylesheet.css", "og-image-1200x630.png", "index.html"):
+        write(root, name)
+    write(root, ".vite/manifest.json", json.dumps({
+        "index.html": {"file": "assets/index-BXa1b2c3.js", "css": ["assets/index-Cd4e5f6g.css"],
+                       "assets": ["assets/logo-Hh7i8j9k.png"], "isEntry": True}
+    }).encode())
+
+    assets = StaticManifest(root).assets
+    immutable = {path for path, asset in assets.items() if asset.immutable}
+    assert immutable == {"assets/index-BXa1b2c3.js", "assets/index-Cd4e5f6g.css", "assets/logo-Hh7i8j9k.png"}
+
+
+def test_without_manifest_only_vite_names_under_assets(tmp_path):
+    root = str(tmp_path)
+    for name in ("assets/index-BXa1b2c3.js", "apple-touch-icon.png", "my.stylesheet.css",
+                 "og-image-1200x630.png", "assets/my.stylesheet.css", "index.html"):
+        write(root, name)
+
+    assets = StaticManifest(root).assets
+    assert assets["assets/index-BXa1b2c3.js"].immutable
+    for name in ("apple-touch-icon.png", "my.stylesheet.css", "og-image-1200x630.png",
+                 "assets/my.stylesheet.css", "index.html"):
+        assert not assets[name].immutable, name
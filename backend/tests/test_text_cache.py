@@ -0,0 +1,29 @@
+from src.utils.text_cache import NearDuplicateCache, normalize_text
+
+
+def test_normalize_keeps_non_latin_words():
+    assert normalize_text("今天天气很好，我很开心！") == "今天天气很好 我很开心"
+    assert normalize_text("Я очень  счастлив!") == "я очень счастлив"
+    assert normalize_text("أنا سعيد جدا") == "أنا سعيد جدا"
+    assert normalize_text("I DON'T  know...") == "i don't know"
+    assert normalize_text("Straße") == normalize_text("STRASSE")
+
+
+def test_unrelated_non_latin_texts_do_not_share_an_entry():
+    cache = NearDuplicateCache()
+    cache.set("Мне очень грустно, я потерял работу", {"primary_mood": "sad"})
+    assert cache.get("今天天气很好，我很开心！") is None
+    assert cache.get("مرحبا، أنا سعيد جدا اليوم") is None
+    assert cache.get("мне очень грустно я потерял работу") == {"primary_mood": "sad"}
+
+
+def test_empty_and_very_short_texts_are_never_cached():
+    cache = NearDuplicateCache()
+    for text in ("😀😀😀", "!!!", "ok", ""):
+        cache.set(text, {"primary_mood": "happy"})
+        assert cache.get(text) is None
+    assert cache.get("😭") is None
+    stats = cache.stats()
+    assert stats["entries"] == 0
+    assert stats["skipped"] == 5
+
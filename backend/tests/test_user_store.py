@@ -0,0 +1,25 @@
+import os
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = r"""
+import sys
+from src.main import create_app
+app = create_app()
+client = app.test_client()
+assert client.get("/api/health").status_code == 200
+assert "sqlalchemy" not in sys.modules, "SQLAlchemy imported before the user store was used"
+response = client.post("/api/users", json={"username": "ada", "email": "ada@example.com"})
+assert response.status_code == 201, response.status_code
+user_id = response.get_json()["id"]
+assert client.get(f"/api/profile/{user_id}").status_code == 404
+assert client.get("/api/users?username=ada").get_json()[0]["id"] == user_id
+"""
+
+
+def test_user_store_is_configured_on_first_use(tmp_path):
+    env = {**os.environ, "DATABASE_URL": f"sqlite:///{tmp_path / 'app.db'}", "QLOO_CACHE_SNAPSHOT": ""}
+    result = subprocess.run([sys.executable, "-c", PROBE], cwd=BACKEND_DIR, env=env, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr[-2000:]
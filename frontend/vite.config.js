@@ -11,4 +11,8 @@ export default defineConfig({
       "@": path.resolve(__dirname, "./src"),
     },
   },
+  build: {
+    // .vite/manifest.json tells the backend which files are fingerprinted (cached as immutable)
+    manifest: true,
+  },
 })